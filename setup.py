@@ -13,11 +13,15 @@ setup(
     packages=find_packages(),
     zip_safe=False,
     include_package_data=True,
+    python_requires='>=3.7',
     install_requires=['scrapy'],
     tests_require=['scrapy', 'pytest', 'pytest-mock'],
     extras_require={
         's3': ['botocore'],
         'collections': ['python-scrapinghub'],
+        'zstd': ['zstandard'],
+        'parquet': ['pyarrow'],
+        'async': ['aiohttp'],
         'pep8': ['flake8'],
     },
     classifiers=[
@@ -28,9 +32,6 @@ setup(
         'Operating System :: OS Independent',
         'Programming Language :: Python',
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.4',
-        'Programming Language :: Python :: 3.5',
-        'Programming Language :: Python :: 3.6',
         'Programming Language :: Python :: 3.7',
     ],
 )
@@ -0,0 +1,89 @@
+'''
+This module filters duplicated urls while the input is loaded.
+Each filter has an `add(url)` method returning `False` if the url was added before.
+'''
+import hashlib
+import logging
+import math
+
+logger = logging.getLogger(__name__)
+
+
+def fingerprint(url, size=8):
+    return int.from_bytes(hashlib.blake2b(url.encode('utf-8'), digest_size=size).digest(), 'little')
+
+
+class ExactFilter:
+    '''Keeps a set with a 64-bit fingerprint of each url.
+    Memory grows with the number of distinct urls.'''
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls()
+
+    def __init__(self):
+        self._fingerprints = set()
+
+    def __contains__(self, url):
+        return fingerprint(url) in self._fingerprints
+
+    def add(self, url):
+        fp = fingerprint(url)
+        if fp in self._fingerprints:
+            return False
+
+        self._fingerprints.add(fp)
+        return True
+
+
+class BloomFilter:
+    '''Bloom filter sized for `capacity` urls with a false positive rate of `error_rate`.
+    If it takes more than `max_memory` bytes, the size is capped, raising the false positive rate.
+    A false positive drops a url that was not read before.
+    '''
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(
+            settings.getint('SPIDERFEEDER_DEDUP_CAPACITY', 10000000),
+            settings.getfloat('SPIDERFEEDER_DEDUP_ERROR_RATE', 0.001),
+            settings.getint('SPIDERFEEDER_DEDUP_MAX_MEMORY', 0),
+        )
+
+    def __init__(self, capacity, error_rate, max_memory=0):
+        size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        if max_memory:
+            size = min(size, max_memory * 8)
+
+        self._size = max(size, 8)
+        self._hashes = max(round(self._size / capacity * math.log(2)), 1)
+        self._bits = bytearray(math.ceil(self._size / 8))
+        logger.info(
+            f'Bloom filter of {len(self._bits)} bytes with {self._hashes} hashes, '
+            f'error rate {self.error_rate(capacity):.2g} for {capacity} urls.'
+        )
+
+    def error_rate(self, count):
+        '''Returns the expected false positive rate after adding `count` urls.'''
+        return (1 - math.exp(-self._hashes * count / self._size)) ** self._hashes
+
+    def __contains__(self, url):
+        bits = self._bits
+        return all(bits[position >> 3] & 1 << (position & 7) for position in self._positions(url))
+
+    def add(self, url):
+        bits = self._bits
+        added = False
+        for position in self._positions(url):
+            mask = 1 << (position & 7)
+            if not bits[position >> 3] & mask:
+                bits[position >> 3] |= mask
+                added = True
+
+        return added
+
+    def _positions(self, url):
+        fp = fingerprint(url, 16)
+        (h1, h2) = (fp & 0xFFFFFFFFFFFFFFFF, fp >> 64 | 1)
+        size = self._size
+        return [(h1 + i * h2) % size for i in range(self._hashes)]
@@ -1,10 +1,29 @@
 from urllib.parse import urlparse
+import asyncio
+import json
 import logging
-from itertools import tee
+import os
+import queue
+import re
+import time
+import zlib
+from itertools import count, tee
 
-from scrapy import signals
-from scrapy.exceptions import NotConfigured
+from scrapy import Request, signals
+from scrapy.exceptions import DontCloseSpider, NotConfigured
+from scrapy.settings import Settings
+from scrapy.utils.defer import deferred_from_coro
+from scrapy.utils.log import failure_to_exc_info
 from scrapy.utils.misc import load_object
+from scrapy.utils.reactor import is_asyncio_reactor_installed
+from twisted.internet import task
+from twisted.internet.defer import CancelledError
+
+from .normalize import UrlNormalizer
+from .store import clients
+from .store.async_store import ThreadedStore
+from .store.multi_store import MultiStore
+from .store.prefetch import Prefetcher
 
 logger = logging.getLogger(__name__)
 
@@ -17,8 +36,43 @@ class BaseLoader:
     The stores can be overriden or aggregated through `SPIDERFEEDER_STORES`.
 
     `SPIDERFEEDER_INPUT_URI` supports %(params) as in scrapy's `FEED_URI`.
+    It can also be a list of uris or a dict of uris and the settings overriden for each of them.
+    Uris with glob patterns are expanded by stores defining `expand_uri(input_uri, settings)`.
+    Multiple inputs are read concurrently and combined according to `SPIDERFEEDER_INPUT_MERGE`.
+
+    The input can be split into `SPIDERFEEDER_SHARD_COUNT` shards, so each job loads only the
+    shard `SPIDERFEEDER_SHARD_INDEX`. Both can be overriden by `shard_count` and `shard_index`
+    spider arguments. The records are assigned to shards according to `SPIDERFEEDER_SHARD_STRATEGY`:
+    * `store`: the store reads only its shard, if it supports it, otherwise falls back to `modulo`
+    * `hash`: a stable hash of the url
+    * `modulo`: the record number
+
+    If `SPIDERFEEDER_CURSOR_FILE` or `JOBDIR` is set, the position of the last input read is saved
+    every `SPIDERFEEDER_CURSOR_INTERVAL` inputs and when the spider is closed.
+    When the spider is started again, it resumes reading after this position.
+
+    If `SPIDERFEEDER_DEDUP` is set, duplicated urls are dropped while they are loaded,
+    keeping them in one of `SPIDERFEEDER_DEDUP_FILTERS`:
+    * `exact`: a set of 64-bit fingerprints
+    * `bloom`: a Bloom filter with bounded memory and a configurable false positive rate
+
+    If `SPIDERFEEDER_URL_NORMALIZE` is set, urls are normalized and invalid ones are dropped
+    before the duplicates, counting them by reason. For more information, please refer to UrlNormalizer.
+
+    If `SPIDERFEEDER_READ_AHEAD` is set, the store is read in a background thread,
+    keeping up to this number of items ahead of scrapy, so the reactor only dequeues them.
     '''
 
+    SHARD_STRATEGIES = ('store', 'hash', 'modulo')
+
+    # whether only the urls of the input are used, so stores can skip the other fields
+    URLS_ONLY = False
+
+    DEDUP_FILTERS = {
+        'exact': 'spider_feeder.dedup.ExactFilter',
+        'bloom': 'spider_feeder.dedup.BloomFilter',
+    }
+
     STORES = {
         '': 'spider_feeder.store.file_store.FileStore',
         'file': 'spider_feeder.store.file_store.FileStore',
@@ -39,61 +93,599 @@ class BaseLoader:
 
         extension = cls(crawler, input_uri, stores)
         crawler.signals.connect(extension.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(extension.spider_closed, signal=signals.spider_closed)
         return extension
 
     def __init__(self, crawler, input_uri, stores):
         self._input_uri = input_uri
         self._crawler = crawler
         self._stores = stores
+        self._store = None
+        self._metrics = None
+        self._checkpoint = None
+        self._items = None
+
+        settings = crawler.settings
+        self._input_merge = settings.get('SPIDERFEEDER_INPUT_MERGE', 'chain')
+        if self._input_merge not in MultiStore.STRATEGIES:
+            raise NotConfigured(
+                f'SPIDERFEEDER_INPUT_MERGE must be one of {MultiStore.STRATEGIES}, '
+                f'got {self._input_merge}.'
+            )
+        self._input_prefetch = settings.getint('SPIDERFEEDER_INPUT_PREFETCH', 1000)
+        self._read_ahead = settings.getint('SPIDERFEEDER_READ_AHEAD', 0)
+
+        self._stats_interval = settings.getint('SPIDERFEEDER_STATS_INTERVAL', 1000)
+        self._stats_period = settings.getfloat('SPIDERFEEDER_STATS_PERIOD', 5.0)
+        self._opened_time = None
+
+        self._normalizer = None
+        if settings.getbool('SPIDERFEEDER_URL_NORMALIZE', False):
+            self._normalizer = UrlNormalizer.from_settings(settings)
+
+        self._dedup = None
+        dedup = settings.get('SPIDERFEEDER_DEDUP')
+        if dedup:
+            filters = dict(self.DEDUP_FILTERS, **settings.getdict('SPIDERFEEDER_DEDUP_FILTERS', {}))
+            if dedup not in filters:
+                raise NotConfigured(f'SPIDERFEEDER_DEDUP must be one of {tuple(filters)}, got {dedup}.')
+            self._dedup = load_object(filters[dedup]).from_settings(settings)
+
+        self._cursor_path = settings.get('SPIDERFEEDER_CURSOR_FILE')
+        if not self._cursor_path and settings.get('JOBDIR'):
+            self._cursor_path = os.path.join(settings.get('JOBDIR'), 'spider_feeder.cursor')
+        self._cursor_interval = settings.getint('SPIDERFEEDER_CURSOR_INTERVAL', 1000)
+
+        self._shard_index = settings.getint('SPIDERFEEDER_SHARD_INDEX', 0)
+        self._shard_count = settings.getint('SPIDERFEEDER_SHARD_COUNT', 1)
+        self._shard_strategy = settings.get('SPIDERFEEDER_SHARD_STRATEGY', 'store')
+        if self._shard_strategy not in self.SHARD_STRATEGIES:
+            raise NotConfigured(
+                f'SPIDERFEEDER_SHARD_STRATEGY must be one of {self.SHARD_STRATEGIES}, '
+                f'got {self._shard_strategy}.'
+            )
 
     def spider_opened(self, spider):
-        input_uri = self._get_formatted_input_uri(spider)
-        store = self._get_store(input_uri)
+        clients.pool.acquire()
+        self._opened_time = time.monotonic()
+        inputs = self._get_formatted_inputs(spider)
+        self._store = self._get_input_store(inputs)
+        set_urls_only = getattr(self._store, 'set_urls_only', None)
+        if self.URLS_ONLY and set_urls_only:
+            set_urls_only()
+        input_uri = inputs[0][0] if isinstance(self._input_uri, str) else [uri for (uri, _) in inputs]
+        (shard_index, shard_count) = self._get_shard_params(spider)
+        cursor_file = None
+        cursor = None
+        if self._cursor_path and hasattr(self._store, 'set_cursor'):
+            cursor_file = _CursorFile(self._cursor_path, {
+                'input_uri': input_uri,
+                'shard': [shard_index, shard_count],
+            })
+            cursor = cursor_file.load()
+            self._store.set_cursor(cursor)
+
+        store = self._get_shard(self._store, shard_index, shard_count, cursor)
+        self._metrics = self._store
+        if self._read_ahead > 0:
+            store = self._metrics = _ReadAhead(store, self._store, self._read_ahead)
+
+        if cursor_file:
+            store = self._checkpoint = _Checkpoint(
+                store, self._metrics, cursor_file, self._cursor_interval
+            )
+
         self.set_spider_input_data(spider, store)
 
-    def _get_formatted_input_uri(self, spider):
+    def spider_closed(self, spider):
+        if self._checkpoint:
+            self._checkpoint.save()
+
+        # the engine doesn't exhaust the urls of a crawl stopped early, so their stats are flushed here
+        if self._items is not None:
+            self._items.close()
+
+        if isinstance(self._metrics, _ReadAhead):
+            self._metrics.close()
+
+        close = getattr(self._store, 'close', None)
+        if close:
+            close()
+        clients.pool.release()
+
+    def _get_formatted_inputs(self, spider):
+        '''Returns the formatted input uris with the settings overriden for each of them.'''
+        if isinstance(self._input_uri, str):
+            inputs = {self._input_uri: {}}
+        elif isinstance(self._input_uri, dict):
+            inputs = self._input_uri
+        else:
+            inputs = {input_uri: {} for input_uri in self._input_uri}
+
         params = {k: getattr(spider, k) for k in dir(spider)}
-        return self._input_uri % params
+        return [(input_uri % params, options or {}) for (input_uri, options) in inputs.items()]
+
+    def _get_input_store(self, inputs):
+        stores = []
+        weights = []
+        for (input_uri, options) in inputs:
+            settings = self._get_input_settings(options)
+            store_cls = load_object(self._stores[urlparse(input_uri).scheme])
+            input_uris = [input_uri]
+            if hasattr(store_cls, 'expand_uri') and re.search(r'[*?\[]', input_uri):
+                input_uris = store_cls.expand_uri(input_uri, settings)
+                if input_uris:
+                    logger.info(f'{input_uri} matches {len(input_uris)} inputs.')
+                else:
+                    logger.warning(f'{input_uri} matches no inputs.')
+
+            weight = settings.getint('SPIDERFEEDER_INPUT_WEIGHT', 1)
+            if weight < 1:
+                raise ValueError(f'SPIDERFEEDER_INPUT_WEIGHT of {input_uri} must be an integer >= 1, got {weight}.')
+
+            for uri in input_uris:
+                stores.append(store_cls(uri, settings))
+                weights.append(weight)
+
+        if len(stores) == 1:
+            return stores[0]
+
+        return MultiStore(stores, self._input_merge, weights, self._input_prefetch)
+
+    def _get_input_settings(self, options):
+        settings = self._crawler.settings
+        if options:
+            settings = Settings(settings)
+            settings.update(options, priority='spider')
+
+        return settings
+
+    def _get_shard_params(self, spider):
+        shard_index = int(getattr(spider, 'shard_index', self._shard_index))
+        shard_count = int(getattr(spider, 'shard_count', self._shard_count))
+        if not 0 <= shard_index < shard_count:
+            raise ValueError(f'Shard index must be in [0, {shard_count}), got {shard_index}.')
+
+        return (shard_index, shard_count)
 
-    def _get_store(self, input_uri):
-        parsed = urlparse(input_uri)
-        store_cls = load_object(self._stores[parsed.scheme])
-        return store_cls(input_uri, self._crawler.settings)
+    def _get_shard(self, store, shard_index, shard_count, cursor=None):
+        if shard_count == 1:
+            return store
+
+        logger.info(f'Loading shard {shard_index} of {shard_count}.')
+        strategy = self._shard_strategy
+        if strategy == 'store':
+            set_shard = getattr(store, 'set_shard', None)
+            if set_shard and set_shard(shard_index, shard_count):
+                return store
+            strategy = 'modulo'
+
+        # when resuming, the modulo counts records from the position of the cursor
+        start = (cursor or {}).get('count', 0)
+        return _Shard(store, shard_index, shard_count, strategy, start)
 
     def set_spider_input_data(self, spider, store):
         raise NotImplementedError()
 
+    def _iter(self, spider, store):
+        self._items = _Iter(
+            self._crawler, spider, store,
+            normalizer=self._normalizer,
+            dedup=self._dedup,
+            metrics=self._metrics,
+            interval=self._stats_interval,
+            period=self._stats_period,
+            opened_time=self._opened_time,
+        )
+        return self._items
+
 
 class StartUrlsLoader(BaseLoader):
-    '''Loader setting spider.start_urls. For more information, please refer to BaseLoader.'''
+    '''Loader setting spider.start_urls.
+    Only the urls are read, so columnar inputs only read `SPIDERFEEDER_INPUT_FIELD` or their first column.
+    For more information, please refer to BaseLoader.'''
+
+    URLS_ONLY = True
 
     def set_spider_input_data(self, spider, store):
-        store = _Iter(self._crawler, spider, store)
+        store = self._iter(spider, store)
         spider.start_urls = (url for (url, _) in store)
 
 
 class StartUrlsAndMetaLoader(BaseLoader):
     '''Loader setting spider.start_urls and spider.start_meta.
+    The meta of every url read by scrapy is buffered until it is read from spider.start_meta,
+    so prefer StartRequestsLoader for large inputs.
     For more information, please refer to BaseLoader.'''
 
     def set_spider_input_data(self, spider, store):
-        store = _Iter(self._crawler, spider, store)
+        store = self._iter(spider, store)
         (url_iter, meta_iter) = tee(store)
         spider.start_urls = (url for (url, _) in url_iter)
         setattr(spider, 'start_meta', (meta for (_, meta) in meta_iter))
 
 
+class StartRequestsLoader(BaseLoader):
+    '''Loader scheduling a request for every url through the engine,
+    with the extra fields of the input in request.meta.
+    `spider.start_requests()` is called before the spider is opened, so it's not replaced
+    and the requests are scheduled along with the ones it yields.
+    The requests are scheduled every 0.1 seconds while the scheduler holds less than `SPIDERFEEDER_MAX_PENDING`
+    of them and the spider is kept open until the input is exhausted.
+    The input is read in a single pass, so each item is released once its request is scheduled.
+    For more information, please refer to BaseLoader.'''
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        extension = super().from_crawler(crawler)
+        crawler.signals.connect(extension.spider_idle, signal=signals.spider_idle)
+        return extension
+
+    def __init__(self, crawler, input_uri, stores):
+        super().__init__(crawler, input_uri, stores)
+        self._max_pending = crawler.settings.getint('SPIDERFEEDER_MAX_PENDING', 1000)
+        self._feeding = None
+        self._loop = None
+
+    def set_spider_input_data(self, spider, store):
+        requests = (Request(url, meta=meta, dont_filter=True) for (url, meta) in self._iter(spider, store))
+        self._loop = task.LoopingCall(self._feed_batch, requests)
+        self._feeding = self._loop.start(0.1)
+        self._feeding.addErrback(self._feed_failed)
+
+    def spider_idle(self, spider):
+        if self._feeding is not None and not self._feeding.called:
+            raise DontCloseSpider()
+
+    def spider_closed(self, spider):
+        if self._loop is not None and self._loop.running:
+            self._loop.stop()
+        super().spider_closed(spider)
+
+    def _feed_batch(self, requests):
+        engine = self._crawler.engine
+        for _ in range(self._max_pending - self._pending()):
+            request = next(requests, None)
+            if request is None:
+                self._loop.stop()
+                return
+
+            engine.crawl(request)
+
+    def _feed_failed(self, failure):
+        if not failure.check(CancelledError, asyncio.CancelledError):
+            logger.error('Failed loading the input.', exc_info=failure_to_exc_info(failure))
+
+    def _pending(self):
+        scheduler = getattr(getattr(self._crawler.engine, 'slot', None), 'scheduler', None)
+        return len(scheduler) if hasattr(scheduler, '__len__') else 0
+
+
+class AsyncStartRequestsLoader(StartRequestsLoader):
+    '''Loader scheduling a request for every url from an asyncio task,
+    with the extra fields of the input in request.meta, so reading the input never blocks the reactor.
+    It requires the asyncio reactor (`TWISTED_REACTOR`).
+
+    A single `s3`, `http` or `https` input is read by the asynchronous store in `SPIDERFEEDER_ASYNC_STORES`
+    for its scheme, other inputs are read in a background thread by `ThreadedStore`.
+    The requests are scheduled while the scheduler holds less than `SPIDERFEEDER_ASYNC_MAX_PENDING` of them
+    and the spider is kept open until the input is exhausted.
+    For more information, please refer to StartRequestsLoader.'''
+
+    ASYNC_STORES = {
+        's3': 'spider_feeder.store.async_store.AsyncFileStore',
+        'http': 'spider_feeder.store.async_store.AsyncFileStore',
+        'https': 'spider_feeder.store.async_store.AsyncFileStore',
+    }
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not is_asyncio_reactor_installed():
+            raise NotConfigured(
+                'AsyncStartRequestsLoader requires TWISTED_REACTOR = '
+                '"twisted.internet.asyncioreactor.AsyncioSelectorReactor".'
+            )
+
+        return super().from_crawler(crawler)
+
+    def __init__(self, crawler, input_uri, stores):
+        super().__init__(crawler, input_uri, stores)
+        settings = crawler.settings
+        self._async_stores = dict(self.ASYNC_STORES, **settings.getdict('SPIDERFEEDER_ASYNC_STORES', {}))
+        self._max_pending = settings.getint('SPIDERFEEDER_ASYNC_MAX_PENDING', self._max_pending)
+        # the stores are already read off the event loop
+        self._read_ahead = 0
+
+    def set_spider_input_data(self, spider, store):
+        self._feeding = deferred_from_coro(self._feed(self._iter(spider, store)))
+        self._feeding.addErrback(self._feed_failed)
+
+    def spider_closed(self, spider):
+        if self._feeding is not None and not self._feeding.called:
+            self._feeding.cancel()
+        super().spider_closed(spider)
+
+    def _get_input_store(self, inputs):
+        if len(inputs) == 1:
+            (input_uri, options) = inputs[0]
+            scheme = urlparse(input_uri).scheme
+            if scheme in self._async_stores and not re.search(r'[*?\[]', input_uri):
+                return load_object(self._async_stores[scheme])(input_uri, self._get_input_settings(options))
+
+        return ThreadedStore(super()._get_input_store(inputs), self._input_prefetch)
+
+    async def _feed(self, items):
+        engine = self._crawler.engine
+        async for (url, meta) in items:
+            while self._pending() >= self._max_pending:
+                await asyncio.sleep(0.1)
+
+            engine.crawl(Request(url, meta=meta, dont_filter=True))
+
+
+class _Shard:
+
+    def __init__(self, store, index, count, strategy, start=0):
+        self._store = store
+        self._index = index
+        self._count = count
+        self._strategy = strategy
+        self._start = start
+
+    def __iter__(self):
+        yield from filter(self._selector(), self._store)
+
+    async def __aiter__(self):
+        selected = self._selector()
+        async for item in self._store:
+            if selected(item):
+                yield item
+
+    def _selector(self):
+        '''Returns a function telling if each item, given in the order of the store, is in the shard.'''
+        (index, shards) = (self._index, self._count)
+        if self._strategy == 'hash':
+            return lambda item: zlib.crc32(item[0].encode('utf-8')) % shards == index
+
+        # the first item of the shard is the one at position 0
+        positions = count(-((index - self._start) % shards))
+        return lambda item: next(positions) % shards == 0
+
+
+class _ReadAhead:
+    '''Reads the items in a background thread, keeping up to `size` of them in a queue.
+    The cursor of the store is read along with each item, so `get_cursor()` returns
+    the position after the last item consumed instead of the last one read.
+    Along with the store metrics, `get_metrics()` returns the queue depth, the seconds the thread
+    waited for a full queue (`read_ahead_stall_time`) and the ones the consumer waited for an empty one.'''
+
+    def __init__(self, items, store, size):
+        self._items = items
+        self._store = store
+        self._prefetcher = Prefetcher(self._read(), size)
+        get_cursor = getattr(store, 'get_cursor', None)
+        self._cursor = get_cursor() if get_cursor else None
+        self._wait_time = 0.0
+
+    def __iter__(self):
+        (prefetcher, clock) = (self._prefetcher, time.perf_counter)
+        try:
+            while True:
+                try:
+                    (item, self._cursor) = prefetcher.get(block=False)
+                except queue.Empty:
+                    started = clock()
+                    try:
+                        (item, self._cursor) = prefetcher.get()
+                    except StopIteration:
+                        return
+                    finally:
+                        self._wait_time += clock() - started
+                except StopIteration:
+                    return
+
+                yield item
+        finally:
+            prefetcher.close()
+
+    def get_cursor(self):
+        return self._cursor
+
+    def get_metrics(self):
+        get_metrics = getattr(self._store, 'get_metrics', None)
+        metrics = dict(get_metrics() if get_metrics else {})
+        metrics['read_ahead_queue_depth'] = self._prefetcher.qsize()
+        metrics['read_ahead_stall_time'] = self._prefetcher.stall_time
+        metrics['read_ahead_wait_time'] = self._wait_time
+        return metrics
+
+    def close(self):
+        self._prefetcher.close()
+
+    def _read(self):
+        get_cursor = getattr(self._store, 'get_cursor', None)
+        for item in self._items:
+            yield (item, get_cursor() if get_cursor else None)
+
+
+class _Checkpoint:
+    '''Saves the store cursor every `interval` items and once they are exhausted.
+    The cursor is saved when the next item is requested, so the previous one was already used.'''
+
+    def __init__(self, items, store, cursor_file, interval):
+        self._items = items
+        self._store = store
+        self._cursor_file = cursor_file
+        self._interval = interval
+        self._started = False
+        self._used = 0
+
+    def __iter__(self):
+        self._started = True
+        for item in self._items:
+            yield item
+            self._item_used()
+
+        self.save()
+
+    async def __aiter__(self):
+        self._started = True
+        async for item in self._items:
+            yield item
+            self._item_used()
+
+        self.save()
+
+    def _item_used(self):
+        self._used += 1
+        if self._used % self._interval == 0:
+            self.save()
+
+    def save(self):
+        if self._started:
+            self._cursor_file.save(self._store.get_cursor())
+
+
+class _CursorFile:
+    '''Persists a cursor in a json file.
+    The cursor is only loaded if it was saved for the same input, given by `key`.'''
+
+    def __init__(self, path, key):
+        self._path = path
+        self._key = key
+
+    def load(self):
+        if not os.path.exists(self._path):
+            return None
+
+        with open(self._path, encoding='utf-8') as f:
+            data = json.load(f)
+
+        if data.get('key') != self._key:
+            logger.warning(f'Ignoring cursor in {self._path}, it was saved for {data.get("key")}.')
+            return None
+
+        logger.info(f'Resuming input from cursor {data["cursor"]}.')
+        return data['cursor']
+
+    def save(self, cursor):
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        temp_path = f'{self._path}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'key': self._key, 'cursor': cursor}, f)
+        os.replace(temp_path, self._path)
+
+
 class _Iter:
+    '''Iterates the store, through `for` or `async for`, counting the urls in a local counter flushed to stats
+    every `interval` urls, every `period` seconds and once the urls are exhausted.
+    Along with the counts, the store metrics, urls per second and time to first url are set.'''
 
-    def __init__(self, crawler, spider, store):
+    def __init__(self, crawler, spider, store, normalizer=None, dedup=None, metrics=None,
+                 interval=1000, period=5.0, opened_time=None):
         self._crawler = crawler
         self._spider = spider
         self._store = store
+        self._normalizer = normalizer
+        self._dedup = dedup
+        self._metrics = metrics
+        self._interval = interval
+        self._period = period
+        self._opened_time = opened_time
+        self._prefix = f'spider_feeder/{spider.name}/'
+        self._url_count = 0
+        self._duplicate_count = 0
+        self._started_time = None
+        self._flushed_time = None
+        self._pending = 0
+        self._duplicates = 0
+        self._finished = False
 
     def __call__(self):
         yield from self
 
     def __iter__(self):
-        for item in self._store:
-            yield item
-            self._crawler.stats.inc_value(f'spider_feeder/{self._spider.name}/url_count')
+        items = self._store
+        if self._normalizer:
+            items = self._normalizer.process(items, self._rejected)
+
+        self._start()
+        try:
+            for item in items:
+                if self._accept(item[0]):
+                    yield item
+                    self._item_used()
+        finally:
+            self._finish()
+
+    async def __aiter__(self):
+        items = self._store
+        if self._normalizer:
+            items = self._normalizer.aprocess(items, self._rejected)
+
+        self._start()
+        try:
+            async for item in items:
+                if self._accept(item[0]):
+                    yield item
+                    self._item_used()
+        finally:
+            self._finish()
+
+    def close(self):
+        '''Flushes the stats of the urls read if they weren't exhausted.'''
+        if self._started_time is not None and not self._finished:
+            self._finish()
+
+    def _start(self):
+        self._started_time = self._flushed_time = time.monotonic()
+        if self._opened_time is None:
+            self._opened_time = self._started_time
+
+    def _accept(self, url):
+        '''Returns whether the url is yielded, counting it if it's a duplicate.'''
+        if self._dedup and not self._dedup.add(url):
+            self._duplicates += 1
+            return False
+
+        if not self._url_count and not self._pending:
+            self._set_value('time_to_first_url', time.monotonic() - self._opened_time)
+        return True
+
+    def _item_used(self):
+        self._pending += 1
+        if self._pending >= self._interval or time.monotonic() - self._flushed_time >= self._period:
+            self._flush()
+
+    def _finish(self):
+        self._finished = True
+        self._flush()
+
+    def _flush(self):
+        (urls, duplicates) = (self._pending, self._duplicates)
+        (self._pending, self._duplicates, self._flushed_time) = (0, 0, time.monotonic())
+        stats = self._crawler.stats
+        if urls:
+            self._url_count += urls
+            stats.inc_value(f'{self._prefix}url_count', urls)
+        if duplicates:
+            self._duplicate_count += duplicates
+            stats.inc_value(f'{self._prefix}duplicate_count', duplicates)
+
+        elapsed = time.monotonic() - self._started_time
+        if elapsed > 0:
+            self._set_value('urls_per_second', self._url_count / elapsed)
+
+        get_metrics = getattr(self._metrics, 'get_metrics', None)
+        if get_metrics:
+            for (name, value) in get_metrics().items():
+                self._set_value(name, value)
+
+    def _set_value(self, name, value):
+        self._crawler.stats.set_value(f'{self._prefix}{name}', value)
+
+    def _rejected(self, reason, count):
+        self._crawler.stats.inc_value(f'{self._prefix}rejected/{reason}', count)
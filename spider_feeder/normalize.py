@@ -0,0 +1,128 @@
+'''
+This module normalizes and validates the urls of the input before requests are built for them.
+'''
+from collections import Counter
+from urllib.parse import urlsplit
+import re
+
+from w3lib.url import canonicalize_url
+
+
+SCHEME_RE = re.compile(r'^([a-zA-Z][a-zA-Z0-9+.-]*):(?!\d)')
+
+
+class UrlNormalizer:
+    '''Strips the urls, adds `default_scheme` to urls without one and canonicalizes them if set.
+    Urls are rejected if they are empty, have no scheme (and `default_scheme` is not set),
+    have a scheme not in `schemes`, have no host or a host not allowed by the domain lists.
+    Domains match their subdomains too.
+
+    `process()` drops the rejected items, counting them by reason, and `aprocess()` does it for `async for`.
+    The counts are reported every `batch_size` items and once the items are exhausted.
+    '''
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(
+            schemes=settings.getlist('SPIDERFEEDER_URL_SCHEMES', ['http', 'https']),
+            default_scheme=settings.get('SPIDERFEEDER_URL_DEFAULT_SCHEME'),
+            allowed_domains=settings.getlist('SPIDERFEEDER_URL_ALLOWED_DOMAINS'),
+            denied_domains=settings.getlist('SPIDERFEEDER_URL_DENIED_DOMAINS'),
+            canonicalize=settings.getbool('SPIDERFEEDER_URL_CANONICALIZE', False),
+            batch_size=settings.getint('SPIDERFEEDER_URL_BATCH_SIZE', 1000),
+        )
+
+    def __init__(self, schemes=('http', 'https'), default_scheme=None, allowed_domains=(),
+                 denied_domains=(), canonicalize=False, batch_size=1000):
+        self._schemes = {scheme.lower() for scheme in schemes}
+        self._default_scheme = default_scheme
+        self._allowed_domains = _domains_re(allowed_domains)
+        self._denied_domains = _domains_re(denied_domains)
+        self._canonicalize = canonicalize
+        self._batch_size = batch_size
+
+    def process(self, items, report):
+        '''Yields the items with a valid url, normalized.
+        `report(reason, count)` is called with the number of items rejected by each reason.
+        '''
+        rejected = Counter()
+        for (i, item) in enumerate(items, 1):
+            item = self._process_item(i, item, rejected, report)
+            if item:
+                yield item
+
+        _report(rejected, report)
+
+    async def aprocess(self, items, report):
+        '''Asynchronous version of `process()`, for items read through `async for`.'''
+        rejected = Counter()
+        i = 0
+        async for item in items:
+            i += 1
+            item = self._process_item(i, item, rejected, report)
+            if item:
+                yield item
+
+        _report(rejected, report)
+
+    def _process_item(self, i, item, rejected, report):
+        '''Returns the item `i` with its url normalized or `None` if it's rejected,
+        reporting the rejected items once `batch_size` items are processed.'''
+        (url, reason) = self.normalize(item[0])
+        if reason:
+            rejected[reason] += 1
+        if i % self._batch_size == 0 and rejected:
+            _report(rejected, report)
+
+        return None if reason else (url, item[1])
+
+    def normalize(self, url):
+        '''Returns the normalized url and `None` or `None` and the reason to reject it.'''
+        if not isinstance(url, str):
+            return (None, 'invalid')
+
+        url = url.strip()
+        if not url:
+            return (None, 'empty')
+
+        if '://' not in url and not SCHEME_RE.match(url):
+            if not self._default_scheme:
+                return (None, 'no_scheme')
+            url = f'{self._default_scheme}://{url.lstrip("/")}'
+
+        try:
+            parts = urlsplit(url)
+            host = parts.hostname
+        except ValueError:
+            return (None, 'invalid')
+
+        if self._schemes and parts.scheme.lower() not in self._schemes:
+            return (None, 'scheme')
+
+        if not host:
+            return (None, 'invalid')
+
+        if self._allowed_domains and not self._allowed_domains.search(host):
+            return (None, 'domain')
+
+        if self._denied_domains and self._denied_domains.search(host):
+            return (None, 'domain')
+
+        if self._canonicalize:
+            url = canonicalize_url(url)
+
+        return (url, None)
+
+
+def _domains_re(domains):
+    if not domains:
+        return None
+
+    pattern = '|'.join(re.escape(domain.lower().lstrip('.')) for domain in domains)
+    return re.compile(rf'(^|\.)({pattern})$')
+
+
+def _report(rejected, report):
+    for (reason, count) in rejected.items():
+        report(reason, count)
+    rejected.clear()
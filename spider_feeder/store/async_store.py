@@ -0,0 +1,224 @@
+'''
+This module holds the stores iterated with `async for` on the asyncio event loop,
+so reading the input doesn't block it.
+'''
+from collections.abc import Mapping
+from urllib.parse import urlparse
+import asyncio
+import io
+import logging
+import queue
+import tempfile
+
+from scrapy.utils.misc import load_object
+
+from .base_store import BaseStore
+from .file_store import FileStore
+from .prefetch import Prefetcher
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncBaseStore(BaseStore):
+    '''Base class of the asynchronous stores.
+    `read_input_items()` is an asynchronous generator and the `(url, meta)` pairs
+    are yielded through `async for`, like `BaseStore` does through `for`.
+    '''
+
+    def __iter__(self):
+        raise TypeError(f'{type(self).__name__} is iterated with `async for`.')
+
+    async def __aiter__(self):
+        skip = self._skip
+        if skip:
+            logger.info(f'Skipping {skip} items read before.')
+            self._count = skip
+
+        input_field = self._input_field
+        async for item in self.read_input_items():
+            if skip:
+                skip -= 1
+                continue
+
+            self._count += 1
+            if input_field:
+                if not isinstance(item, Mapping):
+                    raise TypeError('Data is expected to be a dict when SPIDERFEEDER_INPUT_FIELD is set.')  # noqa
+
+                yield (item[input_field], item)
+            else:
+                yield (item, {})
+
+    async def read_input_items(self):
+        raise NotImplementedError()
+        yield
+
+
+class AsyncFileStore(AsyncBaseStore):
+    '''Asynchronous store reading files through the chunk readers in `SPIDERFEEDER_FILE_READERS`,
+    by URI scheme, like `http.iter_chunks()` for HTTP files.
+    The file format, compression and encoding are the ones of `FileStore`.
+
+    Uncompressed line-oriented files are parsed in batches of the lines read,
+    repeating the header for each batch, so records spanning multiple lines are not supported.
+    Other files are downloaded to a temporary file before being parsed in a background thread,
+    so parsing them doesn't block the event loop.
+    '''
+
+    FILE_READERS = {
+        's3': 'spider_feeder.store.file_handler.s3.iter_chunks',
+        'http': 'spider_feeder.store.file_handler.http.iter_chunks',
+        'https': 'spider_feeder.store.file_handler.http.iter_chunks',
+    }
+
+    def __init__(self, input_uri, settings):
+        super().__init__(settings)
+        self._input_file_uri = input_uri
+        self._settings = settings
+        self._input_file_encoding = settings.get('SPIDERFEEDER_INPUT_FILE_ENCODING', 'utf-8')
+        self._file_store = FileStore(input_uri, settings)
+
+        readers = settings.getdict('SPIDERFEEDER_FILE_READERS', {})
+        self._readers = dict(self.FILE_READERS, **readers)
+
+    async def read_input_items(self):
+        scheme = urlparse(self._input_file_uri).scheme
+        logger.info(f'Reading file {self._input_file_uri} with scheme {scheme}.')
+        chunks = load_object(self._readers[scheme])(self._input_file_uri, self._settings)
+
+        parser = self._file_store._get_parser()
+        if getattr(parser, 'line_oriented', False) and not self._file_store._compression:
+            items = self._parse_lines(chunks, parser)
+        else:
+            items = self._parse_file(chunks)
+
+        async for item in items:
+            yield item
+
+    async def _parse_lines(self, chunks, parser):
+        (header, pending) = (None, b'')
+        async for chunk in chunks:
+            pending += chunk
+            end = pending.rfind(b'\n') + 1
+            if end:
+                (lines, pending) = (pending[:end], pending[end:])
+                if header is None and parser.header:
+                    header = lines[:lines.find(b'\n') + 1]
+                    lines = lines[len(header):]
+
+                for item in self._parse_batch(parser, header, lines):
+                    yield item
+
+        if pending:
+            if header is None and parser.header:
+                (header, pending) = (pending, b'')
+
+            for item in self._parse_batch(parser, header, pending):
+                yield item
+
+    def _parse_batch(self, parser, header, lines):
+        if not lines:
+            return ()
+
+        fd = io.TextIOWrapper(io.BytesIO((header or b'') + lines), encoding=self._input_file_encoding)
+        return parser(fd, self._settings)
+
+    async def _parse_file(self, chunks):
+        with tempfile.TemporaryFile() as fd:
+            async for chunk in chunks:
+                fd.write(chunk)
+            fd.seek(0)
+
+            store = _DownloadedFileStore(self._input_file_uri, self._settings, fd)
+            async for item in ThreadedStore(store.read_input_items()):
+                yield item
+
+
+class _DownloadedFileStore(FileStore):
+    '''FileStore reading a file already downloaded to the binary file object fd.'''
+
+    def __init__(self, input_file_uri, settings, fd):
+        super().__init__(input_file_uri, settings)
+        self._downloaded_fd = fd
+
+    def _get_handler(self):
+        def open(file_uri, encoding, settings):
+            fd = self._downloaded_fd
+            return fd if encoding is None else io.TextIOWrapper(fd, encoding=encoding)
+
+        return open
+
+
+class ThreadedStore:
+    '''Adapts a synchronous store to `async for`, iterating it in a background thread.
+    Up to `prefetch` items are read ahead and handed to the event loop in batches.
+
+    Once `set_cursor()` is called, the cursor of the store is kept along with each item read,
+    so `get_cursor()` returns the position after the last item consumed instead of the last one read.
+    '''
+
+    def __init__(self, store, prefetch=1000):
+        self._store = store
+        self._prefetch = prefetch
+        self._prefetcher = None
+        self._track_cursor = False
+        self._cursor = None
+
+    async def __aiter__(self):
+        loop = asyncio.get_running_loop()
+        self._prefetcher = Prefetcher(self._read(), self._prefetch)
+        try:
+            while True:
+                batch = await loop.run_in_executor(None, self._get_batch)
+                if not batch:
+                    return
+
+                for (item, cursor) in batch:
+                    self._cursor = cursor
+                    yield item
+        finally:
+            self._prefetcher.close()
+
+    def set_shard(self, index, count):
+        set_shard = getattr(self._store, 'set_shard', None)
+        return bool(set_shard and set_shard(index, count))
+
+    def get_cursor(self):
+        if self._cursor is not None:
+            return self._cursor
+        return self._store.get_cursor() if self._track_cursor else None
+
+    def set_cursor(self, cursor):
+        set_cursor = getattr(self._store, 'set_cursor', None)
+        if set_cursor:
+            self._track_cursor = True
+            set_cursor(cursor)
+
+    def get_metrics(self):
+        get_metrics = getattr(self._store, 'get_metrics', None)
+        return get_metrics() if get_metrics else {}
+
+    def close(self):
+        if self._prefetcher is not None:
+            self._prefetcher.close()
+
+        close = getattr(self._store, 'close', None)
+        if close:
+            close()
+
+    def _read(self):
+        get_cursor = self._store.get_cursor if self._track_cursor else None
+        for item in self._store:
+            yield (item, get_cursor() if get_cursor else None)
+
+    def _get_batch(self):
+        '''Waits for the next item and returns it along with the other items already read.'''
+        batch = []
+        try:
+            batch.append(self._prefetcher.get())
+            while len(batch) < self._prefetch:
+                batch.append(self._prefetcher.get(block=False))
+        except (StopIteration, queue.Empty):
+            pass
+
+        return batch
@@ -1,17 +1,71 @@
+from collections.abc import Mapping
+from itertools import islice
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
 class BaseStore:
 
     def __init__(self, settings):
         self._input_field = settings.get('SPIDERFEEDER_INPUT_FIELD')
+        self._count = 0
+        self._skip = 0
+        self._parse_time = 0.0
 
     def __iter__(self):
-        for item in self.read_input_items():
-            if self._input_field:
-                if not isinstance(item, dict):
+        items = self.read_input_items()
+        if self._skip:
+            logger.info(f'Skipping {self._skip} items read before.')
+            items = islice(items, self._skip, None)
+            self._count = self._skip
+
+        # each item is timed as it's read and yielded right away, so slow stores still stream
+        (input_field, clock) = (self._input_field, time.perf_counter)
+        items = iter(items)
+        while True:
+            start = clock()
+            try:
+                item = next(items)
+            except StopIteration:
+                self._parse_time += clock() - start
+                return
+            self._parse_time += clock() - start
+
+            self._count += 1
+            if input_field:
+                if type(item) is not dict and not isinstance(item, Mapping):
                     raise TypeError('Data is expected to be a dict when SPIDERFEEDER_INPUT_FIELD is set.')  # noqa
 
-                yield (item[self._input_field], item)
+                yield (item[input_field], item)
             else:
                 yield (item, {})
 
     def read_input_items(self):
         raise NotImplementedError()
+
+    def get_metrics(self):
+        '''Returns metrics about the items read, like the seconds spent reading and parsing them.'''
+        return {'parse_time': self._parse_time}
+
+    def set_shard(self, index, count):
+        '''Restricts the items to the shard `index` out of `count`.
+        Returns `False` if the store can't read a single shard, so it is filtered by the loader.
+        '''
+        return False
+
+    def get_cursor(self):
+        '''Returns the position after the last item read, so reading can be resumed from it.'''
+        return {'count': self._count}
+
+    def set_cursor(self, cursor):
+        '''Resumes reading from a position returned by `get_cursor()` or from the start if `None`.
+        It's called before reading the items when the position is persisted.
+        By default, the items read before are read again and skipped.
+        '''
+        if cursor:
+            self._skip = self._count = cursor.get('count', 0)
+
+    def close(self):
+        pass
@@ -0,0 +1,149 @@
+'''
+This module keeps a local copy of remote files, so they are only downloaded again when they change.
+'''
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+
+from .file_handler import local
+
+logger = logging.getLogger(__name__)
+
+
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+class FileCache:
+    '''Keeps a copy of the files opened in `directory`, keyed by their uri.
+    Before a copy is used, the file is revalidated through `stat(file_uri, settings)`,
+    which returns its validators, like the ETag and the last modified date.
+    The file is downloaded again if the validators changed, if there are none or if `stat` fails.
+    A file is revalidated only once by each cache.
+
+    If `max_size` is set, the least recently used copies are evicted
+    to keep the size of the directory under `max_size` bytes.
+    '''
+
+    @classmethod
+    def from_settings(cls, settings):
+        directory = settings.get('SPIDERFEEDER_FILE_CACHE_DIR')
+        if not directory:
+            return None
+
+        return cls(directory, settings.getint('SPIDERFEEDER_FILE_CACHE_MAX_SIZE', 0))
+
+    def __init__(self, directory, max_size=0):
+        self._directory = directory
+        self._max_size = max_size
+        self._paths = {}
+
+    def wrap(self, open, stat):
+        '''Returns a file handler opening the local copy of the files opened by `open`.
+        The copy is a local file, so it supports `byte_range` and seeks.
+        '''
+        def cached_open(file_uri, encoding, settings, byte_range=None):
+            file_path = self.fetch(file_uri, open, stat, settings)
+            return local.open(file_path, encoding, settings, byte_range)
+
+        return cached_open
+
+    def fetch(self, file_uri, open, stat, settings):
+        '''Returns the path of the local copy of `file_uri`, downloading it if it changed.'''
+        if file_uri in self._paths:
+            return self._paths[file_uri]
+
+        os.makedirs(self._directory, exist_ok=True)
+        key = hashlib.sha256(file_uri.encode('utf-8')).hexdigest()
+        (data_path, meta_path) = (self._path(key, 'data'), self._path(key, 'json'))
+
+        try:
+            validators = stat(file_uri, settings)
+        except Exception as e:
+            logger.warning(f'Failed to revalidate {file_uri}, so it is downloaded again: {e!r}')
+            validators = None
+        else:
+            if not validators:
+                logger.warning(f'{file_uri} has no validators, so it is always downloaded.')
+
+        if validators and os.path.exists(data_path) and _read_validators(meta_path) == validators:
+            logger.info(f'Using the cached copy of {file_uri}.')
+            os.utime(meta_path)
+        else:
+            logger.info(f'Downloading {file_uri} to the cache.')
+            self._download(file_uri, open, settings, data_path)
+            self._write(meta_path, json.dumps({'uri': file_uri, 'validators': validators}).encode('utf-8'))
+            self._evict(key)
+
+        self._paths[file_uri] = data_path
+        return data_path
+
+    def _download(self, file_uri, open, settings, data_path):
+        with open(file_uri, encoding=None, settings=settings) as fd:
+            self._write(data_path, fd)
+
+    def _write(self, file_path, content):
+        '''Writes to a temporary file, replacing file_path once complete,
+        so a partial file is never read.'''
+        (fd, temp_path) = tempfile.mkstemp(dir=self._directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                if isinstance(content, bytes):
+                    temp_file.write(content)
+                else:
+                    shutil.copyfileobj(content, temp_file, COPY_BUFFER_SIZE)
+            os.replace(temp_path, file_path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    def _evict(self, keep):
+        '''Removes the least recently used copies, except `keep`, until the cache fits in `max_size`.'''
+        if not self._max_size:
+            return
+
+        entries = []
+        for name in os.listdir(self._directory):
+            (key, extension) = os.path.splitext(name)
+            if extension == '.data':
+                entries.append((self._last_used(key), key, os.path.getsize(self._path(key, 'data'))))
+
+        size = sum(entry_size for (_, _, entry_size) in entries)
+        for (_, key, entry_size) in sorted(entries):
+            if size <= self._max_size:
+                break
+
+            if key != keep:
+                logger.info(f'Evicting {entry_size} bytes from the cache.')
+                for extension in ('json', 'data'):
+                    _remove(self._path(key, extension))
+                size -= entry_size
+
+        if size > self._max_size:
+            logger.warning(f'The cache takes {size} bytes, more than SPIDERFEEDER_FILE_CACHE_MAX_SIZE.')
+
+    def _last_used(self, key):
+        try:
+            return os.path.getmtime(self._path(key, 'json'))
+        except OSError:
+            return 0.0
+
+    def _path(self, key, extension):
+        return os.path.join(self._directory, f'{key}.{extension}')
+
+
+def _read_validators(meta_path):
+    try:
+        with open(meta_path, 'rb') as fd:
+            return json.load(fd).get('validators')
+    except (OSError, ValueError):
+        return None
+
+
+def _remove(file_path):
+    try:
+        os.remove(file_path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,62 @@
+'''
+This module keeps the clients used by stores and file handlers, like S3 or Scrapinghub clients.
+A client is built on first use and reused by every store and handler with the same key,
+like the service, credentials and endpoint.
+Each crawler acquires the clients when its spider is opened and releases them when it's closed,
+so they are only closed once no crawler running in the process uses them.
+'''
+import threading
+
+
+class ClientPool:
+
+    def __init__(self):
+        self._clients = {}
+        self._users = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, factory):
+        '''Returns the client for `key`, calling `factory()` to build it on first use.
+        The client is built outside of the lock, so if another thread built one for `key` meanwhile,
+        the one built first is kept and the other one is closed.'''
+        client = self._clients.get(key)
+        if client is not None:
+            return client
+
+        client = factory()
+        with self._lock:
+            shared = self._clients.setdefault(key, client)
+        if shared is not client:
+            _close([client])
+        return shared
+
+    def acquire(self):
+        '''Registers a user of the clients, like a crawler, so they are kept open until it releases them.'''
+        with self._lock:
+            self._users += 1
+
+    def release(self):
+        '''Unregisters a user of the clients, closing them if there are no users left.'''
+        with self._lock:
+            self._users = max(self._users - 1, 0)
+            if self._users:
+                return
+            (clients, self._clients) = (self._clients, {})
+
+        _close(clients.values())
+
+    def close(self):
+        with self._lock:
+            (clients, self._clients) = (self._clients, {})
+
+        _close(clients.values())
+
+
+def _close(clients):
+    for client in clients:
+        close = getattr(client, 'close', None)
+        if close:
+            close()
+
+
+pool = ClientPool()
@@ -0,0 +1,51 @@
+'''
+This module handles compressed input files.
+Each decompressor receives a binary file object and returns a binary file object
+decompressing the content as it is read.
+'''
+import bz2
+import gzip
+import lzma
+
+
+MAGIC_NUMBERS = {
+    b'\x1f\x8b': 'gz',
+    b'BZh': 'bz2',
+    b'\xfd7zXZ\x00': 'xz',
+    b'\x28\xb5\x2f\xfd': 'zst',
+}
+
+
+def detect(fd):
+    '''Returns the compression matching the magic number at the start of fd or `None`.
+    fd must support `peek()` so the content is not consumed.
+    '''
+    head = fd.peek(max(len(magic) for magic in MAGIC_NUMBERS))
+    for (magic, compression) in MAGIC_NUMBERS.items():
+        if head.startswith(magic):
+            return compression
+
+    return None
+
+
+def open_gzip(fd):
+    return gzip.GzipFile(fileobj=fd, mode='rb')
+
+
+def open_bz2(fd):
+    return bz2.BZ2File(fd, mode='rb')
+
+
+def open_xz(fd):
+    return lzma.LZMAFile(fd, mode='rb')
+
+
+def open_zstd(fd):
+    '''Requires `zstandard` or Python's `compression.zstd` (3.14+).'''
+    try:
+        import zstandard
+    except ImportError:
+        from compression.zstd import ZstdFile
+        return ZstdFile(fd, mode='rb')
+
+    return zstandard.ZstdDecompressor().stream_reader(fd, read_across_frames=True)
@@ -0,0 +1,325 @@
+'''
+This module compiles input files into a binary index, so they are parsed only once.
+
+The index holds the urls and the other fields of the records, encoded as JSON, in two blobs,
+along with a table of the offsets where each record ends in them:
+
+    header | offsets (url end, meta end) * count | urls | meta
+
+The offsets are 64-bit integers in the byte order of the machine compiling the index,
+which is identified by the magic number.
+The header also holds the validators of the source, its size and modification time or its ETag,
+and a checksum of the content of local files, so an index is compiled again if the source changed.
+
+The index of a file can be compiled ahead of time with:
+
+    python -m spider_feeder.store.feed_index <input_uri> [-o <index_path>] [-s NAME=VALUE ...]
+'''
+from array import array
+from urllib.parse import urlparse
+import argparse
+import functools
+import hashlib
+import json
+import logging
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+
+from scrapy.utils.misc import load_object
+
+from .base_store import BaseStore
+from .file_store import FileStore
+from .parser import get_json_loads
+
+logger = logging.getLogger(__name__)
+
+
+MAGIC = b'SFIDX2' + (b'LE' if sys.byteorder == 'little' else b'BE')
+HEADER = struct.Struct('=8sQQQ32s32s')  # magic, count, urls start, meta start, validators, checksum
+VALIDATORS_OFFSET = struct.calcsize('=8sQQQ')
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+# settings changing the records parsed from a file, so they are part of the index key
+PARSE_SETTINGS = (
+    'SPIDERFEEDER_INPUT_FIELD',
+    'SPIDERFEEDER_INPUT_FORMAT',
+    'SPIDERFEEDER_INPUT_COMPRESSION',
+    'SPIDERFEEDER_INPUT_FILE_ENCODING',
+    'SPIDERFEEDER_INPUT_COLUMNS',
+    'SPIDERFEEDER_INPUT_URLS_ONLY',
+    'SPIDERFEEDER_CSV_DIALECT',
+    'SPIDERFEEDER_CSV_DELIMITER',
+    'SPIDERFEEDER_CSV_QUOTING',
+)
+
+
+class FeedIndexStore(BaseStore):
+    '''Store reading a file from its index in `SPIDERFEEDER_INDEX_DIR`.
+    The first time a file is read, it's parsed by `FileStore` and compiled into the index.
+    Afterwards, the index is reused while the validators of the file match the ones of the index.
+    Local files are validated by their size and modification time, and only hashed when these change,
+    so the index is still reused if the content is the same.
+    Remote files are validated by the validators in `SPIDERFEEDER_FILE_VALIDATORS`, like their ETag.
+    If there are none, the index is compiled every time.
+
+    The index is memory-mapped, so shards and cursors start reading from their record
+    without reading the previous ones.
+    '''
+
+    def __init__(self, input_uri, settings):
+        super().__init__(settings)
+        self._input_uri = input_uri
+        self._settings = settings
+        self._index_dir = settings.get('SPIDERFEEDER_INDEX_DIR', '.spider_feeder')
+        self._index = None
+        self._shard = None
+        self._start = 0
+
+    @classmethod
+    def expand_uri(cls, input_uri, settings):
+        return FileStore.expand_uri(input_uri, settings)
+
+    def set_shard(self, index, count):
+        self._shard = (index, count)
+        return True
+
+    def set_cursor(self, cursor):
+        if cursor:
+            self._start = self._count = cursor.get('count', 0)
+
+    def read_input_items(self):
+        index = self._open()
+        (start, end) = (0, len(index))
+        if self._shard:
+            (shard_index, shard_count) = self._shard
+            (start, end) = (end * shard_index // shard_count, end * (shard_index + 1) // shard_count)
+
+        logger.info(f'Reading records [{start + self._start}, {end}) of {self._input_uri} from its index.')
+        (input_field, record, url) = (self._input_field, index.record, index.url)
+        for i in range(start + self._start, end):
+            yield record(i, input_field) if input_field else url(i)
+
+    def close(self):
+        if self._index is not None:
+            self._index.close()
+            self._index = None
+
+    def _open(self):
+        if self._index is None:
+            index_path = get_index_path(self._index_dir, self._input_uri, self._settings)
+            validators = source_validators(self._input_uri, self._settings)
+            checksum = functools.lru_cache()(functools.partial(source_checksum, self._input_uri))
+            self._index = FeedIndex.open(index_path, validators, checksum) if validators else None
+            if self._index is None:
+                compile_index(self._input_uri, index_path, self._settings, validators, checksum())
+                self._index = FeedIndex.open(index_path, validators)
+            else:
+                logger.info(f'Reusing the index {index_path} of {self._input_uri}.')
+
+        return self._index
+
+
+class FeedIndex:
+    '''Memory-mapped index of the records of a file.'''
+
+    @classmethod
+    def open(cls, index_path, validators=None, checksum=None):
+        '''Returns the index in `index_path` or `None` if it doesn't exist, is invalid or
+        the validators don't match.
+        If the validators changed, `checksum` is called to compute the checksum of the source and,
+        if it matches the one of the index, the validators of the index are updated.'''
+        try:
+            fd = open(index_path, 'rb')
+        except FileNotFoundError:
+            return None
+
+        with fd:
+            header = fd.read(HEADER.size)
+            if len(header) < HEADER.size:
+                return None
+
+            (magic, count, urls_start, meta_start, index_validators, index_checksum) = HEADER.unpack(header)
+            if magic != MAGIC:
+                return None
+
+            if validators is not None and index_validators != validators:
+                source_checksum = checksum() if checksum else None
+                if source_checksum is None or source_checksum != index_checksum:
+                    return None
+
+                logger.info(f'The source of the index {index_path} is unchanged, updating its validators.')
+                with open(index_path, 'r+b') as index_file:
+                    index_file.seek(VALIDATORS_OFFSET)
+                    index_file.write(validators)
+
+            return cls(mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ), count, urls_start, meta_start)
+
+    def __init__(self, mapped, count, urls_start, meta_start):
+        self._mmap = mapped
+        self._count = count
+        self._offsets = memoryview(mapped)[HEADER.size:HEADER.size + count * 16].cast('Q')
+        self._urls_start = urls_start
+        self._meta_start = meta_start
+        self._loads = get_json_loads()
+
+    def __len__(self):
+        return self._count
+
+    def url(self, i):
+        offsets = self._offsets
+        start = offsets[2 * i - 2] if i else 0
+        return self._mmap[self._urls_start + start:self._urls_start + offsets[2 * i]].decode('utf-8')
+
+    def record(self, i, url_field):
+        offsets = self._offsets
+        start = offsets[2 * i - 1] if i else 0
+        raw = self._mmap[self._meta_start + start:self._meta_start + offsets[2 * i + 1]]
+        fields = self._loads(raw) if raw else {}
+        # the url is only kept apart if it's a string
+        if url_field:
+            fields.setdefault(url_field, self.url(i))
+        return fields
+
+    def close(self):
+        self._offsets.release()
+        self._mmap.close()
+
+
+def compile_index(input_uri, index_path, settings, validators=None, checksum=None):
+    '''Parses `input_uri` with `FileStore` and writes the index of its records to `index_path`.
+    Returns the number of records.
+    '''
+    logger.info(f'Compiling {input_uri} into the index {index_path}.')
+    index_dir = os.path.dirname(os.path.abspath(index_path))
+    os.makedirs(index_dir, exist_ok=True)
+
+    store = FileStore(input_uri, settings)
+    url_field = settings.get('SPIDERFEEDER_INPUT_FIELD')
+    with tempfile.TemporaryFile(dir=index_dir) as urls, tempfile.TemporaryFile(dir=index_dir) as meta:
+        offsets = array('Q')
+        with tempfile.TemporaryFile(dir=index_dir) as offsets_file:
+            (url_end, meta_end, count) = (0, 0, 0)
+            try:
+                for (url, item) in store:
+                    (url, fields) = _encode(url, item, url_field)
+                    (url_end, meta_end, count) = (url_end + len(url), meta_end + len(fields), count + 1)
+                    urls.write(url)
+                    meta.write(fields)
+                    offsets.extend((url_end, meta_end))
+                    if len(offsets) * offsets.itemsize >= WRITE_BUFFER_SIZE:
+                        offsets.tofile(offsets_file)
+                        del offsets[:]
+            finally:
+                store.close()
+
+            offsets.tofile(offsets_file)
+            urls_start = HEADER.size + count * 16
+            header = HEADER.pack(
+                MAGIC, count, urls_start, urls_start + url_end, validators or b'', checksum or b''
+            )
+            _write(index_path, header, [offsets_file, urls, meta])
+
+    logger.info(f'Compiled {count} records of {input_uri} into {index_path}.')
+    return count
+
+
+def _encode(url, item, url_field):
+    if not url_field:
+        return (str(url).encode('utf-8'), b'')
+
+    fields = dict(item)
+    if isinstance(url, str):
+        del fields[url_field]
+    else:
+        url = ''
+
+    fields = json.dumps(fields, ensure_ascii=False, default=str).encode('utf-8') if fields else b''
+    return (url.encode('utf-8'), fields)
+
+
+def get_index_path(index_dir, input_uri, settings):
+    '''Returns the path of the index of `input_uri` parsed with `settings` in `index_dir`.'''
+    key = json.dumps([input_uri] + [settings.get(name) for name in PARSE_SETTINGS], default=str)
+    return os.path.join(index_dir, f'{hashlib.sha256(key.encode("utf-8")).hexdigest()}.idx')
+
+
+def source_validators(input_uri, settings):
+    '''Returns a digest of the validators of the file in `input_uri` or `None` if it has none.
+    Local files are identified by their size and modification time,
+    while remote files are identified by the validators in `SPIDERFEEDER_FILE_VALIDATORS`, like the ETag.
+    '''
+    scheme = urlparse(input_uri).scheme
+    if scheme in ('', 'file'):
+        stat = os.stat(input_uri.replace('file://', ''))
+        file_validators = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    else:
+        validators = dict(FileStore.FILE_VALIDATORS, **settings.getdict('SPIDERFEEDER_FILE_VALIDATORS', {}))
+        if scheme not in validators:
+            return None
+
+        file_validators = load_object(validators[scheme])(input_uri, settings)
+        if not file_validators:
+            return None
+
+    return hashlib.blake2b(json.dumps(file_validators, sort_keys=True).encode('utf-8'), digest_size=32).digest()
+
+
+def source_checksum(input_uri):
+    '''Returns a checksum of the content of the file in `input_uri` or `None` if it isn't a local file.'''
+    if urlparse(input_uri).scheme not in ('', 'file'):
+        return None
+
+    digest = hashlib.blake2b(digest_size=32)
+    with open(input_uri.replace('file://', ''), 'rb') as fd:
+        for chunk in iter(lambda: fd.read(WRITE_BUFFER_SIZE), b''):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def _write(index_path, header, parts):
+    '''Writes the header and the parts to a temporary file, replacing index_path once complete.'''
+    (fd, temp_path) = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(index_path)), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as index_file:
+            index_file.write(header)
+            for part in parts:
+                part.seek(0)
+                shutil.copyfileobj(part, index_file, WRITE_BUFFER_SIZE)
+        os.replace(temp_path, index_path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def main(argv=None):
+    from scrapy.utils.project import get_project_settings
+
+    argparser = argparse.ArgumentParser(description='Compiles an input file into a binary index.')
+    argparser.add_argument('input_uri')
+    argparser.add_argument('-o', '--output', help='index path, DEFAULT = the one in SPIDERFEEDER_INDEX_DIR')
+    argparser.add_argument('-s', '--set', action='append', default=[], metavar='NAME=VALUE',
+                           help='set or override a setting')
+    args = argparser.parse_args(argv)
+
+    settings = get_project_settings()
+    settings.setdict(dict(option.split('=', 1) for option in args.set), priority='cmdline')
+    index_path = args.output or get_index_path(
+        settings.get('SPIDERFEEDER_INDEX_DIR', '.spider_feeder'), args.input_uri, settings
+    )
+    compile_index(
+        args.input_uri,
+        index_path,
+        settings,
+        source_validators(args.input_uri, settings),
+        source_checksum(args.input_uri)
+    )
+    return index_path
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    print(main())
@@ -0,0 +1,182 @@
+'''
+This module reads byte ranges of line-oriented files.
+A range `[start, end)` holds every line starting at an offset in it,
+so splitting a file into consecutive ranges never splits a line.
+'''
+import io
+
+
+def open_byte_range(fd, byte_range):
+    '''Returns a binary file object reading the lines of `byte_range` from fd.
+    fd must be a seekable binary file object and `end` may be `None` to read until the end of file.
+    '''
+    (start, end) = byte_range
+    fd.seek(max(start - 1, 0))
+    return io.BufferedReader(LineRangeReader(fd, start, end))
+
+
+class LineRangeReader(io.RawIOBase):
+    '''Binary file object reading the lines starting in `[start, end)` from fd.
+    fd must be positioned at `start - 1`, so the line ending there is skipped.
+    '''
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, fd, start, end):
+        self._fd = fd
+        self._position = max(start - 1, 0)
+        self._skip = start > 0
+        self._end = end
+        self._done = False
+        self._last_line = False
+        self._pending = memoryview(b'')
+        self._offset = 0
+
+    def readable(self):
+        return True
+
+    def tell(self):
+        '''Returns the number of bytes read, as the position in the lines of the range.'''
+        return self._offset
+
+    def readinto(self, buffer):
+        while not self._pending:
+            if self._done:
+                return 0
+
+            self._pending = memoryview(self._read_chunk())
+
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        self._offset += size
+        return size
+
+    def close(self):
+        self._fd.close()
+        super().close()
+
+    def _read_chunk(self):
+        chunk = self._fd.read(self.CHUNK_SIZE)
+        if not chunk:
+            self._done = True
+            return b''
+
+        chunk_start = self._position
+        self._position += len(chunk)
+
+        if self._skip:
+            line_end = chunk.find(b'\n')
+            if line_end < 0:
+                return b''
+
+            self._skip = False
+            chunk = chunk[line_end + 1:]
+            chunk_start += line_end + 1
+
+        if self._end is None:
+            return chunk
+
+        if not self._last_line and chunk_start >= self._end:
+            self._done = True
+            return b''
+
+        # the last line is the one holding the byte before `end`
+        search_start = 0 if self._last_line else self._end - 1 - chunk_start
+        if search_start < len(chunk):
+            line_end = chunk.find(b'\n', search_start)
+            if line_end >= 0:
+                self._done = True
+                return chunk[:line_end + 1]
+
+            self._last_line = True
+
+        return chunk
+
+
+class PrefixedReader(io.RawIOBase):
+    '''Binary file object reading `prefix` before the content of fd.'''
+
+    def __init__(self, prefix, fd):
+        self._prefix = memoryview(prefix)
+        self._fd = fd
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if not self._prefix:
+            return self._fd.readinto(buffer)
+
+        size = min(len(buffer), len(self._prefix))
+        buffer[:size] = self._prefix[:size]
+        self._prefix = self._prefix[size:]
+        return size
+
+    def close(self):
+        self._fd.close()
+        super().close()
+
+
+class CountingReader(io.RawIOBase):
+    '''Binary file object counting the bytes read from fd.
+    It's seekable if fd is seekable, so only the bytes actually read are counted.'''
+
+    def __init__(self, fd):
+        self._fd = fd
+        self.count = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return self._fd.seekable()
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        return self._fd.seek(offset, whence)
+
+    def tell(self):
+        return self._fd.tell()
+
+    def readinto(self, buffer):
+        size = self._fd.readinto(buffer)
+        self.count += size or 0
+        return size
+
+    def close(self):
+        self._fd.close()
+        super().close()
+
+
+class LineReader:
+    '''Iterates the lines of a binary file object as text, tracking the byte offset of the next line.
+    fd may also be a text file object whose `tell()` is the byte offset of the next line, like `MmapFile`,
+    so its lines are yielded as they are.
+    If `header` is given, it's read first, without changing the offset.
+    '''
+
+    def __init__(self, fd, encoding, offset=0, header=b''):
+        self._fd = fd
+        self._encoding = encoding
+        self._offset = offset
+        self._header = header
+        self._text = isinstance(fd, io.TextIOBase)
+
+    def __iter__(self):
+        encoding = self._encoding
+        if self._header:
+            yield self._header.decode(encoding)
+
+        if self._text:
+            yield from self._fd
+            return
+
+        for line in self._fd:
+            self._offset += len(line)
+            yield line.decode(encoding)
+
+    def tell(self):
+        return self._fd.tell() if self._text else self._offset
+
+    def close(self):
+        self._fd.close()
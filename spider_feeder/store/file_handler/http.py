@@ -1,7 +1,307 @@
-from io import StringIO
-from urllib.request import urlopen
+'''
+This module handles `open()` for files served through HTTP or HTTPS.
+
+The response is streamed and decoded incrementally, so it is never fully loaded into memory.
+`gzip` and `deflate` content encodings are decompressed transparently.
+Connections are kept alive and reused when several files are loaded from the same host.
+Like `urllib`, requests are sent through the proxies in `HTTP_PROXY` and `HTTPS_PROXY`, unless the host
+is in `NO_PROXY`, and they time out after `SPIDERFEEDER_HTTP_TIMEOUT` seconds without a response.
+If `encoding` is `None`, a binary file object is returned.
+`stat()` returns the `ETag` and `Last-Modified` headers of a file through a `HEAD` request,
+or through a `GET` request, without reading the body, if the server rejects `HEAD`.
+`iter_chunks()` reads a file with `async for` through `aiohttp`, without blocking the event loop.
+'''
+from urllib.error import HTTPError
+from urllib.parse import unquote, urljoin, urlparse
+from urllib.request import getproxies, proxy_bypass
+import base64
+import http.client
+import io
+import logging
+import threading
+import zlib
+
+from ..clients import pool as clients
+
+logger = logging.getLogger(__name__)
+
+
+CHUNK_SIZE = 64 * 1024
+TIMEOUT = 60.0
+MAX_REDIRECTS = 10
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+# statuses of servers rejecting HEAD requests, like presigned urls only valid for GET
+HEAD_REJECTED_STATUSES = (403, 405, 501)
+HEADERS = {
+    'Accept-Encoding': 'gzip, deflate',
+}
 
 
 def open(url, encoding, settings):
-    response = urlopen(url)
-    return StringIO(response.read())
+    response = _decode_content(_request(url, timeout=_get_timeout(settings)))
+    if encoding is None:
+        return io.BufferedReader(response)
+
+    return io.TextIOWrapper(io.BufferedReader(response), encoding=encoding)
+
+
+def stat(url, settings):
+    '''Returns the validators of the file, so a copy of it can be revalidated.'''
+    timeout = _get_timeout(settings)
+    try:
+        response = _request(url, 'HEAD', timeout)
+        # the empty body is read, so the connection is reused
+        response.read()
+    except HTTPError as e:
+        if e.code not in HEAD_REJECTED_STATUSES:
+            raise
+
+        # the body isn't read, so the connection is closed instead of being reused
+        logger.info(f'HEAD request to {url} failed with status {e.code}, sending a GET request.')
+        response = _request(url, 'GET', timeout)
+
+    with response:
+        validators = {
+            'etag': response.getheader('ETag'),
+            'last_modified': response.getheader('Last-Modified'),
+        }
+
+    return {name: value for (name, value) in validators.items() if value}
+
+
+async def iter_chunks(url, settings, chunk_size=CHUNK_SIZE):
+    '''Yields the decoded body of the file in chunks of bytes. Requires `aiohttp`.'''
+    import aiohttp
+
+    timeout = _get_timeout(settings)
+    timeout = aiohttp.ClientTimeout(sock_connect=timeout, sock_read=timeout)
+    async with aiohttp.ClientSession(timeout=timeout, trust_env=True) as session:
+        async with session.get(url, raise_for_status=True) as response:
+            async for chunk in response.content.iter_chunked(chunk_size):
+                yield chunk
+
+
+def _get_timeout(settings):
+    return settings.getfloat('SPIDERFEEDER_HTTP_TIMEOUT', TIMEOUT) if settings else TIMEOUT
+
+
+def _request(url, method='GET', timeout=TIMEOUT):
+    for _ in range(MAX_REDIRECTS + 1):
+        response = _get(url, method, timeout)
+        if response.status not in REDIRECT_STATUSES:
+            break
+
+        location = response.getheader('Location')
+        response.close()
+        url = urljoin(url, location)
+        logger.info(f'Redirected to {url}.')
+    else:
+        raise HTTPError(url, response.status, 'Too many redirects', response.headers, None)
+
+    if response.status >= 400:
+        response.close()
+        raise HTTPError(url, response.status, response.reason, response.headers, None)
+
+    return response
+
+
+def _get(url, method='GET', timeout=TIMEOUT):
+    parsed = urlparse(url)
+    path = parsed.path or '/'
+    if parsed.query:
+        path = f'{path}?{parsed.query}'
+
+    headers = HEADERS
+    proxy = _get_proxy(parsed)
+    if proxy and parsed.scheme == 'http':
+        # plain requests are sent to the proxy with the absolute url, while https ones are tunneled
+        path = f'http://{parsed.netloc}{path}'
+        headers = dict(HEADERS, **proxy[1])
+
+    pool = clients.get('http', ConnectionPool)
+    connection = pool.acquire(parsed.scheme, parsed.netloc, proxy=proxy, timeout=timeout)
+    try:
+        connection.request(method, path, headers=headers)
+        response = connection.getresponse()
+    except (http.client.RemoteDisconnected, ConnectionError):
+        # a kept-alive connection may have been closed by the server, so retry with a new one
+        connection.close()
+        connection = pool.acquire(parsed.scheme, parsed.netloc, reuse=False, proxy=proxy, timeout=timeout)
+        connection.request(method, path, headers=headers)
+        response = connection.getresponse()
+
+    return PooledResponse(response, connection, pool, (parsed.scheme, parsed.netloc))
+
+
+def _decode_content(response):
+    content_encoding = (response.getheader('Content-Encoding') or '').strip().lower()
+    if content_encoding in ('gzip', 'x-gzip'):
+        return DecompressReader(response, zlib.MAX_WBITS | 16)
+
+    if content_encoding == 'deflate':
+        return DecompressReader(response, zlib.MAX_WBITS)
+
+    return response
+
+
+def _get_proxy(parsed):
+    '''Returns the netloc of the proxy for the url and the headers authenticating to it,
+    or `None` if the url isn't requested through a proxy.'''
+    proxy = getproxies().get(parsed.scheme)
+    if not proxy or proxy_bypass(parsed.hostname or ''):
+        return None
+
+    proxy = urlparse(proxy if '://' in proxy else f'http://{proxy}')
+    headers = {}
+    if proxy.username:
+        credentials = f'{unquote(proxy.username)}:{unquote(proxy.password or "")}'.encode('utf-8')
+        headers['Proxy-Authorization'] = f'Basic {base64.b64encode(credentials).decode("ascii")}'
+
+    return (proxy.netloc.rpartition('@')[2], headers)
+
+
+class ConnectionPool:
+    '''Keeps idle connections by scheme and host so they can be reused.'''
+
+    def __init__(self):
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, scheme, netloc, reuse=True, proxy=None, timeout=TIMEOUT):
+        '''Returns an idle connection to `netloc` or a new one, through `proxy` if given.
+        `proxy` is the netloc of the proxy and the headers authenticating to it.'''
+        key = (scheme, netloc)
+        if reuse:
+            with self._lock:
+                connections = self._idle.get(key)
+                if connections:
+                    return connections.pop()
+
+        if proxy is None:
+            if scheme == 'https':
+                return http.client.HTTPSConnection(netloc, timeout=timeout)
+            return http.client.HTTPConnection(netloc, timeout=timeout)
+
+        (proxy_netloc, proxy_headers) = proxy
+        if scheme == 'https':
+            connection = http.client.HTTPSConnection(proxy_netloc, timeout=timeout)
+            connection.set_tunnel(netloc, headers=proxy_headers)
+            return connection
+
+        return http.client.HTTPConnection(proxy_netloc, timeout=timeout)
+
+    def release(self, key, connection):
+        with self._lock:
+            self._idle.setdefault(key, []).append(connection)
+
+    def close(self):
+        with self._lock:
+            (idle, self._idle) = (self._idle, {})
+
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+
+class PooledResponse(io.RawIOBase):
+    '''Binary file object streaming a response body.
+    Once the body is fully read, the connection is given back to the pool.
+    '''
+
+    def __init__(self, response, connection, pool, key):
+        self._response = response
+        self._connection = connection
+        self._pool = pool
+        self._key = key
+        self._position = 0
+
+    @property
+    def status(self):
+        return self._response.status
+
+    @property
+    def reason(self):
+        return self._response.reason
+
+    @property
+    def headers(self):
+        return self._response.headers
+
+    def getheader(self, name):
+        return self._response.getheader(name)
+
+    def readable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def readinto(self, buffer):
+        size = self._response.readinto(buffer)
+        self._position += size
+        return size
+
+    def close(self):
+        if self._connection is not None:
+            (connection, self._connection) = (self._connection, None)
+            if self._response.isclosed() and not self._response.will_close:
+                self._pool.release(self._key, connection)
+            else:
+                self._response.close()
+                connection.close()
+        super().close()
+
+
+class DecompressReader(io.RawIOBase):
+    '''Binary file object decompressing a `zlib` compatible stream as it is read.
+    A `zlib` stream without its header is decompressed as a raw `deflate` stream,
+    as some servers send them for the `deflate` content encoding.'''
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, fd, wbits):
+        self._fd = fd
+        self._decompressor = zlib.decompressobj(wbits)
+        self._pending = memoryview(b'')
+        self._raw_fallback = wbits == zlib.MAX_WBITS
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending:
+            if self._decompressor.eof:
+                # consume the end of the response, so the connection can be reused
+                self._fd.read()
+                return 0
+
+            chunk = self._fd.read(self.CHUNK_SIZE)
+            if not chunk:
+                self._pending = memoryview(self._decompressor.flush())
+                if not self._pending:
+                    return 0
+                break
+
+            self._pending = memoryview(self._decompress(chunk))
+
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+    def close(self):
+        self._fd.close()
+        super().close()
+
+    def _decompress(self, chunk):
+        try:
+            data = self._decompressor.decompress(chunk)
+        except zlib.error:
+            if not self._raw_fallback:
+                raise
+            self._decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+            data = self._decompressor.decompress(chunk)
+
+        if data:
+            self._raw_fallback = False
+        return data
@@ -1,9 +1,140 @@
 '''
 This module handles `open()` for local files.
+If `encoding` is `None`, the file is opened in binary mode.
+If `byte_range` is given, only the lines starting in `[start, end)` are read.
+If `SPIDERFEEDER_LOCAL_MMAP` is set, text files are memory-mapped and read through `MmapFile`.
+`glob()` lists the files matching a pattern, like `/data/*.csv`.
 '''
 import builtins
+import codecs
+import glob as globbing
+import io
+import mmap
+import os
 
+from .byte_range import open_byte_range
 
-def open(file_uri, encoding, settings):
+
+def open(file_uri, encoding, settings, byte_range=None):
     file_path = file_uri.replace('file://', '')
+    if encoding is not None and settings.getbool('SPIDERFEEDER_LOCAL_MMAP', False):
+        return MmapFile(file_path, encoding, byte_range)
+
+    if byte_range:
+        fd = open_byte_range(builtins.open(file_path, 'rb'), byte_range)
+        if encoding is None:
+            return fd
+        return io.TextIOWrapper(fd, encoding=encoding)
+
+    if encoding is None:
+        return builtins.open(file_path, 'rb')
+
     return builtins.open(file_path, encoding=encoding)
+
+
+def glob(file_uri, settings):
+    '''Returns the uris of the files matching the glob pattern in `file_uri`.'''
+    scheme = 'file://' if file_uri.startswith('file://') else ''
+    file_path = file_uri.replace('file://', '')
+    return [f'{scheme}{path}' for path in sorted(globbing.glob(file_path))]
+
+
+class MmapFile(io.TextIOBase):
+    '''Text file object reading a memory-mapped file.
+    Lines are split over the mapped bytes and only decoded when they are read,
+    so the file content is never copied as a whole.
+    `tell()` and `seek()` work with byte offsets, so reading can start from any line.
+    If `byte_range` is given, only the lines starting in `[start, end)` are read.
+    The encoding must be ASCII compatible, like _utf-8_ or _latin-1_.
+    '''
+
+    BLOCK_SIZE = 1024 * 1024
+
+    def __init__(self, file_path, encoding, byte_range=None):
+        self._file = builtins.open(file_path, 'rb')
+        self._encoding = encoding
+        size = os.fstat(self._file.fileno()).st_size
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+
+        (start, end) = byte_range or (0, None)
+        self._start = self._line_start(start)
+        self._end = self._line_start(end) if end is not None else size
+        self._position = self._start
+        self._decoder = codecs.getincrementaldecoder(encoding)()
+
+    @property
+    def encoding(self):
+        return self._encoding
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence != io.SEEK_SET:
+            raise io.UnsupportedOperation('MmapFile only seeks from the start of the file.')
+
+        self._position = min(max(offset, self._start), self._end)
+        self._decoder.reset()
+        return self._position
+
+    def __iter__(self):
+        return self._iter_lines()
+
+    def _iter_lines(self):
+        '''Splits blocks of lines at once, decoding each line when it is yielded.'''
+        while self._position < self._end:
+            block_end = min(self._position + self.BLOCK_SIZE, self._end)
+            if block_end < self._end:
+                block_end = self._mmap.find(b'\n', block_end - 1, self._end) + 1 or self._end
+
+            (position, encoding) = (self._position, self._encoding)
+            for line in self._mmap[position:block_end].splitlines(keepends=True):
+                position += len(line)
+                self._position = position
+                yield line.decode(encoding)
+
+    def readline(self, size=-1):
+        if self._position >= self._end:
+            return ''
+
+        line_end = self._mmap.find(b'\n', self._position, self._end)
+        line_end = self._end if line_end < 0 else line_end + 1
+        if size is not None and size >= 0:
+            line_end = min(line_end, self._position + size)
+
+        return self._decode(line_end)
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            return self._decode(self._end, final=True)
+
+        content = ''
+        while not content and self._position < self._end:
+            content = self._decode(min(self._position + size, self._end))
+        return content
+
+    def close(self):
+        if not self.closed:
+            if self._mmap:
+                self._mmap.close()
+            self._file.close()
+        super().close()
+
+    def _decode(self, end, final=False):
+        content = self._mmap[self._position:end]
+        self._position = end
+        return self._decoder.decode(content, final or end >= self._end)
+
+    def _line_start(self, offset):
+        '''Returns the start of the first line starting at offset or after it.'''
+        if offset <= 0:
+            return 0
+
+        line_end = self._mmap.find(b'\n', offset - 1)
+        return len(self._mmap) if line_end < 0 else line_end + 1
@@ -1,36 +1,280 @@
 '''
 This module handles `open()` for files stored in AWS S3.
+
+The object is streamed and decoded incrementally, so it is never fully loaded into memory.
+If `encoding` is `None`, a binary file object is returned.
+If `byte_range` is given, only the lines starting in `[start, end)` are read.
+The client is shared by every object opened with the same credentials.
+`glob()` lists the objects matching a pattern, like `s3://bucket/prefix/*.csv`.
+`stat()` returns the `ETag` and the last modified date of an object through a `HEAD` request.
+`iter_chunks()` reads an object with `async for`, running the blocking botocore calls in threads.
+If `SPIDERFEEDER_S3_DOWNLOAD_WORKERS` is set, the object is downloaded in parts of
+`SPIDERFEEDER_S3_PART_SIZE` bytes through concurrent ranged GETs and read in order.
 '''
-from io import StringIO
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatchcase
 from urllib.parse import urlparse
+import asyncio
+import functools
+import io
 import logging
+import re
 
 from botocore.session import get_session
 
+from ..clients import pool
+from .byte_range import open_byte_range
+
 
 logger = logging.getLogger(__name__)
 
 
-def open(blob_uri, encoding, settings):
-    parsed = urlparse(blob_uri)
+CHUNK_SIZE = 64 * 1024
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
 
-    (aws_access_key_id, aws_secret_access_key) = _get_aws_keys(parsed, settings)
-    session = get_session()
-    client = session.create_client(
-        's3',
-        aws_access_key_id=aws_access_key_id,
-        aws_secret_access_key=aws_secret_access_key,
-    )
 
+def open(blob_uri, encoding, settings, byte_range=None):
+    parsed = urlparse(blob_uri)
+
+    client = _get_client(parsed, settings)
     bucket_name = parsed.hostname
     key_name = parsed.path[1:]
-    response = client.get_object(
-        Bucket=bucket_name,
-        Key=key_name,
-        ResponseContentEncoding=encoding
+
+    workers = settings.getint('SPIDERFEEDER_S3_DOWNLOAD_WORKERS', 0)
+    if byte_range:
+        fd = open_byte_range(S3Reader(client, bucket_name, key_name, encoding), byte_range)
+    elif workers > 0:
+        part_size = settings.getint('SPIDERFEEDER_S3_PART_SIZE', DEFAULT_PART_SIZE)
+        fd = io.BufferedReader(
+            S3PartsReader(client, bucket_name, key_name, encoding, part_size, workers)
+        )
+    else:
+        fd = io.BufferedReader(S3Reader(client, bucket_name, key_name, encoding))
+
+    if encoding is None:
+        return fd
+
+    return io.TextIOWrapper(fd, encoding=encoding)
+
+
+def glob(blob_uri, settings):
+    '''Returns the uris of the objects matching the glob pattern in the key of `blob_uri`.'''
+    parsed = urlparse(blob_uri)
+    client = _get_client(parsed, settings)
+    pattern = parsed.path[1:]
+    prefix = re.split(r'[*?\[]', pattern, 1)[0]
+
+    uris = []
+    paginator = client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=parsed.hostname, Prefix=prefix):
+        for blob in page.get('Contents', []):
+            if fnmatchcase(blob['Key'], pattern):
+                uris.append(f'{parsed.scheme}://{parsed.netloc}/{blob["Key"]}')
+
+    return sorted(uris)
+
+
+def stat(blob_uri, settings):
+    '''Returns the validators of the object, so a copy of it can be revalidated.'''
+    parsed = urlparse(blob_uri)
+    response = _get_client(parsed, settings).head_object(Bucket=parsed.hostname, Key=parsed.path[1:])
+    validators = {
+        'etag': response.get('ETag'),
+        'last_modified': response['LastModified'].isoformat() if response.get('LastModified') else None,
+    }
+    return {name: value for (name, value) in validators.items() if value}
+
+
+async def iter_chunks(blob_uri, settings, chunk_size=CHUNK_SIZE):
+    '''Yields the body of the object in chunks of bytes.'''
+    loop = asyncio.get_running_loop()
+    parsed = urlparse(blob_uri)
+    client = await loop.run_in_executor(None, _get_client, parsed, settings)
+    get_object = functools.partial(client.get_object, Bucket=parsed.hostname, Key=parsed.path[1:])
+    body = (await loop.run_in_executor(None, get_object))['Body']
+    try:
+        while True:
+            chunk = await loop.run_in_executor(None, body.read, chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    finally:
+        body.close()
+
+
+def _get_client(parsed, settings):
+    (aws_access_key_id, aws_secret_access_key) = _get_aws_keys(parsed, settings)
+    return pool.get(
+        ('s3', aws_access_key_id, aws_secret_access_key),
+        lambda: get_session().create_client(
+            's3',
+            aws_access_key_id=aws_access_key_id,
+            aws_secret_access_key=aws_secret_access_key,
+        )
     )
-    content = response['Body'].read()
-    return StringIO(content.decode(encoding))
+
+
+class S3Reader(io.RawIOBase):
+    '''Binary file object streaming the body of a S3 object.
+    The object is requested on the first read.
+    After a `seek()`, it is requested again with a `Range` starting at the new position.
+    '''
+
+    def __init__(self, client, bucket_name, key_name, encoding):
+        self._client = client
+        self._params = _get_object_params(bucket_name, key_name, encoding)
+        self._body = None
+        self._position = 0
+        self._size = None
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self._get_size()
+
+        if offset != self._position:
+            self._close_body()
+            self._position = offset
+
+        return self._position
+
+    def readinto(self, buffer):
+        if self._size is not None and self._position >= self._size:
+            return 0
+
+        if self._body is None:
+            self._open_body()
+
+        data = self._body.read(len(buffer))
+        buffer[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+    def close(self):
+        self._close_body()
+        super().close()
+
+    def _open_body(self):
+        params = dict(self._params)
+        if self._position:
+            params['Range'] = f'bytes={self._position}-'
+
+        response = self._client.get_object(**params)
+        if not self._position:
+            self._size = response.get('ContentLength')
+        self._body = response['Body']
+
+    def _close_body(self):
+        if self._body is not None:
+            self._body.close()
+            self._body = None
+
+    def _get_size(self):
+        if self._size is None:
+            response = self._client.head_object(
+                Bucket=self._params['Bucket'],
+                Key=self._params['Key']
+            )
+            self._size = response['ContentLength']
+
+        return self._size
+
+
+class S3PartsReader(io.RawIOBase):
+    '''Binary file object downloading a S3 object in parts through ranged GETs.
+    Up to `workers` parts are downloaded concurrently ahead of the reader
+    and they are read in order.
+    '''
+
+    def __init__(self, client, bucket_name, key_name, encoding, part_size, workers):
+        self._client = client
+        self._params = _get_object_params(bucket_name, key_name, encoding)
+        self._part_size = part_size
+        self._workers = workers
+        self._executor = None
+        self._parts = deque()
+        self._next_part_start = 0
+        self._size = None
+        self._part = b''
+        self._part_position = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self._executor is None:
+            self._start()
+
+        while self._part_position >= len(self._part):
+            if not self._parts:
+                return 0
+
+            self._part = self._parts.popleft().result()
+            self._part_position = 0
+            self._schedule_part()
+
+        data = self._part[self._part_position:self._part_position + len(buffer)]
+        buffer[:len(data)] = data
+        self._part_position += len(data)
+        return len(data)
+
+    def close(self):
+        if self._executor is not None:
+            for part in self._parts:
+                part.cancel()
+            self._parts.clear()
+            self._executor.shutdown(wait=False)
+        super().close()
+
+    def _start(self):
+        response = self._client.head_object(
+            Bucket=self._params['Bucket'],
+            Key=self._params['Key']
+        )
+        self._size = response['ContentLength']
+        logger.info(
+            f'Downloading s3://{self._params["Bucket"]}/{self._params["Key"]} '
+            f'({self._size} bytes) with {self._workers} workers.'
+        )
+
+        self._executor = ThreadPoolExecutor(max_workers=self._workers)
+        for _ in range(self._workers):
+            self._schedule_part()
+
+    def _schedule_part(self):
+        start = self._next_part_start
+        if start >= self._size:
+            return
+
+        end = min(start + self._part_size, self._size) - 1
+        self._next_part_start = end + 1
+        self._parts.append(self._executor.submit(self._download_part, start, end))
+
+    def _download_part(self, start, end):
+        response = self._client.get_object(Range=f'bytes={start}-{end}', **self._params)
+        body = response['Body']
+        try:
+            return body.read()
+        finally:
+            body.close()
+
+
+def _get_object_params(bucket_name, key_name, encoding):
+    params = {'Bucket': bucket_name, 'Key': key_name}
+    if encoding:
+        params['ResponseContentEncoding'] = encoding
+    return params
 
 
 def _get_aws_keys(parsed_uri, settings):
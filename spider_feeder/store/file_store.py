@@ -1,10 +1,18 @@
 from os import path
 from urllib.parse import urlparse
+import inspect
+import io
 import logging
 
+from scrapy.settings import Settings
 from scrapy.utils.misc import load_object
 
+from . import compression
 from .base_store import BaseStore
+from .cache import FileCache
+from .file_handler import local
+from .file_handler.byte_range import CountingReader, LineReader, PrefixedReader
+from .parallel import ParallelParser
 
 logger = logging.getLogger(__name__)
 
@@ -14,12 +22,41 @@ class FileStore(BaseStore):
     It can handle file stored in the local file system or in Amazon AWS S3.
     This is extensible by adding the given URI scheme to `SPIDERFEEDER_FILE_HANDLERS`.
 
-    The file formats handled are txt, csv and json.
+    The file formats handled are txt, csv, json, jsonl (JSON Lines), parquet and arrow (Arrow IPC).
+    Parquet and Arrow files are read in record batches from a binary file object,
+    seeking to the columns read if the file handler supports it.
     If a new file format is required, it is just a matter of adding the file extension to
     `SPIDERFEEDER_FILE_HANDLERS`.
     For csv and json files, the URL is read from the field set in `SPIDERFEEDER_INPUT_FIELD`.
 
     The standard file encoding is _utf-8_, but it can be changed through `SPIDERFEEDER_INPUT_FILE_ENCODING`.
+
+    Compressed files (gz, bz2, xz and zst) are decompressed while they are read.
+    The compression is inferred from the last file extension, as in `urls.csv.gz`,
+    or set through `SPIDERFEEDER_INPUT_COMPRESSION`.
+    If it is set to `auto`, the compression is detected from the magic number of the file.
+    New compressions can be added to `SPIDERFEEDER_FILE_DECOMPRESSORS`.
+    The file handler is called with `encoding=None` and must return a binary file object.
+
+    When sharded, line-oriented files are split into byte ranges and only the range of the shard is read.
+    It requires the file handler to accept a `byte_range` argument.
+    In this case, the cursor also holds the byte offset of the next line,
+    so reading is resumed from it instead of skipping the items read before.
+
+    `expand_uri()` lists the files matching a glob pattern, like `s3://bucket/prefix/*.csv`.
+    This is extensible by adding the given URI scheme to `SPIDERFEEDER_FILE_GLOBBERS`.
+
+    If `SPIDERFEEDER_FILE_CACHE_DIR` is set, remote files are read from a local copy in it,
+    revalidated through the function in `SPIDERFEEDER_FILE_VALIDATORS` for their URI scheme.
+
+    If `SPIDERFEEDER_PARSE_WORKERS` is set, uncompressed local files with a line-oriented format are
+    split into chunks of `SPIDERFEEDER_PARSE_CHUNK_SIZE` bytes, parsed in that number of processes.
+    The records are yielded in the order of the file, unless `SPIDERFEEDER_PARSE_ORDERED` is `False`.
+    In this case, the cursor only holds the number of items read, so the records are always ordered
+    when it's set.
+
+    The file is opened when the first item is read and it is kept open while the items are parsed.
+    It is closed once the items are exhausted, the iteration is stopped or `close()` is called.
     '''
 
     FILE_HANDLERS = {
@@ -33,7 +70,31 @@ class FileStore(BaseStore):
     FILE_PARSERS = {
         'txt': 'spider_feeder.store.parser.parse_txt',
         'csv': 'spider_feeder.store.parser.parse_csv',
+        'tsv': 'spider_feeder.store.parser.parse_tsv',
         'json': 'spider_feeder.store.parser.parse_json',
+        'jsonl': 'spider_feeder.store.parser.parse_jsonl',
+        'jl': 'spider_feeder.store.parser.parse_jsonl',
+        'parquet': 'spider_feeder.store.parser.parse_parquet',
+        'arrow': 'spider_feeder.store.parser.parse_arrow',
+    }
+
+    FILE_GLOBBERS = {
+        '': 'spider_feeder.store.file_handler.local.glob',
+        'file': 'spider_feeder.store.file_handler.local.glob',
+        's3': 'spider_feeder.store.file_handler.s3.glob',
+    }
+
+    FILE_VALIDATORS = {
+        's3': 'spider_feeder.store.file_handler.s3.stat',
+        'http': 'spider_feeder.store.file_handler.http.stat',
+        'https': 'spider_feeder.store.file_handler.http.stat',
+    }
+
+    FILE_DECOMPRESSORS = {
+        'gz': 'spider_feeder.store.compression.open_gzip',
+        'bz2': 'spider_feeder.store.compression.open_bz2',
+        'xz': 'spider_feeder.store.compression.open_xz',
+        'zst': 'spider_feeder.store.compression.open_zstd',
     }
 
     def __init__(self, input_file_uri, settings):
@@ -42,6 +103,19 @@ class FileStore(BaseStore):
         self._settings = settings
         self._input_file_encoding = settings.get('SPIDERFEEDER_INPUT_FILE_ENCODING', 'utf-8')
         self._input_format = settings.get('SPIDERFEEDER_INPUT_FORMAT', None)
+        self._input_compression = settings.get('SPIDERFEEDER_INPUT_COMPRESSION', None)
+        self._fds = []
+        self._shard = None
+        self._track_offset = False
+        self._resume_offset = None
+        self._lines = None
+        self._counters = []
+        self._positions = []
+        self._bytes_read = None
+        self._parse_workers = settings.getint('SPIDERFEEDER_PARSE_WORKERS', 0)
+        self._parse_chunk_size = settings.getint('SPIDERFEEDER_PARSE_CHUNK_SIZE', 4 * 1024 * 1024)
+        self._parse_ordered = settings.getbool('SPIDERFEEDER_PARSE_ORDERED', True)
+        self._parallel_parser = None
 
         handlers = settings.getdict('SPIDERFEEDER_FILE_HANDLERS', {})
         self._handlers = dict(self.FILE_HANDLERS, **handlers)
@@ -49,30 +123,331 @@ class FileStore(BaseStore):
         parsers = settings.getdict('SPIDERFEEDER_FILE_PARSERS', {})
         self._parsers = dict(self.FILE_PARSERS, **parsers)
 
+        decompressors = settings.getdict('SPIDERFEEDER_FILE_DECOMPRESSORS', {})
+        self._decompressors = dict(self.FILE_DECOMPRESSORS, **decompressors)
+
+        validators = settings.getdict('SPIDERFEEDER_FILE_VALIDATORS', {})
+        self._validators = dict(self.FILE_VALIDATORS, **validators)
+        self._cache = FileCache.from_settings(settings)
+
+    @classmethod
+    def expand_uri(cls, input_uri, settings):
+        '''Returns the uris matching the glob pattern in `input_uri`.
+        If there is no globber for its scheme, `input_uri` is returned as is.'''
+        globbers = dict(cls.FILE_GLOBBERS, **settings.getdict('SPIDERFEEDER_FILE_GLOBBERS', {}))
+        scheme = urlparse(input_uri).scheme
+        if scheme not in globbers:
+            return [input_uri]
+
+        return load_object(globbers[scheme])(input_uri, settings)
+
     @property
     def _file_format(self):
         if self._input_format:
             return self._input_format
 
-        (_, file_extension) = path.splitext(self._input_file_uri)
+        (file_path, file_extension) = path.splitext(self._input_file_uri)
+        if file_extension[1:] in self._decompressors:
+            (_, file_extension) = path.splitext(file_path)
+
         return file_extension[1:]  # remove the "."
 
+    @property
+    def _compression(self):
+        if self._input_compression:
+            return self._input_compression
+
+        (_, file_extension) = path.splitext(self._input_file_uri)
+        if file_extension[1:] in self._decompressors:
+            return file_extension[1:]
+
+        return None
+
+    def _get_handler(self):
+        scheme = urlparse(self._input_file_uri).scheme
+        handler = load_object(self._handlers[scheme])
+        if self._cache and scheme in self._validators:
+            return self._cache.wrap(handler, load_object(self._validators[scheme]))
+
+        return handler
+
+    def _get_parser(self):
+        return load_object(self._parsers[self._file_format])
+
+    def _supports_byte_range(self):
+        if self._compression:
+            return False
+
+        if not getattr(self._get_parser(), 'line_oriented', False):
+            return False
+
+        return 'byte_range' in inspect.signature(self._get_handler()).parameters
+
+    def _uses_mmap(self):
+        '''Returns whether text is read through `MmapFile`, for local files and the local copies of cached files.'''
+        if not self._settings.getbool('SPIDERFEEDER_LOCAL_MMAP', False):
+            return False
+
+        scheme = urlparse(self._input_file_uri).scheme
+        if self._cache and scheme in self._validators:
+            return True
+
+        return load_object(self._handlers[scheme]) is local.open
+
+    def _supports_parallel_parsing(self):
+        if not self._parse_workers or urlparse(self._input_file_uri).scheme not in ('', 'file'):
+            return False
+
+        return self._supports_byte_range()
+
+    def set_shard(self, index, count):
+        if not self._supports_byte_range():
+            return False
+
+        self._shard = (index, count)
+        return True
+
+    def get_cursor(self):
+        cursor = super().get_cursor()
+        if self._lines is not None:
+            cursor['offset'] = self._lines.tell()
+        return cursor
+
+    def set_urls_only(self):
+        '''Reads only the urls, so columnar formats skip the other fields (`SPIDERFEEDER_INPUT_URLS_ONLY`).'''
+        self._settings = Settings(self._settings)
+        self._settings.set('SPIDERFEEDER_INPUT_URLS_ONLY', True)
+
+    def set_cursor(self, cursor):
+        if self._supports_parallel_parsing():
+            # unordered records can't be skipped by their count
+            self._parse_ordered = True
+            return super().set_cursor(cursor)
+
+        self._track_offset = self._supports_byte_range()
+        if self._track_offset and cursor and 'offset' in cursor:
+            self._resume_offset = cursor['offset']
+            self._count = cursor.get('count', 0)
+        else:
+            super().set_cursor(cursor)
+
     def _open(self):
         parsed = urlparse(self._input_file_uri)
         logger.info(f'Opening file {self._input_file_uri} with scheme {parsed.scheme}.')
-        open = load_object(self._handlers[parsed.scheme])
-        return open(
+        open = self._get_handler()
+
+        if self._track_offset:
+            return self._open_lines(open, self._get_byte_range(open))
+
+        if self._shard:
+            return self._open_byte_range(open, self._get_byte_range(open))
+
+        if getattr(self._get_parser(), 'binary', False):
+            return self._push(self._count_bytes(open(
+                self._input_file_uri,
+                encoding=None,
+                settings=self._settings
+            ), sequential=False))
+
+        file_compression = self._compression
+        if not file_compression:
+            return self._push(self._count_bytes(open(
+                self._input_file_uri,
+                encoding=self._input_file_encoding,
+                settings=self._settings
+            )))
+
+        fd = self._push(self._count_bytes(open(self._input_file_uri, encoding=None, settings=self._settings)))
+        if file_compression == 'auto':
+            if not hasattr(fd, 'peek'):
+                fd = self._push(io.BufferedReader(fd))
+            file_compression = compression.detect(fd)
+
+        if file_compression:
+            logger.info(f'Decompressing file {self._input_file_uri} with {file_compression}.')
+            decompress = load_object(self._decompressors[file_compression])
+            fd = self._push(decompress(fd))
+
+        return self._push(io.TextIOWrapper(fd, encoding=self._input_file_encoding))
+
+    def _get_byte_range(self, open):
+        (start, end) = (0, None)
+        if self._shard:
+            with open(self._input_file_uri, encoding=None, settings=self._settings) as fd:
+                size = fd.seek(0, io.SEEK_END)
+
+            (index, count) = self._shard
+            (start, end) = (size * index // count, size * (index + 1) // count)
+
+        if self._resume_offset is not None:
+            logger.info(f'Resuming {self._input_file_uri} from byte {self._resume_offset}.')
+            start = max(start, self._resume_offset)
+
+        return (start, end)
+
+    def _open_byte_range(self, open, byte_range):
+        logger.info(f'Reading bytes [{byte_range[0]}, {byte_range[1]}) of {self._input_file_uri}.')
+        header = self._read_header(open, byte_range)
+        if self._uses_mmap():
+            return self._open_mmap_lines(open, byte_range, header)
+
+        if not header:
+            return self._push(self._count_bytes(open(
+                self._input_file_uri,
+                encoding=self._input_file_encoding,
+                settings=self._settings,
+                byte_range=byte_range
+            )))
+
+        fd = self._push(self._count_bytes(open(
+            self._input_file_uri,
+            encoding=None,
+            settings=self._settings,
+            byte_range=byte_range
+        )))
+        fd = self._push(io.BufferedReader(PrefixedReader(header, fd)))
+        return self._push(io.TextIOWrapper(fd, encoding=self._input_file_encoding))
+
+    def _open_lines(self, open, byte_range):
+        logger.info(f'Reading lines of {self._input_file_uri} from byte {byte_range[0]}.')
+        header = self._read_header(open, byte_range)
+        if self._uses_mmap():
+            self._lines = self._open_mmap_lines(open, byte_range, header)
+            return self._lines
+
+        fd = self._push(self._count_bytes(open(
+            self._input_file_uri,
+            encoding=None,
+            settings=self._settings,
+            byte_range=byte_range
+        )))
+        self._lines = self._push(LineReader(fd, self._input_file_encoding, byte_range[0], header))
+        return self._lines
+
+    def _open_mmap_lines(self, open, byte_range, header):
+        '''Reads the lines of byte_range through `MmapFile`, which tracks their byte offset, after the header.'''
+        fd = self._push(self._count_bytes(open(
             self._input_file_uri,
             encoding=self._input_file_encoding,
-            settings=self._settings
-        )
+            settings=self._settings,
+            byte_range=byte_range
+        )))
+        return self._push(LineReader(fd, self._input_file_encoding, byte_range[0], header))
+
+    def _read_header(self, open, byte_range):
+        if byte_range[0] == 0 or not getattr(self._get_parser(), 'header', False):
+            return b''
+
+        with open(
+            self._input_file_uri,
+            encoding=None,
+            settings=self._settings,
+            byte_range=(0, 1)
+        ) as fd:
+            return fd.read()
+
+    def _count_bytes(self, fd, sequential=True):
+        '''Returns a file object counting the bytes read from fd.
+        Files read sequentially are counted by the position of their innermost binary file object,
+        if it has one, so they are returned as is.
+        Otherwise, binary files are read through a `CountingReader` and text files are returned as is.
+        '''
+        if self._bytes_read is None:
+            self._bytes_read = 0
+
+        raw = _get_raw(fd)
+        if sequential:
+            try:
+                self._positions.append((raw, raw.tell()))
+                return fd
+            except (OSError, ValueError):
+                pass
+
+        if isinstance(fd, io.TextIOBase) or not hasattr(fd, 'readinto'):
+            return fd
+
+        counter = CountingReader(fd)
+        self._counters.append(counter)
+        return io.BufferedReader(counter)
+
+    def _get_bytes_read(self):
+        return self._bytes_read + sum(counter.count for counter in self._counters) + self._count_positions()
+
+    def _count_positions(self):
+        bytes_read = 0
+        for (raw, start) in list(self._positions):
+            try:
+                bytes_read += raw.tell() - start
+            except ValueError:
+                # closed meanwhile, so it's already counted in `_bytes_read`
+                pass
+        return bytes_read
+
+    def get_metrics(self):
+        metrics = super().get_metrics()
+        if self._bytes_read is not None:
+            metrics['bytes_read'] = self._get_bytes_read()
+        if self._parallel_parser:
+            metrics['bytes_read'] = metrics.get('bytes_read', 0) + self._parallel_parser.bytes_read
+        return metrics
+
+    def _push(self, fd):
+        self._fds.append(fd)
+        return fd
 
     def _parse(self, fd):
-        file_format = self._file_format
-        logger.info(f'Parsing file {self._input_file_uri} with format {file_format}.')
-        parser = load_object(self._parsers[file_format])
+        logger.info(f'Parsing file {self._input_file_uri} with format {self._file_format}.')
+        parser = self._get_parser()
         return parser(fd, self._settings)
 
+    def _parse_parallel(self):
+        file_path = self._input_file_uri.replace('file://', '')
+        (start, end) = self._get_byte_range(self._get_handler())
+        logger.info(f'Parsing file {self._input_file_uri} with format {self._file_format} in parallel.')
+        self._parallel_parser = ParallelParser(
+            file_path,
+            self._get_parser(),
+            self._settings,
+            self._parse_workers,
+            self._parse_chunk_size,
+            self._parse_ordered,
+            self._input_file_encoding
+        )
+        return self._parallel_parser.parse((start, path.getsize(file_path) if end is None else end))
+
     def read_input_items(self):
-        with self._open() as fd:
-            return self._parse(fd)
+        if self._supports_parallel_parsing():
+            yield from self._parse_parallel()
+            return
+
+        fd = self._open()
+        try:
+            yield from self._parse(fd)
+        finally:
+            self.close()
+
+    def close(self):
+        if self._parallel_parser:
+            self._parallel_parser.close()
+
+        if not self._fds:
+            return
+
+        (fds, self._fds) = (self._fds, [])
+        if self._positions:
+            (self._bytes_read, self._positions) = (self._bytes_read + self._count_positions(), [])
+        logger.info(f'Closing file {self._input_file_uri}.')
+        for fd in reversed(fds):
+            fd.close()
+
+
+def _get_raw(fd):
+    '''Returns the innermost file object of fd, going through the `buffer` of text files
+    and the `raw` of buffered files.'''
+    while True:
+        inner = getattr(fd, 'buffer', None)
+        if inner is None:
+            inner = getattr(fd, 'raw', None)
+        if inner is None:
+            return fd
+        fd = inner
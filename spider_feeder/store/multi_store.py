@@ -0,0 +1,147 @@
+import queue
+import threading
+import zlib
+
+from .prefetch import Prefetcher
+
+
+class MultiStore:
+    '''Store combining the items of several stores.
+    Each store is read in a background thread, keeping up to `prefetch` items ahead,
+    so a slow store doesn't block the others.
+    The items are combined according to `strategy`:
+    * `chain`: all the items of a store, then the ones of the next store
+    * `round_robin`: one item of each store in turn
+    * `weighted`: `weights[i]` items of the store `i` in turn, so the weights must be integers >= 1
+    When interleaving, a store without items ready is skipped in its turn.
+
+    When sharded, stores that can't read a single shard are filtered by a stable hash of the url.
+    The cursor holds the cursor of each store after its last item read, so each of them is resumed
+    from its own position, like a byte offset or a key.
+    Stores without `get_cursor()` are resumed from the number of items read from them.
+    '''
+
+    STRATEGIES = ('chain', 'round_robin', 'weighted')
+
+    def __init__(self, stores, strategy='chain', weights=None, prefetch=1000):
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f'Strategy must be one of {self.STRATEGIES}, got {strategy}.')
+
+        self._stores = list(stores)
+        self._strategy = strategy
+        self._weights = list(weights or [1] * len(self._stores))
+        if any(not isinstance(weight, int) or weight < 1 for weight in self._weights):
+            raise ValueError(f'Weights must be integers >= 1, got {self._weights}.')
+        self._prefetch = prefetch
+        self._shards = [None] * len(self._stores)
+        self._cursors = [None] * len(self._stores)
+        self._track_cursors = False
+        self._count = 0
+        self._prefetchers = []
+
+    def __iter__(self):
+        notify = threading.Event()
+        self._prefetchers = [
+            Prefetcher(self._read_store(i), self._prefetch, notify)
+            for i in range(len(self._stores))
+        ]
+        for prefetcher in self._prefetchers:
+            prefetcher.start()
+
+        try:
+            if self._strategy == 'chain':
+                for (i, prefetcher) in enumerate(self._prefetchers):
+                    for (cursor, item) in prefetcher:
+                        self._cursors[i] = cursor
+                        self._count += 1
+                        yield item
+            else:
+                yield from self._interleave(notify)
+        finally:
+            self.close()
+
+    def set_shard(self, index, count):
+        for (i, store) in enumerate(self._stores):
+            set_shard = getattr(store, 'set_shard', None)
+            if not (set_shard and set_shard(index, count)):
+                self._shards[i] = (index, count)
+
+        return True
+
+    def set_urls_only(self):
+        for store in self._stores:
+            set_urls_only = getattr(store, 'set_urls_only', None)
+            if set_urls_only:
+                set_urls_only()
+
+    def get_cursor(self):
+        return {'count': self._count, 'cursors': list(self._cursors)}
+
+    def set_cursor(self, cursor):
+        self._track_cursors = True
+        if cursor and len(cursor.get('cursors', [])) == len(self._stores):
+            self._count = cursor.get('count', 0)
+            self._cursors = list(cursor['cursors'])
+
+        for (store, store_cursor) in zip(self._stores, self._cursors):
+            set_cursor = getattr(store, 'set_cursor', None)
+            if set_cursor:
+                set_cursor(store_cursor)
+
+    def get_metrics(self):
+        '''Returns the sum of the metrics of the stores.'''
+        metrics = {}
+        for store in self._stores:
+            get_metrics = getattr(store, 'get_metrics', None)
+            for (name, value) in (get_metrics() if get_metrics else {}).items():
+                metrics[name] = metrics.get(name, 0) + value
+        return metrics
+
+    def close(self):
+        for prefetcher in self._prefetchers:
+            prefetcher.close()
+        self._prefetchers = []
+
+        for store in self._stores:
+            close = getattr(store, 'close', None)
+            if close:
+                close()
+
+    def _read_store(self, i):
+        '''Yields the items of the store `i` in its shard with the cursor of the store after each of them,
+        if the cursors are tracked.'''
+        (store, shard, cursor) = (self._stores[i], self._shards[i], None)
+        get_cursor = getattr(store, 'get_cursor', None) if self._track_cursors else None
+        count = (self._cursors[i] or {}).get('count', 0)
+        for (url, meta) in store:
+            count += 1
+            if shard and zlib.crc32(url.encode('utf-8')) % shard[1] != shard[0]:
+                continue
+
+            if self._track_cursors:
+                cursor = get_cursor() if get_cursor else {'count': count}
+            yield (cursor, (url, meta))
+
+    def _interleave(self, notify):
+        weights = self._weights if self._strategy == 'weighted' else [1] * len(self._stores)
+        active = list(range(len(self._prefetchers)))
+        while active:
+            notify.clear()
+            read = False
+            for i in list(active):
+                for _ in range(weights[i]):
+                    try:
+                        (cursor, item) = self._prefetchers[i].get(block=False)
+                    except queue.Empty:
+                        break
+                    except StopIteration:
+                        active.remove(i)
+                        break
+
+                    self._cursors[i] = cursor
+                    self._count += 1
+                    read = True
+                    yield item
+
+            if active and not read:
+                notify.wait()
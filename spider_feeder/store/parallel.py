@@ -0,0 +1,118 @@
+'''
+This module parses line-oriented files in a pool of processes.
+The file is split into chunks of lines, as byte ranges, and each chunk is parsed by a worker,
+which returns all of its records at once, so they are streamed in batches of a chunk.
+'''
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import builtins
+import io
+import logging
+import multiprocessing
+
+from scrapy.settings import Settings
+
+from .file_handler.byte_range import PrefixedReader, open_byte_range
+
+logger = logging.getLogger(__name__)
+
+
+def split_byte_range(byte_range, chunk_size):
+    '''Returns the consecutive ranges of up to `chunk_size` bytes covering `byte_range`.'''
+    (start, end) = byte_range
+    return [(offset, min(offset + chunk_size, end)) for offset in range(start, end, chunk_size)]
+
+
+class ParallelParser:
+    '''Parses the lines of a local file with `parser` in `workers` processes, in chunks of `chunk_size` bytes.
+    `parser` must be line-oriented and importable, so it can be sent to the workers,
+    and the records it returns must be picklable.
+
+    If `ordered`, the records are yielded in the order of the file, otherwise as soon as their chunk is parsed.
+    Up to one chunk per worker is parsed at once, and the next one is submitted before the records
+    of a chunk are yielded, so only these chunks are held in memory.
+
+    The workers are spawned, instead of forked from the crawler process, which runs several threads.
+    '''
+
+    def __init__(self, file_path, parser, settings, workers, chunk_size, ordered=True, encoding='utf-8'):
+        self._file_path = file_path
+        self._parser = parser
+        self._settings = settings.copy_to_dict()
+        self._workers = workers
+        self._chunk_size = chunk_size
+        self._ordered = ordered
+        self._encoding = encoding
+        self._executor = None
+        self._pending = ()
+        self.bytes_read = 0
+
+    def parse(self, byte_range):
+        '''Yields the records of the lines starting in `byte_range`.'''
+        chunks = split_byte_range(byte_range, self._chunk_size)
+        logger.info(f'Parsing {len(chunks)} chunks of {self._file_path} in {self._workers} processes.')
+
+        self._executor = ProcessPoolExecutor(self._workers, mp_context=multiprocessing.get_context('spawn'))
+        try:
+            parse = self._parse_ordered if self._ordered else self._parse_unordered
+            for (records, bytes_read) in parse(iter(chunks)):
+                self.bytes_read += bytes_read
+                yield from records
+        finally:
+            self.close()
+
+    def close(self):
+        if self._executor is not None:
+            for future in self._pending:
+                future.cancel()
+            self._executor.shutdown(wait=False)
+            (self._executor, self._pending) = (None, ())
+
+    def _submit(self, byte_range):
+        return self._executor.submit(
+            _parse_chunk,
+            self._file_path,
+            self._parser,
+            self._settings,
+            self._encoding,
+            byte_range
+        )
+
+    def _parse_ordered(self, chunks):
+        pending = self._pending = deque(self._submit(chunk) for (_, chunk) in zip(range(self._workers), chunks))
+        while pending:
+            result = pending.popleft().result()
+            chunk = next(chunks, None)
+            if chunk:
+                pending.append(self._submit(chunk))
+            yield result
+
+    def _parse_unordered(self, chunks):
+        pending = self._pending = {self._submit(chunk) for (_, chunk) in zip(range(self._workers), chunks)}
+        while pending:
+            (done, pending) = wait(pending, return_when=FIRST_COMPLETED)
+            self._pending = pending
+            for future in done:
+                chunk = next(chunks, None)
+                if chunk:
+                    pending.add(self._submit(chunk))
+                yield future.result()
+
+
+def _parse_chunk(file_path, parser, settings, encoding, byte_range):
+    '''Returns the records of the lines starting in `byte_range` and the number of bytes of these lines.
+    Chunks after the first line are preceded by the header, if the parser expects one.
+    '''
+    header = b''
+    if byte_range[0] > 0 and getattr(parser, 'header', False):
+        with builtins.open(file_path, 'rb') as fd:
+            header = fd.readline()
+
+    fd = open_byte_range(builtins.open(file_path, 'rb'), byte_range)
+    lines = fd.raw
+    if header:
+        fd = io.BufferedReader(PrefixedReader(header, fd))
+
+    with io.TextIOWrapper(fd, encoding=encoding) as fd:
+        records = list(parser(fd, Settings(settings)))
+        return (records, lines.tell())
@@ -1,14 +1,364 @@
+'''
+This module holds the file parsers.
+Each parser is a generator yielding one record at a time,
+so the memory usage does not depend on the input file size.
+
+Parsers reading one record per line are marked as `line_oriented`,
+so a file can be split into byte ranges aligned to line boundaries.
+If the first line is a header, it is also marked with `header`.
+
+JSON is decoded by the backend in `SPIDERFEEDER_JSON_BACKEND` (`orjson`, `ujson` or `json`).
+If it is not set, JSON Lines are decoded by the first of them installed and
+JSON arrays are decoded incrementally by `json`.
+
+Parsers of binary formats, like Parquet or Arrow, are marked as `binary`,
+so they receive a binary file object instead of a text one.
+'''
+from operator import itemgetter
+import codecs
+import csv
+import importlib
+import io
 import json
-from csv import DictReader
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+
+JSON_CHUNK_SIZE = 64 * 1024
+JSON_BACKENDS = ('orjson', 'ujson', 'json')
+ARROW_MAGIC = b'ARROW1'
+
+CSV_QUOTING = {
+    'minimal': csv.QUOTE_MINIMAL,
+    'all': csv.QUOTE_ALL,
+    'nonnumeric': csv.QUOTE_NONNUMERIC,
+    'none': csv.QUOTE_NONE,
+}
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_NUMBER_START = frozenset('-0123456789')
+_DELIMITERS = frozenset(',] \t\n\r')
+
+
+def line_oriented(header=False):
+    def decorator(parser):
+        parser.line_oriented = True
+        parser.header = header
+        return parser
 
+    return decorator
 
+
+def binary(parser):
+    parser.binary = True
+    return parser
+
+
+@line_oriented()
 def parse_txt(fd, settings):
-    return fd.read().splitlines()
+    for line in fd:
+        yield line.rstrip('\r\n')
 
 
+@line_oriented(header=True)
 def parse_csv(fd, settings):
-    return [dict(x) for x in DictReader(fd)]
+    '''Parses a CSV file, yielding each row as a dict of the header columns to its fields.
+    Fields missing in short rows are `None`, like in `csv.DictReader`.
+    The header is resolved once and, if `SPIDERFEEDER_INPUT_COLUMNS` is set,
+    only `SPIDERFEEDER_INPUT_FIELD` and those columns are kept.
+    If only the urls are loaded (`SPIDERFEEDER_INPUT_URLS_ONLY`), only `SPIDERFEEDER_INPUT_FIELD` is kept
+    or, without it, the first field of each row is yielded.
+    The format is set by `SPIDERFEEDER_CSV_DIALECT` (DEFAULT = `excel`),
+    `SPIDERFEEDER_CSV_DELIMITER` and `SPIDERFEEDER_CSV_QUOTING`.
+    '''
+    yield from _parse_csv(fd, settings, 'excel')
+
+
+@line_oriented(header=True)
+def parse_tsv(fd, settings):
+    '''Parses a tab separated file, like `parse_csv` with the `excel-tab` dialect by default.'''
+    yield from _parse_csv(fd, settings, 'excel-tab')
+
+
+def _parse_csv(fd, settings, dialect):
+    reader = csv.reader(fd, **_get_csv_format(settings, dialect))
+    header = next(reader, None)
+    if header is None:
+        return
+
+    if settings.getbool('SPIDERFEEDER_INPUT_URLS_ONLY') and not settings.get('SPIDERFEEDER_INPUT_FIELD'):
+        yield from (row[0] for row in reader if row)
+        return
+
+    columns = _get_columns(settings, header)
+    if columns:
+        positions = {name: i for (i, name) in enumerate(header)}
+        header = [name for name in columns if name in positions]
+        indexes = [positions[name] for name in header]
+        select = _get_selector(indexes)
+        full_size = max(indexes, default=-1) + 1
+
+    size = len(header)
+    for row in reader:
+        if not row:
+            continue
+
+        if columns:
+            row = select(row) if len(row) >= full_size else [row[i] if i < len(row) else None for i in indexes]
+        elif len(row) < size:
+            row += [None] * (size - len(row))
+        yield dict(zip(header, row))
+
+
+def _get_selector(indexes):
+    '''Returns a function selecting the fields at `indexes` of a row as a tuple.'''
+    if len(indexes) > 1:
+        return itemgetter(*indexes)
+
+    return lambda row: tuple(row[i] for i in indexes)
+
+
+def _get_csv_format(settings, dialect):
+    csv_format = {'dialect': settings.get('SPIDERFEEDER_CSV_DIALECT') or dialect}
+
+    delimiter = settings.get('SPIDERFEEDER_CSV_DELIMITER')
+    if delimiter:
+        csv_format['delimiter'] = delimiter
+
+    quoting = settings.get('SPIDERFEEDER_CSV_QUOTING')
+    if quoting:
+        if quoting not in CSV_QUOTING:
+            raise ValueError(f'SPIDERFEEDER_CSV_QUOTING must be one of {tuple(CSV_QUOTING)}, got {quoting}.')
+        csv_format['quoting'] = CSV_QUOTING[quoting]
+
+    return csv_format
 
 
 def parse_json(fd, settings):
-    return json.load(fd)
+    '''Parses a JSON document.
+    A top-level array is decoded incrementally, one element at a time.
+    Any other document is decoded as a whole.
+    If `SPIDERFEEDER_JSON_BACKEND` is set, the whole document is decoded by it, which is faster,
+    but the document is loaded into memory.
+    '''
+    backend = settings.get('SPIDERFEEDER_JSON_BACKEND')
+    if backend:
+        document = get_json_loads(backend)(_binary(fd).read())
+        yield from document if isinstance(document, list) else [document]
+        return
+
+    reader = _JsonArrayReader(fd)
+    if not reader.starts_array():
+        document = json.loads(reader.read_remaining())
+        if isinstance(document, list):
+            yield from document
+        else:
+            yield document
+        return
+
+    yield from reader
+
+
+@line_oriented()
+def parse_jsonl(fd, settings):
+    '''Parses a JSON Lines file, decoding one line at a time.
+    UTF-8 files are decoded from bytes by the JSON backend, skipping the text decoding.
+    '''
+    loads = get_json_loads(settings.get('SPIDERFEEDER_JSON_BACKEND'))
+    for line in _binary(fd):
+        line = line.strip()
+        if line:
+            yield loads(line)
+
+
+def get_json_loads(backend=None):
+    '''Returns the `loads` function of `backend` or of the first backend installed if it is `None`.'''
+    if backend and backend not in JSON_BACKENDS:
+        raise ValueError(f'SPIDERFEEDER_JSON_BACKEND must be one of {JSON_BACKENDS}, got {backend}.')
+
+    for name in [backend] if backend else JSON_BACKENDS:
+        try:
+            return importlib.import_module(name).loads
+        except ImportError:
+            if backend:
+                raise
+
+
+def _binary(fd):
+    '''Returns the binary file wrapped by fd if it is encoded with UTF-8, so it's not decoded twice.'''
+    buffer = getattr(fd, 'buffer', None)
+    encoding = getattr(fd, 'encoding', None)
+    if buffer is not None and encoding and codecs.lookup(encoding).name == 'utf-8':
+        return buffer
+
+    return fd
+
+
+class _JsonArrayReader:
+    '''Reads the elements of a top-level JSON array from fd, chunk by chunk.'''
+
+    def __init__(self, fd):
+        self._fd = fd
+        self._decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._pos = 0
+
+    def starts_array(self):
+        if not self._skip_whitespace():
+            return False
+
+        if self._buffer[self._pos] != '[':
+            return False
+
+        self._pos += 1
+        return True
+
+    def read_remaining(self):
+        return self._buffer[self._pos:] + self._fd.read()
+
+    def __iter__(self):
+        (expect_value, after_comma) = (True, False)
+        while True:
+            if not self._skip_whitespace():
+                raise ValueError('Unexpected end of JSON array.')
+
+            char = self._buffer[self._pos]
+            if char == ']':
+                if after_comma:
+                    raise ValueError('Expected a value after "," in JSON array, got "]".')
+                return
+
+            if not expect_value:
+                if char != ',':
+                    raise ValueError(f'Expected "," or "]" in JSON array, got {char!r}.')
+                self._pos += 1
+                expect_value = after_comma = True
+                continue
+
+            yield self._decode()
+            expect_value = after_comma = False
+
+    def _skip_whitespace(self):
+        while True:
+            match = _WHITESPACE.match(self._buffer, self._pos)
+            self._pos = match.end()
+            if self._pos < len(self._buffer):
+                return True
+
+            if not self._read_chunk():
+                return False
+
+    def _decode(self):
+        '''Decodes the next value, reading more content until the value is complete.
+        A number is only accepted if it is followed by a delimiter,
+        otherwise it could have been split between two chunks, like after `e` or `.`.
+        '''
+        while True:
+            try:
+                (value, end) = self._decoder.raw_decode(self._buffer, self._pos)
+                if end < len(self._buffer) and (
+                    self._buffer[self._pos] not in _NUMBER_START or self._buffer[end] in _DELIMITERS
+                ):
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                pass
+
+            if not self._read_chunk():
+                (value, self._pos) = self._decoder.raw_decode(self._buffer, self._pos)
+                return value
+
+    def _read_chunk(self):
+        chunk = self._fd.read(JSON_CHUNK_SIZE)
+        if not chunk:
+            return False
+
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+
+@binary
+def parse_parquet(fd, settings):
+    '''Parses a Parquet file, reading one record batch at a time.
+    Only the columns in `SPIDERFEEDER_INPUT_COLUMNS` are read, if it is set, and only the urls
+    if they are the only ones loaded.
+    Requires `pyarrow`.
+    '''
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(_random_access(fd))
+    batches = parquet_file.iter_batches(
+        batch_size=settings.getint('SPIDERFEEDER_INPUT_BATCH_SIZE', 10000),
+        columns=_get_row_columns(settings, parquet_file.schema_arrow.names),
+    )
+    yield from _iter_rows(batches, settings)
+
+
+@binary
+def parse_arrow(fd, settings):
+    '''Parses an Arrow IPC file or stream, reading one record batch at a time.
+    Only the columns in `SPIDERFEEDER_INPUT_COLUMNS` are kept, if it is set, and only the urls
+    if they are the only ones loaded.
+    Requires `pyarrow`.
+    '''
+    import pyarrow.ipc as ipc
+
+    if fd.seekable():
+        is_file = fd.read(len(ARROW_MAGIC)) == ARROW_MAGIC
+        fd.seek(0)
+    else:
+        is_file = fd.peek(len(ARROW_MAGIC))[:len(ARROW_MAGIC)] == ARROW_MAGIC
+
+    if is_file:
+        reader = ipc.open_file(_random_access(fd))
+        batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+    else:
+        reader = batches = ipc.open_stream(fd)
+
+    columns = _get_row_columns(settings, reader.schema.names)
+    if columns:
+        batches = (batch.select(columns) for batch in batches)
+
+    yield from _iter_rows(batches, settings)
+
+
+def _get_columns(settings, names):
+    '''Returns the columns read out of `names` or `None` to read all of them.
+    If only the urls are loaded, it's the `SPIDERFEEDER_INPUT_FIELD` column or, without it, the first one.'''
+    input_field = settings.get('SPIDERFEEDER_INPUT_FIELD')
+    if settings.getbool('SPIDERFEEDER_INPUT_URLS_ONLY'):
+        return [input_field] if input_field else names[:1]
+
+    columns = settings.getlist('SPIDERFEEDER_INPUT_COLUMNS')
+    if not columns:
+        return None
+
+    if input_field and input_field not in columns:
+        columns = [input_field] + columns
+    return columns
+
+
+def _get_row_columns(settings, names):
+    '''Returns the columns of the batches read by `_iter_rows`, only the first one without `SPIDERFEEDER_INPUT_FIELD`.'''
+    return _get_columns(settings, names) if settings.get('SPIDERFEEDER_INPUT_FIELD') else names[:1]
+
+
+def _iter_rows(batches, settings):
+    '''Yields the rows of each batch as dicts or, without `SPIDERFEEDER_INPUT_FIELD`, the first column.'''
+    input_field = settings.get('SPIDERFEEDER_INPUT_FIELD')
+    for batch in batches:
+        if input_field:
+            yield from batch.to_pylist()
+        else:
+            yield from batch.column(0).to_pylist()
+
+
+def _random_access(fd):
+    if fd.seekable():
+        return fd
+
+    logger.warning('The file is not seekable, so it is loaded into memory.')
+    return io.BytesIO(fd.read())
@@ -0,0 +1,113 @@
+'''
+This module reads items ahead of the consumer in background threads.
+'''
+import queue
+import threading
+import time
+
+
+class Prefetcher:
+    '''Iterates `iterable` in a background thread, keeping up to `size` items ahead of the consumer.
+    Errors raised by `iterable` are raised again by the consumer.
+    `close()` stops the thread if the items are not consumed until the end,
+    and wakes up the consumer if it's waiting for an item.
+    If `notify` is given, this event is set whenever an item is read.
+    `stall_time` holds the seconds the threads waited for the consumer, while the queue was full.
+    '''
+
+    _ITEM = 0
+    _ERROR = 1
+    _DONE = 2
+    _CLOSED = 3
+
+    def __init__(self, iterable, size, notify=None):
+        self._iterables = [iterable]
+        self._queue = queue.Queue(maxsize=max(size, 1))
+        self._closed = threading.Event()
+        self._notify = notify
+        self._threads = None
+        self._running = 0
+        self.stall_time = 0.0
+
+    @classmethod
+    def unordered(cls, iterables, size):
+        '''Iterates each of `iterables` in its own thread, yielding their items as soon as they are read.'''
+        prefetcher = cls(None, size)
+        prefetcher._iterables = list(iterables)
+        return prefetcher
+
+    def start(self):
+        if self._threads is None:
+            self._threads = [
+                threading.Thread(target=self._run, args=(iterable,), daemon=True)
+                for iterable in self._iterables
+            ]
+            self._running = len(self._threads)
+            for thread in self._threads:
+                thread.start()
+
+    def __iter__(self):
+        while True:
+            try:
+                yield self.get()
+            except StopIteration:
+                return
+
+    def get(self, block=True):
+        '''Returns the next item, raising `StopIteration` once the items are exhausted.
+        If `block` is `False` and no item was read yet, `queue.Empty` is raised.
+        '''
+        self.start()
+        while self._running and not self._closed.is_set():
+            (kind, value) = self._queue.get(block)
+            if kind == self._CLOSED:
+                break
+            elif kind == self._DONE:
+                self._running -= 1
+            elif kind == self._ERROR:
+                self.close()
+                raise value
+            else:
+                return value
+
+        raise StopIteration()
+
+    def qsize(self):
+        '''Returns the approximate number of items read ahead.'''
+        return self._queue.qsize()
+
+    def close(self):
+        self._closed.set()
+        if self._running:
+            try:
+                # if the queue is full, the consumer isn't waiting and it stops on its next item
+                self._queue.put_nowait((self._CLOSED, None))
+            except queue.Full:
+                pass
+
+    def _run(self, iterable):
+        try:
+            for item in iterable:
+                if not self._put(self._ITEM, item):
+                    return
+        except Exception as e:
+            self._put(self._ERROR, e)
+        else:
+            self._put(self._DONE, None)
+
+    def _put(self, kind, value):
+        started = None
+        try:
+            while not self._closed.is_set():
+                try:
+                    self._queue.put((kind, value), timeout=0.1 if started else 0)
+                    if self._notify:
+                        self._notify.set()
+                    return True
+                except queue.Full:
+                    started = started or time.perf_counter()
+
+            return False
+        finally:
+            if started:
+                self.stall_time += time.perf_counter() - started
@@ -1,9 +1,12 @@
+import heapq
 import os
 
 from scrapinghub import ScrapinghubClient
 from scrapinghub.client.utils import parse_job_key
 
 from .base_store import BaseStore
+from .clients import pool
+from .prefetch import Prefetcher
 
 
 class ScrapinghubCollectionStore(BaseStore):
@@ -12,18 +15,118 @@ class ScrapinghubCollectionStore(BaseStore):
     For more information, please refer to https://python-scrapinghub.readthedocs.io/en/latest/client/apidocs.html#scrapinghub.client.ScrapinghubClient.
     The project is identified through `SHUB_JOBKEY` environment variable which is set in Scrapy Cloud.
     For more information, please refer to https://shub.readthedocs.io/en/stable/custom-images-contract.html.
+    The client is shared by every store with the same API key.
+
+    The items are read in pages of `SPIDERFEEDER_COLLECTION_PAGE_SIZE` items and
+    up to `SPIDERFEEDER_COLLECTION_PREFETCH` pages are read ahead in a background thread.
+
+    If `SPIDERFEEDER_COLLECTION_PREFIXES` is set, only the keys starting with these prefixes are read,
+    each of them concurrently. The items are merged by key if `SPIDERFEEDER_COLLECTION_ORDERED` is set,
+    otherwise they are yielded as soon as they are read. Shards read a subset of the prefixes.
+
+    The cursor holds the key of the last item read (by prefix), so reading is resumed after it.
     '''
 
     def __init__(self, input_uri, settings):
         super().__init__(settings)
-        client = ScrapinghubClient()
-
         jobkey = parse_job_key(os.environ['SHUB_JOBKEY'])
+        client = pool.get(('scrapinghub', os.environ.get('SH_APIKEY')), ScrapinghubClient)
         project = client.get_project(jobkey.project_id)
 
         collection_name = input_uri.replace('collections://', '')
         self._store = project.collections.get_store(collection_name)
+        self._last_key = None
+        self._page_size = settings.getint('SPIDERFEEDER_COLLECTION_PAGE_SIZE', 1000)
+        self._prefetch = settings.getint('SPIDERFEEDER_COLLECTION_PREFETCH', 2)
+        self._prefixes = settings.getlist('SPIDERFEEDER_COLLECTION_PREFIXES')
+        self._ordered = settings.getbool('SPIDERFEEDER_COLLECTION_ORDERED', True)
+        self._last_keys = {}
+        self._prefetchers = []
+
+    def set_shard(self, index, count):
+        if count > len(self._prefixes):
+            return False
+
+        self._prefixes = self._prefixes[index::count]
+        return True
+
+    def get_cursor(self):
+        cursor = super().get_cursor()
+        if self._last_key is not None:
+            cursor['key'] = self._last_key
+        if self._last_keys:
+            cursor['keys'] = dict(self._last_keys)
+        return cursor
+
+    def set_cursor(self, cursor):
+        if cursor and ('key' in cursor or 'keys' in cursor):
+            self._last_key = cursor.get('key')
+            self._last_keys = dict(cursor.get('keys', {}))
+            self._count = cursor.get('count', 0)
+        else:
+            super().set_cursor(cursor)
 
     def read_input_items(self):
-        for item in self._store.iter():
-            yield item['value']
+        if self._prefixes:
+            items = self._read_prefixes()
+        else:
+            items = ((None, item) for item in self._read_items(None, self._last_key))
+
+        try:
+            for (prefix, item) in items:
+                if prefix is None:
+                    self._last_key = item['_key']
+                else:
+                    self._last_keys[prefix] = item['_key']
+                yield item['value']
+        finally:
+            self.close()
+
+    def close(self):
+        for prefetcher in self._prefetchers:
+            prefetcher.close()
+        self._prefetchers = []
+
+    def _read_prefixes(self):
+        if self._ordered:
+            return heapq.merge(*[
+                _with_prefix(prefix, self._read_items(prefix, self._last_keys.get(prefix)))
+                for prefix in self._prefixes
+            ], key=lambda t: t[1]['_key'])
+
+        pages = Prefetcher.unordered([
+            _with_prefix(prefix, self._read_pages(prefix, self._last_keys.get(prefix)))
+            for prefix in self._prefixes
+        ], max(self._prefetch, 1) * len(self._prefixes))
+        self._prefetchers.append(pages)
+        return ((prefix, item) for (prefix, page) in pages for item in page)
+
+    def _read_items(self, prefix, last_key):
+        pages = self._read_pages(prefix, last_key)
+        if self._prefetch > 0:
+            pages = Prefetcher(pages, self._prefetch)
+            self._prefetchers.append(pages)
+
+        for page in pages:
+            yield from page
+
+    def _read_pages(self, prefix, last_key):
+        while True:
+            params = {'count': self._page_size}
+            if prefix is not None:
+                params['prefix'] = prefix
+            if last_key is not None:
+                params['startafter'] = last_key
+
+            page = list(self._store.iter(**params))
+            if page:
+                yield page
+            if len(page) < self._page_size:
+                return
+
+            last_key = page[-1]['_key']
+
+
+def _with_prefix(prefix, iterable):
+    for value in iterable:
+        yield (prefix, value)
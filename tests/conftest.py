@@ -0,0 +1,9 @@
+import pytest
+
+from spider_feeder.store import clients
+
+
+@pytest.fixture(autouse=True)
+def close_clients():
+    yield
+    clients.pool.close()
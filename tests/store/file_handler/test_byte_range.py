@@ -0,0 +1,62 @@
+from io import BytesIO
+
+import pytest
+
+from spider_feeder.store.file_handler.byte_range import (
+    LineRangeReader,
+    PrefixedReader,
+    open_byte_range,
+)
+
+
+CONTENT = b'http://url1.com\nhttp://url22.com\n\nhttp://url333.com\nhttp://url4444.com'
+
+
+@pytest.mark.parametrize('count', [1, 2, 3, 5, 10, len(CONTENT)])
+@pytest.mark.parametrize('chunk_size', [1, 4, 1024])
+def test_split_into_line_ranges(mocker, count, chunk_size):
+    mocker.patch.object(LineRangeReader, 'CHUNK_SIZE', chunk_size)
+    size = len(CONTENT)
+
+    ranges = [
+        open_byte_range(BytesIO(CONTENT), (size * i // count, size * (i + 1) // count)).read()
+        for i in range(count)
+    ]
+
+    non_empty_ranges = [r for r in ranges if r]
+    assert b''.join(ranges) == CONTENT
+    assert all(r.endswith(b'\n') for r in non_empty_ranges[:-1])
+
+
+@pytest.mark.parametrize('byte_range, expected', [
+    ((0, 1), b'http://url1.com\n'),
+    ((0, 16), b'http://url1.com\n'),
+    ((0, 17), b'http://url1.com\nhttp://url22.com\n'),
+    ((16, 17), b'http://url22.com\n'),
+    ((17, 33), b''),
+    ((17, 34), b'\n'),
+    ((1, 16), b''),
+    ((40, None), b'http://url4444.com'),
+])
+def test_read_line_range(byte_range, expected):
+    assert open_byte_range(BytesIO(CONTENT), byte_range).read() == expected
+
+
+def test_tell_bytes_of_line_range():
+    fd = open_byte_range(BytesIO(CONTENT), (16, 17))
+    fd.read()
+
+    assert fd.raw.tell() == len(b'http://url22.com\n')
+
+
+def test_close_line_range():
+    fd = BytesIO(CONTENT)
+    open_byte_range(fd, (0, 1)).close()
+
+    assert fd.closed
+
+
+def test_read_prefixed_content():
+    fd = PrefixedReader(b'id,url\n', BytesIO(b'1,http://url1.com'))
+
+    assert fd.read() == b'id,url\n1,http://url1.com'
@@ -1,12 +1,176 @@
+import gzip
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.error import HTTPError
+
+import pytest
+from scrapy.settings import Settings
+
+from spider_feeder.store import clients
 from spider_feeder.store.file_handler import http
 
 
-def test_open_http_file(mocker):
-    urlopen_mock = mocker.patch('spider_feeder.store.file_handler.http.urlopen')
-    urlopen_mock().read.return_value = 'FILE CONTENT'
+FILE_CONTENT = 'http://url1.com\nhttp://url2.com\nhttp://vérystrangeurl.com'
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.clients.add(self.client_address)
+        self.server.requests.append((self.path, self.headers.get('Proxy-Authorization')))
+        encoding = self.path.split('.')[-1]
+        body = self.server.content.encode(self.server.encoding)
+
+        if self.path.startswith('/redirect'):
+            self.send_response(302)
+            self.send_header('Location', '/index.txt')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        if self.path.startswith('/slow'):
+            time.sleep(0.5)
+
+        if self.path.startswith('/missing'):
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('ETag', '"v1"')
+        if encoding == 'gz':
+            body = gzip.compress(body)
+            self.send_header('Content-Encoding', 'gzip')
+        elif encoding == 'zz':
+            body = zlib.compress(body)
+            self.send_header('Content-Encoding', 'deflate')
+        elif encoding == 'raw':
+            compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+            body = compressor.compress(body) + compressor.flush()
+            self.send_header('Content-Encoding', 'deflate')
+
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_HEAD(self):
+        self.server.clients.add(self.client_address)
+        if self.path.startswith('/get-only'):
+            self.send_response(405)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('ETag', '"v1"')
+        self.send_header('Content-Length', str(len(self.server.content.encode(self.server.encoding))))
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), RequestHandler)
+    server.content = FILE_CONTENT
+    server.encoding = 'utf-8'
+    server.clients = set()
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, args=(0.01,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    clients.pool.close()
+
+
+def url(server, path):
+    (host, port) = server.server_address
+    return f'http://{host}:{port}{path}'
+
+
+def test_open_http_file(server):
+    with http.open(url(server, '/index?qs=1'), encoding='utf-8', settings=None) as fd:
+        assert fd.read() == FILE_CONTENT
+
+
+def test_open_encoded_http_file(server):
+    server.encoding = 'iso-8859-1'
+    with http.open(url(server, '/index.txt'), encoding='iso-8859-1', settings=None) as fd:
+        assert fd.read() == FILE_CONTENT
+
+
+@pytest.mark.parametrize('path', ['/index.gz', '/index.zz', '/index.raw'])
+def test_open_compressed_http_file(server, path):
+    with http.open(url(server, path), encoding='utf-8', settings=None) as fd:
+        assert list(fd) == FILE_CONTENT.splitlines(keepends=True)
+
+
+def test_follow_redirects(server):
+    with http.open(url(server, '/redirect'), encoding='utf-8', settings=None) as fd:
+        assert fd.read() == FILE_CONTENT
+
+
+def test_fail_on_error_status(server):
+    with pytest.raises(HTTPError) as e:
+        http.open(url(server, '/missing'), encoding='utf-8', settings=None)
+
+    assert e.value.code == 404
+
+
+def test_reuse_connection(server):
+    for path in ['/index.txt', '/index.gz', '/index.zz']:
+        with http.open(url(server, path), encoding='utf-8', settings=None) as fd:
+            fd.read()
+
+    assert len(server.clients) == 1
+
+
+def test_stream_http_file(server):
+    server.content = '\n'.join(f'http://url{i}.com' for i in range(100000))
+
+    with http.open(url(server, '/index.gz'), encoding='utf-8', settings=None) as fd:
+        assert fd.readline() == 'http://url0.com\n'
+        assert sum(1 for _ in fd) == 99999
+
+
+@pytest.mark.parametrize('path', ['/index.txt', '/index.gz'])
+def test_open_http_file_in_binary_mode(server, path):
+    with http.open(url(server, path), encoding=None, settings=None) as fd:
+        assert fd.read() == FILE_CONTENT.encode('utf-8')
+
+
+def test_stat_http_file(server):
+    assert http.stat(url(server, '/index.txt'), settings=None) == {'etag': '"v1"'}
+
+    with http.open(url(server, '/index.txt'), encoding='utf-8', settings=None) as fd:
+        assert fd.read() == FILE_CONTENT
+    assert len(server.clients) == 1
+
+
+def test_stat_http_file_rejecting_head_requests(server):
+    assert http.stat(url(server, '/get-only/index.txt'), settings=None) == {'etag': '"v1"'}
+
+
+def test_open_http_file_through_proxy(server, monkeypatch):
+    (host, port) = server.server_address
+    monkeypatch.setenv('http_proxy', f'http://user:secret@{host}:{port}')
+    monkeypatch.delenv('no_proxy', raising=False)
+    monkeypatch.delenv('NO_PROXY', raising=False)
+
+    with http.open('http://url1.com/index.txt', encoding='utf-8', settings=None) as fd:
+        assert fd.read() == FILE_CONTENT
+
+    assert server.requests == [('http://url1.com/index.txt', 'Basic dXNlcjpzZWNyZXQ=')]
+
 
-    url = 'https://someurl.com/index?qs=1'
-    fd = http.open(url, encoding='utf-8', settings=None)
+def test_timeout_waiting_for_response(server):
+    settings = Settings({'SPIDERFEEDER_HTTP_TIMEOUT': 0.05})
 
-    urlopen_mock.assert_called_with(url)
-    assert fd.read() == 'FILE CONTENT'
+    with pytest.raises(TimeoutError):
+        http.open(url(server, '/slow.txt'), encoding='utf-8', settings=settings)
@@ -1,3 +1,4 @@
+import pytest
 from scrapy.settings import Settings
 
 from spider_feeder.store.file_handler import local
@@ -13,3 +14,93 @@ def test_open_local_file_with_scheme(mocker):
     mock = mocker.patch('spider_feeder.store.file_handler.local.builtins.open')
     local.open('file:///tmp/input_urls.txt', encoding='latin-1', settings=Settings())
     mock.assert_called_once_with('/tmp/input_urls.txt', encoding='latin-1')
+
+
+def test_open_local_file_in_binary_mode(mocker):
+    mock = mocker.patch('spider_feeder.store.file_handler.local.builtins.open')
+    local.open('file:///tmp/input_urls.txt.gz', encoding=None, settings=Settings())
+    mock.assert_called_once_with('/tmp/input_urls.txt.gz', 'rb')
+
+
+def test_open_local_file_byte_range(tmp_path):
+    file_path = tmp_path / 'input_urls.txt'
+    file_path.write_text('http://url1.com\nhttp://vérystrangeurl.com\nhttp://url3.com', encoding='utf-8')
+
+    fd = local.open(str(file_path), encoding='utf-8', settings=Settings(), byte_range=(10, 20))
+
+    assert fd.read() == 'http://vérystrangeurl.com\n'
+
+
+MMAP_CONTENT = 'http://url1.com\nhttp://vérystrangeurl.com\n\nhttp://url4.com'
+
+
+@pytest.fixture
+def mmap_file(tmp_path):
+    file_path = tmp_path / 'input_urls.txt'
+    file_path.write_text(MMAP_CONTENT, encoding='utf-8')
+    return str(file_path)
+
+
+def test_open_local_file_with_mmap(mmap_file):
+    settings = Settings({'SPIDERFEEDER_LOCAL_MMAP': True})
+
+    with local.open(mmap_file, encoding='utf-8', settings=settings) as fd:
+        assert isinstance(fd, local.MmapFile)
+        assert list(fd) == MMAP_CONTENT.splitlines(keepends=True)
+
+
+@pytest.mark.parametrize('size', [1, 2, 5, 1024])
+def test_read_mmap_file_in_chunks(mmap_file, size):
+    fd = local.MmapFile(mmap_file, 'utf-8')
+
+    chunks = []
+    for chunk in iter(lambda: fd.read(size), ''):
+        chunks.append(chunk)
+
+    assert ''.join(chunks) == MMAP_CONTENT
+    fd.close()
+
+
+def test_seek_mmap_file(mmap_file):
+    fd = local.MmapFile(mmap_file, 'utf-8')
+
+    assert fd.readline() == 'http://url1.com\n'
+    offset = fd.tell()
+    assert offset == 16
+    assert fd.readline() == 'http://vérystrangeurl.com\n'
+
+    fd.seek(offset)
+    assert fd.read() == MMAP_CONTENT[16:]
+    fd.close()
+
+
+@pytest.mark.parametrize('byte_range, expected', [
+    ((0, 1), ['http://url1.com\n']),
+    ((10, 20), ['http://vérystrangeurl.com\n']),
+    ((17, 44), ['\n']),
+    ((44, None), ['http://url4.com']),
+])
+def test_read_mmap_file_byte_range(mmap_file, byte_range, expected):
+    fd = local.MmapFile(mmap_file, 'utf-8', byte_range)
+
+    assert list(fd) == expected
+    fd.close()
+
+
+def test_read_empty_mmap_file(tmp_path):
+    file_path = tmp_path / 'input_urls.txt'
+    file_path.write_bytes(b'')
+
+    with local.MmapFile(str(file_path), 'utf-8') as fd:
+        assert list(fd) == []
+        assert fd.read() == ''
+
+
+@pytest.mark.parametrize('scheme', ['', 'file://'])
+def test_glob_local_files(tmp_path, scheme):
+    for file_name in ['b.csv', 'a.csv', 'c.txt']:
+        (tmp_path / file_name).write_text('http://url1.com', encoding='utf-8')
+
+    assert local.glob(f'{scheme}{tmp_path}/*.csv', Settings()) == [
+        f'{scheme}{tmp_path}/a.csv', f'{scheme}{tmp_path}/b.csv'
+    ]
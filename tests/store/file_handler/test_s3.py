@@ -1,5 +1,5 @@
 from datetime import datetime
-from io import StringIO, BytesIO
+from io import BufferedIOBase, BytesIO, TextIOBase
 
 import pytest
 import botocore.session
@@ -73,7 +73,7 @@ def test_open_s3_blob(botocore_client, mocker):
         fd = s3.open('s3://bucket/blob.txt', encoding='utf-8', settings=Settings())
 
         assert fd.read() == file_content
-        assert isinstance(fd, StringIO)
+        assert isinstance(fd, TextIOBase)
 
 
 def test_open_encoded_s3_blob(botocore_client, mocker):
@@ -160,3 +160,139 @@ def test_open_s3_blob_using_scrapy_credentials(botocore_client, mocker):
             aws_access_key_id='some_key_id',
             aws_secret_access_key='some_secret',
         )
+
+
+def test_open_s3_blob_in_binary_mode(botocore_client, mocker):
+    (stubber, _) = botocore_client(mocker)
+    with stubber:
+        file_content = 'http://url1.com\nhttps://url1.com'
+        expected_params = {'Bucket': 'bucket', 'Key': 'blob.txt.gz'}
+        stubber.add_response('get_object', get_object_response(file_content), expected_params)
+
+        fd = s3.open('s3://bucket/blob.txt.gz', encoding=None, settings=Settings())
+
+        assert isinstance(fd, BufferedIOBase)
+        assert fd.read() == file_content.encode('utf-8')
+
+
+def test_open_s3_blob_byte_range(botocore_client, mocker):
+    (stubber, _) = botocore_client(mocker)
+    with stubber:
+        file_content = 'http://url1.com\nhttps://url2.com\nhttps://url3.com'
+        expected_params = {
+            'Bucket': 'bucket',
+            'Key': 'blob.txt',
+            'ResponseContentEncoding': 'utf-8',
+            'Range': 'bytes=9-',
+        }
+        stubber.add_response('get_object', get_object_response(file_content[9:]), expected_params)
+
+        fd = s3.open(
+            's3://bucket/blob.txt',
+            encoding='utf-8',
+            settings=Settings(),
+            byte_range=(10, 20)
+        )
+
+        assert fd.read() == 'https://url2.com\n'
+
+
+def test_stream_s3_blob(botocore_client, mocker):
+    (stubber, _) = botocore_client(mocker)
+    with stubber:
+        file_content = 'http://url1.com\nhttps://url1.com'
+        stubber.add_response('get_object', get_object_response(file_content))
+
+        fd = s3.open('s3://bucket/blob.txt', encoding='utf-8', settings=Settings())
+
+        assert list(fd) == ['http://url1.com\n', 'https://url1.com']
+
+
+def test_seek_s3_blob(botocore_client, mocker):
+    (stubber, _) = botocore_client(mocker)
+    with stubber:
+        file_content = 'http://url1.com\nhttps://url1.com'
+        expected_params = {
+            'Bucket': 'bucket',
+            'Key': 'blob.txt',
+            'ResponseContentEncoding': 'utf-8',
+            'Range': 'bytes=16-',
+        }
+        stubber.add_response('get_object', get_object_response(file_content[16:]), expected_params)
+
+        reader = s3.S3Reader(stubber.client, 'bucket', 'blob.txt', 'utf-8')
+        reader.seek(16)
+
+        assert reader.read() == b'https://url1.com'
+
+
+def fake_s3_client(mocker, content):
+    def get_object(Range, **params):
+        (start, end) = Range.replace('bytes=', '').split('-')
+        return {'Body': BytesIO(content[int(start):int(end) + 1])}
+
+    client = mocker.Mock()
+    client.head_object.return_value = {'ContentLength': len(content)}
+    client.get_object.side_effect = get_object
+    session_mock = mocker.Mock()
+    session_mock.create_client.return_value = client
+    mocker.patch('spider_feeder.store.file_handler.s3.get_session', return_value=session_mock)
+    return client
+
+
+@pytest.mark.parametrize('part_size', [1, 3, 10, 1000])
+def test_download_s3_blob_in_parts(mocker, part_size):
+    file_content = 'http://url1.com\nhttps://url1.com\nhttp://vérystrangeurl.com'
+    client = fake_s3_client(mocker, file_content.encode('utf-8'))
+
+    fd = s3.open('s3://bucket/blob.txt', encoding='utf-8', settings=Settings({
+        'SPIDERFEEDER_S3_DOWNLOAD_WORKERS': 3,
+        'SPIDERFEEDER_S3_PART_SIZE': part_size,
+    }))
+
+    assert fd.read() == file_content
+    client.head_object.assert_called_once_with(Bucket='bucket', Key='blob.txt')
+    client.get_object.assert_any_call(
+        Bucket='bucket',
+        Key='blob.txt',
+        ResponseContentEncoding='utf-8',
+        Range=f'bytes=0-{min(part_size, len(file_content.encode("utf-8"))) - 1}'
+    )
+    fd.close()
+
+
+def test_reuse_s3_client(mocker):
+    fake_s3_client(mocker, b'http://url1.com')
+    session_mock = s3.get_session()
+
+    s3.open('s3://key:secret@bucket/blob1.txt', encoding='utf-8', settings=Settings())
+    s3.open('s3://key:secret@bucket/blob2.txt', encoding='utf-8', settings=Settings())
+    assert session_mock.create_client.call_count == 1
+
+    s3.open('s3://other:secret@bucket/blob1.txt', encoding='utf-8', settings=Settings())
+    assert session_mock.create_client.call_count == 2
+
+
+def test_glob_s3_blobs(mocker):
+    client = fake_s3_client(mocker, b'')
+    client.get_paginator.return_value.paginate.return_value = [
+        {'Contents': [{'Key': 'prefix/b.csv'}, {'Key': 'prefix/a.csv'}]},
+        {'Contents': [{'Key': 'prefix/c.txt'}, {'Key': 'prefix/sub/d.csv'}]},
+        {},
+    ]
+
+    assert s3.glob('s3://key:secret@bucket/prefix/*.csv', Settings()) == [
+        's3://key:secret@bucket/prefix/a.csv',
+        's3://key:secret@bucket/prefix/b.csv',
+        's3://key:secret@bucket/prefix/sub/d.csv',
+    ]
+    client.get_paginator.assert_called_once_with('list_objects_v2')
+    client.get_paginator().paginate.assert_called_once_with(Bucket='bucket', Prefix='prefix/')
+
+
+def test_stat_s3_blob(mocker):
+    client = fake_s3_client(mocker, b'')
+    client.head_object.return_value = {'ETag': '"v1"', 'LastModified': datetime(2015, 1, 1)}
+
+    assert s3.stat('s3://bucket/blob.txt', Settings()) == {'etag': '"v1"', 'last_modified': '2015-01-01T00:00:00'}
+    client.head_object.assert_called_once_with(Bucket='bucket', Key='blob.txt')
@@ -0,0 +1,190 @@
+import asyncio
+import gzip
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+import pytest
+from scrapy.settings import Settings
+
+from spider_feeder.store.async_store import AsyncFileStore, ThreadedStore
+from spider_feeder.store.base_store import BaseStore
+from spider_feeder.store.file_handler import s3
+
+
+async def chunk_reader(uri, settings):
+    content = settings['TEST_CONTENT']
+    for i in range(0, len(content), 5):
+        await asyncio.sleep(0)
+        yield content[i:i + 5]
+
+
+def read(store, count=None):
+    async def consume():
+        items = []
+        async for item in store:
+            items.append(item)
+            if len(items) == count:
+                break
+        return items
+
+    return asyncio.run(consume())
+
+
+def file_store(uri, content, **settings):
+    return AsyncFileStore(uri, Settings(dict(settings, TEST_CONTENT=content, SPIDERFEEDER_FILE_READERS={
+        'http': 'tests.store.test_async_store.chunk_reader',
+    })))
+
+
+def test_read_lines_in_chunks():
+    store = file_store('http://host/temp.txt', 'http://url1.com\nhttp://vérystrangeurl.com\n\nhttp://url3.com'.encode())
+
+    assert read(store) == [
+        ('http://url1.com', {}), ('http://vérystrangeurl.com', {}), ('', {}), ('http://url3.com', {}),
+    ]
+
+
+def test_read_csv_header_once():
+    store = file_store(
+        'http://host/temp.csv',
+        b'id,url\n1,http://url1.com\n2,http://url2.com\n3,http://url3.com',
+        SPIDERFEEDER_INPUT_FIELD='url',
+    )
+
+    assert read(store) == [(f'http://url{i}.com', {'id': str(i), 'url': f'http://url{i}.com'}) for i in (1, 2, 3)]
+
+
+@pytest.mark.parametrize('file_name, compress', [('temp.json', bytes), ('temp.jsonl.gz', gzip.compress)])
+def test_download_file_before_parsing(file_name, compress):
+    rows = [{'url': 'http://url1.com'}, {'url': 'http://url2.com'}]
+    content = json.dumps(rows) if file_name == 'temp.json' else '\n'.join(json.dumps(row) for row in rows)
+    store = file_store(f'http://host/{file_name}', compress(content.encode()), SPIDERFEEDER_INPUT_FIELD='url')
+
+    assert read(store) == [(row['url'], row) for row in rows]
+
+
+def test_parse_downloaded_file_in_thread():
+    threads = set()
+
+    def parse(fd, settings):
+        threads.add(threading.get_ident())
+        yield from (line.strip() for line in fd)
+
+    store = file_store(
+        'http://host/temp.txt.gz',
+        gzip.compress(b'http://url1.com\nhttp://url2.com'),
+        SPIDERFEEDER_FILE_PARSERS={'txt': parse},
+    )
+
+    assert read(store) == [('http://url1.com', {}), ('http://url2.com', {})]
+    assert threads and threading.get_ident() not in threads
+
+
+def test_resume_async_store_from_cursor():
+    store = file_store('http://host/temp.txt', b'http://url1.com\nhttp://url2.com\nhttp://url3.com')
+    read(store, count=1)
+    cursor = store.get_cursor()
+
+    store = file_store('http://host/temp.txt', b'http://url1.com\nhttp://url2.com\nhttp://url3.com')
+    store.set_cursor(cursor)
+    assert read(store) == [('http://url2.com', {}), ('http://url3.com', {})]
+
+
+def test_async_store_is_not_iterable():
+    with pytest.raises(TypeError):
+        iter(file_store('http://host/temp.txt', b''))
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = gzip.compress(b'http://url1.com\nhttp://url2.com')
+        self.send_response(200)
+        self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_read_http_file():
+    pytest.importorskip('aiohttp')
+    server = ThreadingHTTPServer(('127.0.0.1', 0), RequestHandler)
+    threading.Thread(target=server.serve_forever, args=(0.01,), daemon=True).start()
+    try:
+        (host, port) = server.server_address
+        store = AsyncFileStore(f'http://{host}:{port}/temp.txt', Settings())
+        assert read(store) == [('http://url1.com', {}), ('http://url2.com', {})]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_read_s3_object(mocker):
+    client = mocker.Mock()
+    client.get_object.return_value = {'Body': BytesIO(b'http://url1.com\nhttp://url2.com')}
+    mocker.patch.object(s3, '_get_client', return_value=client)
+
+    async def read_chunks():
+        return [chunk async for chunk in s3.iter_chunks('s3://bucket/temp.txt', Settings(), chunk_size=4)]
+
+    assert b''.join(asyncio.run(read_chunks())) == b'http://url1.com\nhttp://url2.com'
+    client.get_object.assert_called_once_with(Bucket='bucket', Key='temp.txt')
+
+
+class ListStore(BaseStore):
+
+    def read_input_items(self):
+        return iter(f'http://url{i}.com' for i in range(10))
+
+
+def test_read_sync_store_in_thread():
+    store = ThreadedStore(ListStore(Settings()), prefetch=3)
+
+    assert read(store) == [(f'http://url{i}.com', {}) for i in range(10)]
+
+
+def test_threaded_store_cursor_follows_consumer():
+    store = ThreadedStore(ListStore(Settings()), prefetch=100)
+    store.set_cursor(None)
+
+    assert len(read(store, count=3)) == 3
+    assert store.get_cursor() == {'count': 3}
+    store.close()
+
+
+def test_cancel_threaded_store_waiting_for_items():
+    release = threading.Event()
+
+    class SlowStore:
+        def __iter__(self):
+            yield ('http://url1.com', {})
+            release.wait(10)
+
+    async def cancel():
+        store = ThreadedStore(SlowStore(), prefetch=10)
+        items = []
+
+        async def consume():
+            async for item in store:
+                items.append(item)
+
+        task = asyncio.ensure_future(consume())
+        while not items:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        store.close()
+
+    # asyncio.run waits for the executor thread waiting for the next item
+    runner = threading.Thread(target=asyncio.run, args=(cancel(),), daemon=True)
+    runner.start()
+    runner.join(5)
+    release.set()
+    assert not runner.is_alive()
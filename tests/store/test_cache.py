@@ -0,0 +1,120 @@
+import hashlib
+import os
+from io import BytesIO
+
+import pytest
+from scrapy.settings import Settings
+
+from spider_feeder.store.cache import FileCache
+
+
+class RemoteFiles:
+
+    def __init__(self, **files):
+        self.files = {f'http://host/{name}': content for (name, content) in files.items()}
+        self.versions = {}
+        self.opened = []
+
+    def open(self, file_uri, encoding, settings):
+        assert encoding is None
+        self.opened.append(file_uri)
+        return BytesIO(self.files[file_uri])
+
+    def stat(self, file_uri, settings):
+        version = self.versions.get(file_uri, 'v1')
+        return {'etag': version} if version else {}
+
+
+def read(cache, remote, name, **kwargs):
+    handler = cache.wrap(remote.open, remote.stat)
+    with handler(f'http://host/{name}', encoding='utf-8', settings=Settings(), **kwargs) as fd:
+        return fd.read()
+
+
+def test_download_file_once(tmp_path):
+    remote = RemoteFiles(a=b'http://url1.com\nhttp://url2.com')
+
+    assert read(FileCache(str(tmp_path)), remote, 'a') == 'http://url1.com\nhttp://url2.com'
+    assert read(FileCache(str(tmp_path)), remote, 'a') == 'http://url1.com\nhttp://url2.com'
+    assert remote.opened == ['http://host/a']
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
+
+
+def test_download_changed_file(tmp_path):
+    remote = RemoteFiles(a=b'http://url1.com')
+    read(FileCache(str(tmp_path)), remote, 'a')
+
+    remote.files['http://host/a'] = b'http://url2.com'
+    remote.versions['http://host/a'] = 'v2'
+
+    assert read(FileCache(str(tmp_path)), remote, 'a') == 'http://url2.com'
+    assert len(remote.opened) == 2
+
+
+def test_always_download_file_without_validators(tmp_path):
+    remote = RemoteFiles(a=b'http://url1.com')
+    remote.versions['http://host/a'] = None
+
+    read(FileCache(str(tmp_path)), remote, 'a')
+    read(FileCache(str(tmp_path)), remote, 'a')
+
+    assert len(remote.opened) == 2
+
+
+def test_download_file_if_revalidation_fails(tmp_path, mocker):
+    remote = RemoteFiles(a=b'http://url1.com')
+    read(FileCache(str(tmp_path)), remote, 'a')
+    mocker.patch.object(remote, 'stat', side_effect=OSError('HEAD rejected'))
+
+    assert read(FileCache(str(tmp_path)), remote, 'a') == 'http://url1.com'
+    assert len(remote.opened) == 2
+
+
+def test_revalidate_once_by_cache(tmp_path, mocker):
+    remote = RemoteFiles(a=b'http://url1.com')
+    stat = mocker.spy(remote, 'stat')
+    cache = FileCache(str(tmp_path))
+
+    read(cache, remote, 'a')
+    read(cache, remote, 'a')
+
+    assert stat.call_count == 1
+
+
+def test_read_byte_range_of_cached_file(tmp_path):
+    remote = RemoteFiles(a=b'http://url1.com\nhttp://url2.com\n')
+
+    assert read(FileCache(str(tmp_path)), remote, 'a', byte_range=(1, None)) == 'http://url2.com\n'
+
+
+def test_evict_least_recently_used_files(tmp_path):
+    remote = RemoteFiles(a=b'a' * 10, b=b'b' * 10, c=b'c' * 10)
+    read(FileCache(str(tmp_path), max_size=25), remote, 'a')
+    read(FileCache(str(tmp_path), max_size=25), remote, 'b')
+    os.utime(meta_path(tmp_path, 'a'), (2000, 2000))
+    os.utime(meta_path(tmp_path, 'b'), (1000, 1000))
+    remote.opened.clear()
+
+    read(FileCache(str(tmp_path), max_size=25), remote, 'c')
+    read(FileCache(str(tmp_path), max_size=25), remote, 'a')
+    read(FileCache(str(tmp_path), max_size=25), remote, 'b')
+
+    assert remote.opened == ['http://host/c', 'http://host/b']
+    assert sum(os.path.getsize(tmp_path / name) for name in os.listdir(tmp_path) if name.endswith('.data')) <= 25
+
+
+def meta_path(tmp_path, name):
+    return tmp_path / f'{hashlib.sha256(f"http://host/{name}".encode("utf-8")).hexdigest()}.json'
+
+
+def test_keep_cache_on_failed_download(tmp_path):
+    remote = RemoteFiles()
+
+    with pytest.raises(KeyError):
+        read(FileCache(str(tmp_path)), remote, 'a')
+
+    assert os.listdir(tmp_path) == []
+
+
+def test_cache_is_disabled_by_default():
+    assert FileCache.from_settings(Settings()) is None
@@ -0,0 +1,52 @@
+from unittest.mock import Mock
+
+from spider_feeder.store.clients import ClientPool
+
+
+def test_build_client_on_first_use():
+    pool = ClientPool()
+    factory = Mock(side_effect=lambda: Mock())
+
+    client = pool.get(('s3', 'key', 'secret'), factory)
+    assert pool.get(('s3', 'key', 'secret'), factory) is client
+    assert pool.get(('s3', 'other', 'secret'), factory) is not client
+    assert factory.call_count == 2
+
+
+def test_close_clients():
+    pool = ClientPool()
+    client = pool.get('s3', Mock)
+    pool.get('plain', object)
+
+    pool.close()
+    client.close.assert_called_once_with()
+    assert pool.get('s3', Mock) is not client
+
+
+def test_close_clients_once_released_by_every_user():
+    pool = ClientPool()
+    pool.acquire()
+    pool.acquire()
+    client = pool.get('s3', Mock)
+
+    pool.release()
+    client.close.assert_not_called()
+    assert pool.get('s3', Mock) is client
+
+    pool.release()
+    client.close.assert_called_once_with()
+    assert pool.get('s3', Mock) is not client
+
+
+def test_keep_client_built_first():
+    pool = ClientPool()
+    (first, second) = (Mock(), Mock())
+
+    def factory():
+        # another thread builds the client while this one is being built
+        pool._clients.setdefault('s3', first)
+        return second
+
+    assert pool.get('s3', factory) is first
+    second.close.assert_called_once_with()
+    first.close.assert_not_called()
@@ -0,0 +1,46 @@
+import bz2
+import gzip
+import lzma
+from io import BytesIO, BufferedReader
+
+import pytest
+
+from spider_feeder.store import compression
+
+
+CONTENT = b'http://url1.com\nhttp://url2.com'
+
+
+def zstd_compress(content):
+    zstandard = pytest.importorskip('zstandard')
+    return zstandard.ZstdCompressor().compress(content)
+
+
+COMPRESSIONS = [
+    ('gz', gzip.compress, compression.open_gzip),
+    ('bz2', bz2.compress, compression.open_bz2),
+    ('xz', lzma.compress, compression.open_xz),
+    ('zst', zstd_compress, compression.open_zstd),
+]
+
+
+@pytest.mark.parametrize('name, compress, decompress', COMPRESSIONS)
+def test_decompress(name, compress, decompress):
+    fd = decompress(BytesIO(compress(CONTENT)))
+
+    assert fd.read() == CONTENT
+
+
+@pytest.mark.parametrize('name, compress, decompress', COMPRESSIONS)
+def test_detect_compression(name, compress, decompress):
+    fd = BufferedReader(BytesIO(compress(CONTENT)))
+
+    assert compression.detect(fd) == name
+    assert decompress(fd).read() == CONTENT
+
+
+def test_detect_no_compression():
+    fd = BufferedReader(BytesIO(CONTENT))
+
+    assert compression.detect(fd) is None
+    assert fd.read() == CONTENT
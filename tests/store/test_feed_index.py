@@ -0,0 +1,156 @@
+import json
+import os
+
+import pytest
+from scrapy.settings import Settings
+
+from spider_feeder.store import feed_index
+from spider_feeder.store.feed_index import FeedIndex, FeedIndexStore
+
+
+def write_lines(tmp_path, file_name, lines):
+    file_path = tmp_path / file_name
+    file_path.write_text('\n'.join(lines), encoding='utf-8')
+    return str(file_path)
+
+
+def index_settings(tmp_path, **settings):
+    return Settings(dict(settings, SPIDERFEEDER_INDEX_DIR=str(tmp_path / 'index')))
+
+
+def test_read_txt_file_from_index(tmp_path):
+    urls = ['http://url1.com', 'http://url2.com', 'http://vérystrangeurl.com']
+    file_path = write_lines(tmp_path, 'temp.txt', urls)
+
+    store = FeedIndexStore(file_path, index_settings(tmp_path))
+
+    assert list(store) == [(url, {}) for url in urls]
+    store.close()
+
+
+def test_read_csv_file_from_index(tmp_path):
+    file_path = write_lines(tmp_path, 'temp.csv', ['id,url', '1,http://url1.com', '2,', '3'])
+
+    store = FeedIndexStore(file_path, index_settings(tmp_path, SPIDERFEEDER_INPUT_FIELD='url'))
+
+    assert list(store) == [
+        ('http://url1.com', {'id': '1', 'url': 'http://url1.com'}),
+        ('', {'id': '2', 'url': ''}),
+        (None, {'id': '3', 'url': None}),
+    ]
+    store.close()
+
+
+def test_read_records_as_dicts(tmp_path):
+    file_path = write_lines(tmp_path, 'temp.csv', ['id,url', '1,http://url1.com'])
+    store = FeedIndexStore(file_path, index_settings(tmp_path, SPIDERFEEDER_INPUT_FIELD='url'))
+
+    [(url, record)] = list(store)
+
+    assert type(record) is dict
+    record['extra'] = 'value'
+    assert json.loads(json.dumps(record)) == {'id': '1', 'url': 'http://url1.com', 'extra': 'value'}
+    store.close()
+
+
+def test_reuse_index_while_file_is_unchanged(tmp_path, mocker):
+    file_path = write_lines(tmp_path, 'temp.txt', ['http://url1.com'])
+    compile_index = mocker.spy(feed_index, 'compile_index')
+    settings = index_settings(tmp_path)
+
+    for _ in range(2):
+        store = FeedIndexStore(file_path, settings)
+        assert [url for (url, _) in store] == ['http://url1.com']
+        store.close()
+    assert compile_index.call_count == 1
+
+    write_lines(tmp_path, 'temp.txt', ['http://url2.com'])
+    store = FeedIndexStore(file_path, settings)
+    assert [url for (url, _) in store] == ['http://url2.com']
+    store.close()
+    assert compile_index.call_count == 2
+
+
+def test_hash_file_only_when_validators_change(tmp_path, mocker):
+    file_path = write_lines(tmp_path, 'temp.txt', ['http://url1.com'])
+    settings = index_settings(tmp_path)
+    store = FeedIndexStore(file_path, settings)
+    list(store)
+    store.close()
+
+    compile_index = mocker.spy(feed_index, 'compile_index')
+    source_checksum = mocker.spy(feed_index, 'source_checksum')
+    store = FeedIndexStore(file_path, settings)
+    list(store)
+    store.close()
+    assert source_checksum.call_count == 0
+
+    stat = os.stat(file_path)
+    os.utime(file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    for _ in range(2):
+        store = FeedIndexStore(file_path, settings)
+        assert [url for (url, _) in store] == ['http://url1.com']
+        store.close()
+    assert source_checksum.call_count == 1
+    assert compile_index.call_count == 0
+
+
+def test_index_by_parse_settings(tmp_path):
+    assert feed_index.get_index_path('dir', 'temp.csv', Settings()) != feed_index.get_index_path(
+        'dir', 'temp.csv', Settings({'SPIDERFEEDER_INPUT_FIELD': 'url'})
+    )
+
+
+@pytest.mark.parametrize('count', [1, 2, 3, 7])
+def test_read_index_shard(tmp_path, count):
+    urls = [f'http://url{i}.com' for i in range(20)]
+    file_path = write_lines(tmp_path, 'temp.txt', urls)
+
+    shards = []
+    for index in range(count):
+        store = FeedIndexStore(file_path, index_settings(tmp_path))
+        assert store.set_shard(index, count)
+        shards.append([url for (url, _) in store])
+
+    assert sum(shards, []) == urls
+
+
+def test_resume_index_shard_from_cursor(tmp_path):
+    urls = [f'http://url{i}.com' for i in range(20)]
+    file_path = write_lines(tmp_path, 'temp.txt', urls)
+
+    store = FeedIndexStore(file_path, index_settings(tmp_path))
+    store.set_shard(1, 2)
+    items = iter(store)
+    assert [url for (url, _) in (next(items), next(items))] == urls[10:12]
+    cursor = store.get_cursor()
+    store.close()
+
+    store = FeedIndexStore(file_path, index_settings(tmp_path))
+    store.set_cursor(cursor)
+    store.set_shard(1, 2)
+    assert [url for (url, _) in store] == urls[12:]
+    assert store.get_cursor() == {'count': 10}
+
+
+def test_ignore_invalid_index(tmp_path):
+    index_path = tmp_path / 'temp.idx'
+    index_path.write_bytes(b'invalid')
+
+    assert FeedIndex.open(str(index_path)) is None
+    assert FeedIndex.open(str(tmp_path / 'missing.idx')) is None
+
+
+def test_compile_index_ahead_of_time(tmp_path, mocker):
+    file_path = write_lines(tmp_path, 'temp.csv', ['id,url', '1,http://url1.com'])
+    index_dir = str(tmp_path / 'index')
+
+    index_path = feed_index.main([file_path, '-s', f'SPIDERFEEDER_INDEX_DIR={index_dir}',
+                                  '-s', 'SPIDERFEEDER_INPUT_FIELD=url'])
+
+    assert os.path.dirname(index_path) == index_dir
+    compile_index = mocker.spy(feed_index, 'compile_index')
+    store = FeedIndexStore(file_path, index_settings(tmp_path, SPIDERFEEDER_INPUT_FIELD='url'))
+    assert list(store) == [('http://url1.com', {'id': '1', 'url': 'http://url1.com'})]
+    store.close()
+    assert compile_index.call_count == 0
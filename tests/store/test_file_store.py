@@ -1,9 +1,13 @@
+import gzip
 import json
-from io import StringIO
+import lzma
+import os
+from io import BytesIO, StringIO
 
 from scrapy.settings import Settings
 import pytest
 
+from spider_feeder.store.file_handler import local
 from spider_feeder.store.file_store import FileStore
 
 
@@ -98,6 +102,35 @@ def test_load_json_file(mocker, uri_scheme, file_opener):
     ]
 
 
+def test_load_tsv_file(tmp_path):
+    file_path = write_lines(tmp_path, 'temp.tsv', ['url_id\turl', '1\thttp://url1.com', '2\thttp://url2.com'])
+    store = FileStore(file_path, Settings({'SPIDERFEEDER_INPUT_FIELD': 'url'}))
+
+    assert list(store) == [
+        ('http://url1.com', {'url_id': '1', 'url': 'http://url1.com'}),
+        ('http://url2.com', {'url_id': '2', 'url': 'http://url2.com'}),
+    ]
+
+
+@pytest.mark.parametrize('uri_scheme, file_opener', SCHEMES_AND_OPENERS_TO_MOCK)
+def test_load_jsonl_file(mocker, uri_scheme, file_opener):
+    file_content = StringIO('\n'.join([
+        json.dumps({'url_id': '1', 'url': 'http://url1.com'}),
+        json.dumps({'url_id': '2', 'url': 'http://url2.com'}),
+    ]))
+    mocker.patch(file_opener, return_value=file_content, autospec=True)
+
+    settings = Settings({
+        'SPIDERFEEDER_INPUT_FIELD': 'url'
+    })
+    store = FileStore(f'{uri_scheme}temp.jsonl', settings)
+
+    assert list(store) == [
+        ('http://url1.com', {'url_id': '1', 'url': 'http://url1.com'}),
+        ('http://url2.com', {'url_id': '2', 'url': 'http://url2.com'}),
+    ]
+
+
 @pytest.mark.parametrize('uri_scheme, file_opener', SCHEMES_AND_OPENERS_TO_MOCK)
 def test_get_file_format_from_setting(mocker, uri_scheme, file_opener):
     file_content = StringIO('\n'.join(['http://url1.com', 'http://url2.com']))
@@ -215,3 +248,392 @@ def test_custom_file_parser(mocker):
         pass
 
     mock.assert_called_with(content, settings)
+
+
+def test_open_file_on_first_item(mocker):
+    content = StringIO('\n'.join(['http://url1.com', 'http://url2.com']))
+    mock = mocker.patch(
+        'spider_feeder.store.file_handler.local.open',
+        return_value=content,
+        autospec=True
+    )
+
+    store = iter(FileStore('temp.txt', Settings()))
+    mock.assert_not_called()
+
+    assert next(store) == ('http://url1.com', {})
+    assert mock.call_count == 1
+    assert not content.closed
+
+    assert list(store) == [('http://url2.com', {})]
+    assert content.closed
+
+
+def test_close_file_when_iteration_stops(mocker):
+    content = StringIO('\n'.join(['http://url1.com', 'http://url2.com']))
+    mocker.patch(
+        'spider_feeder.store.file_handler.local.open',
+        return_value=content,
+        autospec=True
+    )
+
+    for (url, meta) in FileStore('temp.txt', Settings()):
+        break
+
+    assert content.closed
+
+
+def test_close_store_while_reading(mocker):
+    content = StringIO('\n'.join(['http://url1.com', 'http://url2.com']))
+    mocker.patch(
+        'spider_feeder.store.file_handler.local.open',
+        return_value=content,
+        autospec=True
+    )
+
+    store = FileStore('temp.txt', Settings())
+    items = iter(store)
+    next(items)
+    store.close()
+
+    assert content.closed
+    items.close()
+
+
+@pytest.mark.parametrize('file_name, compress', [
+    ('temp.txt.gz', gzip.compress),
+    ('temp.txt.xz', lzma.compress),
+])
+@pytest.mark.parametrize('uri_scheme, file_opener', SCHEMES_AND_OPENERS_TO_MOCK)
+def test_load_compressed_file(mocker, uri_scheme, file_opener, file_name, compress):
+    file_content = BytesIO(compress(b'http://url1.com\nhttp://url2.com'))
+    mock = mocker.patch(file_opener, return_value=file_content, autospec=True)
+
+    settings = Settings()
+    store = FileStore(f'{uri_scheme}{file_name}', settings)
+
+    assert list(store) == [('http://url1.com', {}), ('http://url2.com', {})]
+    mock.assert_called_with(f'{uri_scheme}{file_name}', encoding=None, settings=settings)
+    assert file_content.closed
+
+
+def test_load_compressed_file_from_disk(tmp_path):
+    file_path = tmp_path / 'temp.csv.gz'
+    file_path.write_bytes(gzip.compress('url_id,url\n1,http://vérystrangeurl.com'.encode('latin-1')))
+
+    store = FileStore(str(file_path), Settings({
+        'SPIDERFEEDER_INPUT_FIELD': 'url',
+        'SPIDERFEEDER_INPUT_FILE_ENCODING': 'latin-1',
+    }))
+
+    assert list(store) == [
+        ('http://vérystrangeurl.com', {'url_id': '1', 'url': 'http://vérystrangeurl.com'}),
+    ]
+    assert store.get_metrics()['bytes_read'] == file_path.stat().st_size
+
+
+def test_count_bytes_read_after_close(tmp_path):
+    file_path = write_lines(tmp_path, 'temp.txt', [f'http://url{i}.com' for i in range(3)])
+    store = FileStore(file_path, Settings())
+
+    assert len(list(store)) == 3
+    assert store.get_metrics()['bytes_read'] == os.path.getsize(file_path)
+    store.close()
+    assert store.get_metrics()['bytes_read'] == os.path.getsize(file_path)
+
+
+@pytest.mark.parametrize('content', [
+    gzip.compress(b'http://url1.com\nhttp://url2.com'),
+    lzma.compress(b'http://url1.com\nhttp://url2.com'),
+    b'http://url1.com\nhttp://url2.com',
+])
+def test_detect_compression_from_magic_number(mocker, content):
+    mocker.patch(
+        'spider_feeder.store.file_handler.s3.open',
+        return_value=BytesIO(content),
+        autospec=True
+    )
+
+    store = FileStore('s3://bucket/urls', Settings({
+        'SPIDERFEEDER_INPUT_FORMAT': 'txt',
+        'SPIDERFEEDER_INPUT_COMPRESSION': 'auto',
+    }))
+
+    assert list(store) == [('http://url1.com', {}), ('http://url2.com', {})]
+
+
+def test_custom_file_decompressor(mocker):
+    mocker.patch(
+        'spider_feeder.store.file_handler.local.open',
+        return_value=BytesIO(b'http://url1.com\nhttp://url2.com'),
+        autospec=True
+    )
+
+    store = FileStore('temp.txt.abc', Settings({
+        'SPIDERFEEDER_FILE_DECOMPRESSORS': {
+            'abc': 'tests.store.test_file_store.custom_decompressor'
+        }
+    }))
+
+    assert list(store) == [('HTTP://URL1.COM', {}), ('HTTP://URL2.COM', {})]
+
+
+def custom_decompressor(fd):
+    return BytesIO(fd.read().upper())
+
+
+def write_lines(tmp_path, file_name, lines):
+    file_path = tmp_path / file_name
+    file_path.write_text('\n'.join(lines), encoding='utf-8')
+    return str(file_path)
+
+
+@pytest.mark.parametrize('count', [1, 2, 3, 7])
+def test_load_txt_file_shard(tmp_path, count):
+    urls = [f'http://url{i}.com' for i in range(20)]
+    file_path = write_lines(tmp_path, 'temp.txt', urls)
+
+    shards = []
+    for index in range(count):
+        store = FileStore(file_path, Settings())
+        assert store.set_shard(index, count)
+        shards.append([url for (url, _) in store])
+
+    assert sum(shards, []) == urls
+    assert all(shards)
+
+
+def test_load_csv_file_shard(tmp_path):
+    file_path = write_lines(tmp_path, 'temp.csv', ['url_id,url'] + [
+        f'{i},http://url{i}.com' for i in range(20)
+    ])
+
+    shards = []
+    for index in range(3):
+        store = FileStore(file_path, Settings({'SPIDERFEEDER_INPUT_FIELD': 'url'}))
+        assert store.set_shard(index, 3)
+        shards.append(list(store))
+
+    assert sum(shards, []) == [
+        (f'http://url{i}.com', {'url_id': str(i), 'url': f'http://url{i}.com'}) for i in range(20)
+    ]
+    assert all(shards)
+
+
+@pytest.mark.parametrize('file_name', ['temp.json', 'temp.txt.gz', 'sc://temp.txt'])
+def test_store_does_not_support_shard(file_name):
+    store = FileStore(file_name, Settings({
+        'SPIDERFEEDER_FILE_HANDLERS': {
+            'sc': 'tests.store.test_file_store.custom_open'
+        }
+    }))
+
+    assert not store.set_shard(0, 2)
+
+
+@pytest.mark.parametrize('file_name, lines, field', [
+    ('temp.txt', ['http://url1.com', 'http://url2.com'], None),
+    ('temp.jsonl', ['{"url": "http://url1.com"}', '{"url": "http://url2.com"}'], 'url'),
+    ('temp.json', ['[{"url": "http://url1.com"},', '{"url": "http://url2.com"}]'], 'url'),
+])
+def test_load_file_with_mmap(tmp_path, file_name, lines, field):
+    file_path = write_lines(tmp_path, file_name, lines)
+    store = FileStore(file_path, Settings({
+        'SPIDERFEEDER_LOCAL_MMAP': True,
+        'SPIDERFEEDER_INPUT_FIELD': field,
+    }))
+
+    assert [url for (url, _) in store] == ['http://url1.com', 'http://url2.com']
+
+
+def test_load_file_shard_with_mmap(tmp_path):
+    urls = [f'http://url{i}.com' for i in range(20)]
+    file_path = write_lines(tmp_path, 'temp.txt', urls)
+
+    shards = []
+    for index in range(3):
+        store = FileStore(file_path, Settings({'SPIDERFEEDER_LOCAL_MMAP': True}))
+        assert store.set_shard(index, 3)
+        shards.append([url for (url, _) in store])
+
+    assert sum(shards, []) == urls
+
+
+@pytest.mark.parametrize('file_name, lines, field', [
+    ('temp.txt', [f'http://url{i}.com' for i in range(20)], None),
+    ('temp.csv', ['url'] + [f'http://url{i}.com' for i in range(20)], 'url'),
+])
+def test_read_resumed_and_sharded_file_with_mmap(tmp_path, mocker, file_name, lines, field):
+    file_path = write_lines(tmp_path, file_name, lines)
+    mmap_file = mocker.spy(local, 'MmapFile')
+    store = FileStore(file_path, Settings({'SPIDERFEEDER_LOCAL_MMAP': True, 'SPIDERFEEDER_INPUT_FIELD': field}))
+    store.set_shard(1, 2)
+    store.set_cursor(None)
+
+    assert len(list(store)) > 0
+    assert mmap_file.call_count == 1
+
+
+@pytest.mark.parametrize('settings', [{}, {'SPIDERFEEDER_LOCAL_MMAP': True}])
+def test_resume_txt_file_from_cursor(tmp_path, settings):
+    urls = [f'http://url{i}.com' for i in range(10)]
+    file_path = write_lines(tmp_path, 'temp.txt', urls)
+
+    store = FileStore(file_path, Settings(settings))
+    store.set_cursor(None)
+    items = iter(store)
+    assert [next(items)[0] for _ in range(4)] == urls[:4]
+    cursor = store.get_cursor()
+    store.close()
+
+    assert cursor == {'count': 4, 'offset': sum(len(url) + 1 for url in urls[:4])}
+
+    store = FileStore(file_path, Settings(settings))
+    store.set_cursor(cursor)
+    assert [url for (url, _) in store] == urls[4:]
+    assert store.get_cursor()['count'] == 10
+
+
+@pytest.mark.parametrize('settings', [{}, {'SPIDERFEEDER_LOCAL_MMAP': True}])
+def test_resume_csv_file_shard_from_cursor(tmp_path, settings):
+    rows = [f'{i},http://url{i}.com' for i in range(20)]
+    file_path = write_lines(tmp_path, 'temp.csv', ['url_id,url'] + rows)
+    settings = Settings(dict(settings, SPIDERFEEDER_INPUT_FIELD='url'))
+
+    store = FileStore(file_path, settings)
+    assert store.set_shard(1, 2)
+    store.set_cursor(None)
+    shard = [url for (url, _) in store]
+
+    store = FileStore(file_path, settings)
+    store.set_shard(1, 2)
+    store.set_cursor(None)
+    items = iter(store)
+    next(items)
+    cursor = store.get_cursor()
+    store.close()
+
+    store = FileStore(file_path, settings)
+    store.set_shard(1, 2)
+    store.set_cursor(cursor)
+    assert [(url, meta['url_id']) for (url, meta) in store] == [
+        (url, url[len('http://url'):-len('.com')]) for url in shard[1:]
+    ]
+
+
+def test_resume_json_file_from_count(tmp_path):
+    file_path = write_lines(tmp_path, 'temp.json', ['["http://url1.com", "http://url2.com", "http://url3.com"]'])
+
+    store = FileStore(file_path, Settings())
+    store.set_cursor({'count': 2})
+    assert list(store) == [('http://url3.com', {})]
+    assert store.get_cursor() == {'count': 3}
+
+
+def test_expand_uri(tmp_path):
+    write_lines(tmp_path, 'urls1.txt', ['http://url1.com'])
+    write_lines(tmp_path, 'urls2.txt', ['http://url2.com'])
+
+    assert FileStore.expand_uri(f'{tmp_path}/urls*.txt', Settings()) == [
+        f'{tmp_path}/urls1.txt', f'{tmp_path}/urls2.txt'
+    ]
+    assert FileStore.expand_uri('https://host/urls?id=1', Settings()) == ['https://host/urls?id=1']
+
+
+@pytest.mark.parametrize('shard', [None, (1, 2)])
+def test_file_store_metrics(tmp_path, shard):
+    file_path = write_lines(tmp_path, 'temp.txt', [f'http://url{i}.com' for i in range(20)])
+    store = FileStore(file_path, Settings())
+    if shard:
+        store.set_shard(*shard)
+
+    assert list(store)
+    metrics = store.get_metrics()
+    assert 0 < metrics['bytes_read'] <= os.path.getsize(file_path)
+    assert metrics['parse_time'] > 0
+
+
+@pytest.mark.parametrize('file_name', ['temp.parquet', 'temp.arrow'])
+def test_load_columnar_file(tmp_path, file_name):
+    pa = pytest.importorskip('pyarrow')
+    import pyarrow.parquet as pq
+
+    table = pa.table({
+        'url': [f'http://url{i}.com' for i in range(3)],
+        'url_id': list(range(3)),
+        'payload': ['x' * 10] * 3,
+    })
+    file_path = str(tmp_path / file_name)
+    if file_name.endswith('.parquet'):
+        pq.write_table(table, file_path)
+    else:
+        with pa.ipc.new_file(file_path, table.schema) as writer:
+            writer.write_table(table)
+
+    store = FileStore(file_path, Settings({
+        'SPIDERFEEDER_INPUT_FIELD': 'url',
+        'SPIDERFEEDER_INPUT_COLUMNS': ['url_id'],
+    }))
+
+    assert list(store) == [(f'http://url{i}.com', {'url': f'http://url{i}.com', 'url_id': i}) for i in range(3)]
+    assert store.get_metrics()['bytes_read'] > 0
+
+
+def custom_stat(file_uri, settings):
+    return {'etag': 'v1'}
+
+
+def test_load_file_from_cache(mocker, tmp_path):
+    opener = mocker.patch(
+        'spider_feeder.store.file_handler.s3.open',
+        side_effect=lambda *args, **kwargs: BytesIO(b'url_id,url\n1,http://url1.com\n2,http://url2.com'),
+    )
+    settings = Settings({
+        'SPIDERFEEDER_INPUT_FIELD': 'url',
+        'SPIDERFEEDER_FILE_CACHE_DIR': str(tmp_path),
+        'SPIDERFEEDER_FILE_VALIDATORS': {'s3': 'tests.store.test_file_store.custom_stat'},
+    })
+
+    for _ in range(2):
+        store = FileStore('s3://bucket/temp.csv', settings)
+        assert store.set_shard(1, 2)
+        assert [url for (url, _) in store] == ['http://url2.com']
+
+    assert opener.call_count == 1
+
+
+@pytest.mark.parametrize('file_name, lines, field', [
+    ('temp.txt', [f'http://url{i}.com' for i in range(50)], None),
+    ('temp.csv', ['url_id,url'] + [f'{i},http://url{i}.com' for i in range(50)], 'url'),
+    ('temp.jsonl', [f'{{"url": "http://url{i}.com"}}' for i in range(50)], 'url'),
+])
+def test_parse_file_in_parallel(tmp_path, file_name, lines, field):
+    file_path = write_lines(tmp_path, file_name, lines)
+    store = FileStore(file_path, Settings({
+        'SPIDERFEEDER_INPUT_FIELD': field,
+        'SPIDERFEEDER_PARSE_WORKERS': 2,
+        'SPIDERFEEDER_PARSE_CHUNK_SIZE': 100,
+    }))
+
+    assert [url for (url, _) in store] == [f'http://url{i}.com' for i in range(50)]
+    assert store.get_metrics()['bytes_read'] == os.path.getsize(file_path)
+
+
+def test_parse_file_shard_in_parallel_from_cursor(tmp_path):
+    file_path = write_lines(tmp_path, 'temp.txt', [f'http://url{i}.com' for i in range(50)])
+    settings = Settings({
+        'SPIDERFEEDER_PARSE_WORKERS': 2,
+        'SPIDERFEEDER_PARSE_CHUNK_SIZE': 64,
+        'SPIDERFEEDER_PARSE_ORDERED': False,
+    })
+
+    for index in range(2):
+        store = FileStore(file_path, Settings())
+        store.set_shard(index, 2)
+        shard = [url for (url, _) in store]
+
+        store = FileStore(file_path, settings)
+        assert store.set_shard(index, 2)
+        store.set_cursor({'count': 5})
+        assert [url for (url, _) in store] == shard[5:]
+        assert store.get_cursor() == {'count': len(shard)}
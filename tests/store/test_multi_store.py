@@ -0,0 +1,178 @@
+import threading
+import zlib
+
+import pytest
+
+from spider_feeder.store.multi_store import MultiStore
+
+
+class ListStore:
+
+    def __init__(self, urls):
+        self.urls = urls
+        self.skip = 0
+        self.closed = False
+        self.exhausted = threading.Event()
+
+    def __iter__(self):
+        for url in self.urls[self.skip:]:
+            yield (url, {'url': url})
+        self.exhausted.set()
+
+    def set_cursor(self, cursor):
+        self.skip = (cursor or {}).get('count', 0)
+
+    def close(self):
+        self.closed = True
+
+
+def list_stores():
+    return [
+        ListStore([f'http://a{i}.com' for i in range(5)]),
+        ListStore([f'http://b{i}.com' for i in range(2)]),
+        ListStore([f'http://c{i}.com' for i in range(3)]),
+    ]
+
+
+def urls(store):
+    return [url for (url, _) in store]
+
+
+def test_chain_stores():
+    store = MultiStore(list_stores())
+    assert urls(store) == [url for s in list_stores() for url in s.urls]
+
+
+def wait_exhausted(stores):
+    '''Waits until every store was read into its queue.'''
+    assert all(s.exhausted.wait(5) for s in stores)
+
+
+def test_interleave_stores():
+    stores = list_stores()
+    store = MultiStore(stores, 'round_robin', prefetch=10)
+    items = iter(store)
+    first = next(items)
+    wait_exhausted(stores)
+
+    assert [first[0]] + urls(items) == [
+        'http://a0.com', 'http://b0.com', 'http://c0.com',
+        'http://a1.com', 'http://b1.com', 'http://c1.com',
+        'http://a2.com', 'http://c2.com',
+        'http://a3.com', 'http://a4.com',
+    ]
+
+
+def test_weighted_stores():
+    stores = list_stores()
+    store = MultiStore(stores, 'weighted', [3, 1, 1], prefetch=10)
+    items = iter(store)
+    first = next(items)
+    wait_exhausted(stores)
+
+    assert [first[0]] + urls(items) == [
+        'http://a0.com', 'http://a1.com', 'http://a2.com', 'http://b0.com', 'http://c0.com',
+        'http://a3.com', 'http://a4.com', 'http://b1.com', 'http://c1.com',
+        'http://c2.com',
+    ]
+    assert all(s.closed for s in stores)
+
+
+def test_slow_store_does_not_block_others():
+    released = threading.Event()
+
+    class SlowStore:
+        def __iter__(self):
+            released.wait(5)
+            yield ('http://slow.com', {})
+
+    store = MultiStore([SlowStore(), ListStore(['http://fast1.com', 'http://fast2.com'])], 'round_robin')
+    items = iter(store)
+    assert [next(items)[0], next(items)[0]] == ['http://fast1.com', 'http://fast2.com']
+
+    released.set()
+    assert urls(items) == ['http://slow.com']
+
+
+def test_fail_on_unknown_strategy():
+    with pytest.raises(ValueError):
+        MultiStore(list_stores(), 'random')
+
+
+@pytest.mark.parametrize('weights', [[1, 0, 1], [1, -1, 1], [1, 1.5, 1]])
+def test_fail_on_invalid_weights(weights):
+    with pytest.raises(ValueError):
+        MultiStore(list_stores(), 'weighted', weights)
+
+
+def test_shard_stores():
+    class ShardedStore(ListStore):
+        def set_shard(self, index, count):
+            self.urls = self.urls[index::count]
+            return True
+
+    shards = []
+    for index in range(2):
+        store = MultiStore([ListStore(['http://a0.com', 'http://a1.com', 'http://a2.com']), ShardedStore(['http://b0.com', 'http://b1.com'])])
+        assert store.set_shard(index, 2)
+        shards.append(urls(store))
+
+    assert sorted(sum(shards, [])) == ['http://a0.com', 'http://a1.com', 'http://a2.com', 'http://b0.com', 'http://b1.com']
+    assert 'http://b0.com' in shards[0]
+    for url in ['http://a0.com', 'http://a1.com', 'http://a2.com']:
+        assert url in shards[zlib.crc32(url.encode('utf-8')) % 2]
+
+
+@pytest.mark.parametrize('strategy', ['chain', 'round_robin'])
+def test_resume_stores_from_cursor(strategy):
+    store = MultiStore(list_stores(), strategy)
+    store.set_cursor(None)
+    items = iter(store)
+    read = [next(items)[0] for _ in range(4)]
+    cursor = store.get_cursor()
+    store.close()
+
+    assert cursor['count'] == 4
+    assert sum(c['count'] for c in cursor['cursors'] if c) == 4
+
+    store = MultiStore(list_stores(), strategy)
+    store.set_cursor(cursor)
+    assert sorted(read + urls(store)) == sorted(url for s in list_stores() for url in s.urls)
+
+
+class KeyStore(ListStore):
+    '''Store resumed from the key of the last item read, instead of the number of items.'''
+
+    def __iter__(self):
+        for url in self.urls:
+            if url > self.skip:
+                self.key = url
+                yield (url, {'url': url})
+
+    def get_cursor(self):
+        return {'count': 0, 'key': self.key}
+
+    def set_cursor(self, cursor):
+        self.skip = (cursor or {}).get('key', '')
+
+
+def test_resume_stores_from_their_cursors():
+    def key_stores():
+        return [KeyStore([f'http://a{i}.com' for i in range(5)]), KeyStore([f'http://b{i}.com' for i in range(3)])]
+
+    store = MultiStore(key_stores(), 'round_robin')
+    store.set_cursor(None)
+    items = iter(store)
+    read = [next(items)[0] for _ in range(3)]
+    cursor = store.get_cursor()
+    store.close()
+
+    # the cursor of each store is the one after its last item consumed, even if others were read ahead
+    assert [c and c['key'] for c in cursor['cursors']] == [
+        max((url for url in read if url.startswith(prefix)), default=None)
+        for prefix in ('http://a', 'http://b')
+    ]
+
+    store = MultiStore(key_stores(), 'round_robin')
+    store.set_cursor(cursor)
+    assert sorted(read + urls(store)) == sorted(url for s in key_stores() for url in s.urls)
@@ -0,0 +1,42 @@
+from scrapy.settings import Settings
+import pytest
+
+from spider_feeder.store.parallel import ParallelParser, split_byte_range
+from spider_feeder.store.parser import parse_csv, parse_txt
+
+
+@pytest.mark.parametrize('byte_range, chunk_size, expected', [
+    ((0, 10), 4, [(0, 4), (4, 8), (8, 10)]),
+    ((3, 11), 4, [(3, 7), (7, 11)]),
+    ((5, 5), 4, []),
+])
+def test_split_byte_range(byte_range, chunk_size, expected):
+    assert split_byte_range(byte_range, chunk_size) == expected
+
+
+@pytest.mark.parametrize('ordered', [True, False])
+def test_parse_chunks_with_header(tmp_path, ordered):
+    rows = [f'{i},http://url{i}.com' for i in range(100)]
+    file_path = tmp_path / 'temp.csv'
+    file_path.write_text('\n'.join(['url_id,url'] + rows), encoding='utf-8')
+
+    parser = ParallelParser(str(file_path), parse_csv, Settings(), workers=3, chunk_size=50, ordered=ordered)
+    records = list(parser.parse((0, file_path.stat().st_size)))
+
+    expected = [{'url_id': str(i), 'url': f'http://url{i}.com'} for i in range(100)]
+    if ordered:
+        assert records == expected
+    else:
+        assert sorted(records, key=lambda record: int(record['url_id'])) == expected
+
+
+def test_stop_parsing_chunks(tmp_path):
+    file_path = tmp_path / 'temp.txt'
+    file_path.write_text('\n'.join(f'http://url{i}.com' for i in range(100)), encoding='utf-8')
+
+    parser = ParallelParser(str(file_path), parse_txt, Settings(), workers=2, chunk_size=50)
+    records = parser.parse((0, file_path.stat().st_size))
+    assert next(records) == 'http://url0.com'
+
+    records.close()
+    assert parser._executor is None
@@ -1,6 +1,9 @@
 import json
-from io import StringIO
+import os
+import types
+from io import BufferedReader, BytesIO, StringIO, TextIOWrapper
 
+import pytest
 from scrapy.settings import Settings
 
 from spider_feeder.store import parser
@@ -9,7 +12,7 @@ from spider_feeder.store import parser
 def test_parse_txt_content():
     content = StringIO('http://url1.com\nhttp://url2.com\nhttp://url3.com')
 
-    urls = parser.parse_txt(content, Settings())
+    urls = list(parser.parse_txt(content, Settings()))
 
     assert urls == ['http://url1.com', 'http://url2.com', 'http://url3.com']
 
@@ -22,13 +25,74 @@ def test_parse_csv_content():
         '3,"http://url3.com"',
     ]))
 
-    assert parser.parse_csv(content, Settings()) == [
+    assert list(parser.parse_csv(content, Settings())) == [
         {'id': '1', 'url': 'http://url1.com'},
         {'id': '2', 'url': 'http://url2.com'},
         {'id': '3', 'url': 'http://url3.com'},
     ]
 
 
+def test_parse_csv_projected_columns():
+    content = StringIO('id,url,name,extra\n1,http://url1.com,one,x\n\n2,http://url2.com\n')
+
+    records = list(parser.parse_csv(content, Settings({
+        'SPIDERFEEDER_INPUT_FIELD': 'url',
+        'SPIDERFEEDER_INPUT_COLUMNS': ['name', 'missing'],
+    })))
+
+    assert records == [
+        {'url': 'http://url1.com', 'name': 'one'},
+        {'url': 'http://url2.com', 'name': None},
+    ]
+    assert all(type(record) is dict for record in records)
+
+
+def test_parse_csv_urls_only():
+    content = 'id,url,name\nhttp://url1.com,http://url2.com,one\n\n'
+    settings = {'SPIDERFEEDER_INPUT_URLS_ONLY': True, 'SPIDERFEEDER_INPUT_COLUMNS': ['name']}
+
+    assert list(parser.parse_csv(StringIO(content), Settings(dict(settings, SPIDERFEEDER_INPUT_FIELD='url')))) == [
+        {'url': 'http://url2.com'}
+    ]
+    assert list(parser.parse_csv(StringIO(content), Settings(settings))) == ['http://url1.com']
+
+
+def test_parse_csv_short_and_long_rows():
+    content = StringIO('id,url,name\n1,http://url1.com\n2,http://url2.com,two,extra\n')
+
+    assert list(parser.parse_csv(content, Settings())) == [
+        {'id': '1', 'url': 'http://url1.com', 'name': None},
+        {'id': '2', 'url': 'http://url2.com', 'name': 'two'},
+    ]
+
+
+@pytest.mark.parametrize('content, settings', [
+    ('id;url\n1;"http://url1.com"', {'SPIDERFEEDER_CSV_DELIMITER': ';'}),
+    ('id\turl\n1\thttp://url1.com', {'SPIDERFEEDER_CSV_DIALECT': 'excel-tab'}),
+    ('id,url\n1,"http://url1.com"', {'SPIDERFEEDER_CSV_QUOTING': 'all'}),
+    ('id,url\n1,"http://url1.com"', {'SPIDERFEEDER_CSV_QUOTING': 'none'}),
+])
+def test_parse_csv_format(content, settings):
+    rows = list(parser.parse_csv(StringIO(content), Settings(settings)))
+
+    expected_url = '"http://url1.com"' if settings.get('SPIDERFEEDER_CSV_QUOTING') == 'none' else 'http://url1.com'
+    assert rows == [{'id': '1', 'url': expected_url}]
+
+
+def test_parse_tsv_content():
+    content = StringIO('id\turl\n1\thttp://url1.com\n2\thttp://url2.com')
+
+    assert list(parser.parse_tsv(content, Settings())) == [
+        {'id': '1', 'url': 'http://url1.com'},
+        {'id': '2', 'url': 'http://url2.com'},
+    ]
+
+
+def test_fail_on_unknown_csv_quoting():
+    with pytest.raises(ValueError):
+        list(parser.parse_csv(StringIO('id,url'), Settings({'SPIDERFEEDER_CSV_QUOTING': 'some'})))
+
+
 def test_parse_json_content():
     content = StringIO(json.dumps([
         {'id': 1, 'input_url': 'http://url1.com'},
@@ -36,8 +100,246 @@ def test_parse_json_content():
         {'id': 3, 'input_url': 'http://url3.com'},
     ]))
 
-    assert parser.parse_json(content, Settings()) == [
+    assert list(parser.parse_json(content, Settings())) == [
         {'id': 1, 'input_url': 'http://url1.com'},
         {'id': 2, 'input_url': 'http://url2.com'},
         {'id': 3, 'input_url': 'http://url3.com'},
     ]
+
+
+def test_parsers_are_lazy():
+    content = StringIO('http://url1.com\nhttp://url2.com')
+
+    urls = parser.parse_txt(content, Settings())
+
+    assert isinstance(urls, types.GeneratorType)
+    assert next(urls) == 'http://url1.com'
+    assert content.read() == 'http://url2.com'
+
+
+def test_parse_json_array_in_chunks(mocker):
+    mocker.patch.object(parser, 'JSON_CHUNK_SIZE', 7)
+    data = [
+        {'id': 1, 'input_url': 'http://url1.com', 'tags': ['a', 'b']},
+        12345678,
+        'http://url3.com',
+        None,
+    ]
+    content = StringIO(' \n' + json.dumps(data, indent=2) + '\n')
+
+    assert list(parser.parse_json(content, Settings())) == data
+
+
+@pytest.mark.parametrize('content, expected', [
+    ('[12e5, 3]', [12e5, 3]),
+    ('[1.25,3]', [1.25, 3]),
+    ('[-12345,6]', [-12345, 6]),
+    ('[1, 123456]', [1, 123456]),
+])
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 4])
+def test_parse_json_numbers_split_between_chunks(mocker, content, expected, chunk_size):
+    mocker.patch.object(parser, 'JSON_CHUNK_SIZE', chunk_size)
+
+    assert list(parser.parse_json(StringIO(content), Settings())) == expected
+
+
+@pytest.mark.parametrize('chunk_size', [1, 4, 1024])
+def test_parse_json_array_with_trailing_comma(mocker, chunk_size):
+    mocker.patch.object(parser, 'JSON_CHUNK_SIZE', chunk_size)
+
+    with pytest.raises(ValueError):
+        list(parser.parse_json(StringIO('[1, 2 , ]'), Settings()))
+
+
+def test_parse_json_empty_array():
+    assert list(parser.parse_json(StringIO(' [ ] '), Settings())) == []
+
+
+def test_parse_json_document():
+    content = StringIO(json.dumps({'id': 1, 'input_url': 'http://url1.com'}))
+
+    assert list(parser.parse_json(content, Settings())) == [
+        {'id': 1, 'input_url': 'http://url1.com'},
+    ]
+
+
+@pytest.mark.parametrize('content', ['[{"id": 1}', '[{"id": 1} {"id": 2}]'])
+def test_parse_invalid_json_array(content):
+    with pytest.raises(ValueError):
+        list(parser.parse_json(StringIO(content), Settings()))
+
+
+def test_parse_jsonl_content():
+    content = StringIO('\n'.join([
+        json.dumps({'id': 1, 'input_url': 'http://url1.com'}),
+        '',
+        json.dumps({'id': 2, 'input_url': 'http://url2.com'}),
+    ]))
+
+    assert list(parser.parse_jsonl(content, Settings())) == [
+        {'id': 1, 'input_url': 'http://url1.com'},
+        {'id': 2, 'input_url': 'http://url2.com'},
+    ]
+
+
+JSON_ROWS = [{'id': 1, 'input_url': 'http://url1.com'}, {'id': 2, 'input_url': 'http://vérystrangeurl.com'}]
+
+
+def json_backend(backend):
+    pytest.importorskip(backend)
+    return Settings({'SPIDERFEEDER_JSON_BACKEND': backend})
+
+
+@pytest.mark.parametrize('backend', parser.JSON_BACKENDS)
+@pytest.mark.parametrize('encoding', ['utf-8', 'latin-1'])
+def test_parse_jsonl_with_backend(backend, encoding):
+    content = '\n'.join(json.dumps(row, ensure_ascii=False) for row in JSON_ROWS)
+    fd = TextIOWrapper(BytesIO(content.encode(encoding)), encoding=encoding)
+
+    assert list(parser.parse_jsonl(fd, json_backend(backend))) == JSON_ROWS
+
+
+@pytest.mark.parametrize('backend', parser.JSON_BACKENDS)
+@pytest.mark.parametrize('document', [JSON_ROWS, JSON_ROWS[0]])
+def test_parse_json_with_backend(backend, document):
+    fd = TextIOWrapper(BytesIO(json.dumps(document).encode('utf-8')), encoding='utf-8')
+
+    rows = list(parser.parse_json(fd, json_backend(backend)))
+    assert rows == (document if isinstance(document, list) else [document])
+
+
+def test_decode_utf8_json_lines_from_bytes(mocker):
+    loads = mocker.patch.object(json, 'loads', side_effect=json.loads)
+    fd = TextIOWrapper(BytesIO(b'{"id": 1}\n{"id": 2}'), encoding='utf-8')
+
+    assert list(parser.parse_jsonl(fd, Settings({'SPIDERFEEDER_JSON_BACKEND': 'json'}))) == [{'id': 1}, {'id': 2}]
+    assert [type(c.args[0]) for c in loads.call_args_list] == [bytes, bytes]
+
+
+def test_default_json_backend():
+    expected = next(parser.get_json_loads(b) for b in parser.JSON_BACKENDS if _installed(b))
+    assert parser.get_json_loads() is expected
+
+
+def _installed(module):
+    try:
+        __import__(module)
+        return True
+    except ImportError:
+        return False
+
+
+def test_fail_on_unknown_json_backend():
+    with pytest.raises(ValueError):
+        list(parser.parse_jsonl(StringIO('{}'), Settings({'SPIDERFEEDER_JSON_BACKEND': 'simplejson'})))
+
+
+def arrow_table():
+    pa = pytest.importorskip('pyarrow')
+    return pa.table({
+        'url': [f'http://url{i}.com' for i in range(5)],
+        'url_id': list(range(5)),
+        'payload': ['x' * 100] * 5,
+    })
+
+
+def parquet_content(table):
+    import pyarrow.parquet as pq
+    content = BytesIO()
+    pq.write_table(table, content, row_group_size=2)
+    content.seek(0)
+    return content
+
+
+def arrow_content(table, stream=False):
+    import pyarrow as pa
+    content = BytesIO()
+    writer = pa.ipc.new_stream if stream else pa.ipc.new_file
+    with writer(content, table.schema) as w:
+        for batch in table.to_batches(max_chunksize=2):
+            w.write_batch(batch)
+    content.seek(0)
+    return content
+
+
+class CountingBytes(BytesIO):
+    read_bytes = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.read_bytes += len(data)
+        return data
+
+
+class NotSeekable(BufferedReader):
+
+    def seekable(self):
+        return False
+
+
+@pytest.mark.parametrize('parse, content', [
+    (parser.parse_parquet, parquet_content),
+    (parser.parse_arrow, arrow_content),
+    (parser.parse_arrow, lambda table: NotSeekable(arrow_content(table, stream=True))),
+    (parser.parse_arrow, lambda table: NotSeekable(arrow_content(table))),
+    (parser.parse_parquet, lambda table: NotSeekable(parquet_content(table))),
+])
+def test_parse_columnar_content(parse, content):
+    table = arrow_table()
+    settings = Settings({
+        'SPIDERFEEDER_INPUT_FIELD': 'url',
+        'SPIDERFEEDER_INPUT_COLUMNS': ['url_id'],
+        'SPIDERFEEDER_INPUT_BATCH_SIZE': 2,
+    })
+
+    rows = parse(content(table), settings)
+
+    assert isinstance(rows, types.GeneratorType)
+    assert list(rows) == [{'url': f'http://url{i}.com', 'url_id': i} for i in range(5)]
+
+
+@pytest.mark.parametrize('parse, content', [
+    (parser.parse_parquet, parquet_content),
+    (parser.parse_arrow, arrow_content),
+])
+def test_parse_columnar_content_without_input_field(parse, content):
+    urls = list(parse(content(arrow_table()), Settings()))
+
+    assert urls == [f'http://url{i}.com' for i in range(5)]
+
+
+@pytest.mark.parametrize('parse, content', [
+    (parser.parse_parquet, parquet_content),
+    (parser.parse_arrow, arrow_content),
+    (parser.parse_arrow, lambda table: NotSeekable(arrow_content(table, stream=True))),
+])
+def test_parse_columnar_content_urls_only(parse, content):
+    settings = Settings({
+        'SPIDERFEEDER_INPUT_FIELD': 'url',
+        'SPIDERFEEDER_INPUT_COLUMNS': ['url_id'],
+        'SPIDERFEEDER_INPUT_URLS_ONLY': True,
+    })
+
+    assert list(parse(content(arrow_table()), settings)) == [{'url': f'http://url{i}.com'} for i in range(5)]
+
+
+def test_parse_parquet_reads_only_projected_columns():
+    import pyarrow as pa
+    table = arrow_table().append_column('blob', pa.array([os.urandom(100000) for _ in range(5)]))
+    content = parquet_content(table)
+    size = len(content.getvalue())
+
+    fd = CountingBytes(content.getvalue())
+    list(parser.parse_parquet(fd, Settings({'SPIDERFEEDER_INPUT_COLUMNS': ['url_id']})))
+
+    assert fd.read_bytes < size / 4
+
+
+def test_parse_parquet_reads_only_first_column_without_input_field():
+    import pyarrow as pa
+    table = arrow_table().append_column('blob', pa.array([os.urandom(100000) for _ in range(5)]))
+    content = parquet_content(table)
+
+    fd = CountingBytes(content.getvalue())
+    assert list(parser.parse_parquet(fd, Settings())) == [f'http://url{i}.com' for i in range(5)]
+    assert fd.read_bytes < len(content.getvalue()) / 4
@@ -0,0 +1,87 @@
+import threading
+
+import pytest
+
+from spider_feeder.store.prefetch import Prefetcher
+
+
+def test_prefetch_items():
+    assert list(Prefetcher(range(100), 3)) == list(range(100))
+
+
+def test_read_items_ahead():
+    read = []
+    ahead = threading.Event()
+
+    def items():
+        for i in range(10):
+            read.append(i)
+            if i == 3:
+                ahead.set()
+            yield i
+
+    prefetcher = Prefetcher(items(), 3)
+    it = iter(prefetcher)
+    assert next(it) == 0
+    assert ahead.wait(1)
+    assert len(read) <= 5
+    prefetcher.close()
+
+
+def test_raise_errors_to_consumer():
+    def items():
+        yield 1
+        raise ValueError('failed')
+
+    it = iter(Prefetcher(items(), 2))
+    assert next(it) == 1
+    with pytest.raises(ValueError):
+        next(it)
+
+
+def test_stop_thread_on_close():
+    prefetcher = Prefetcher(iter(range(1000)), 1)
+    it = iter(prefetcher)
+    next(it)
+    prefetcher.close()
+
+    (thread,) = prefetcher._threads
+    thread.join(1)
+    assert not thread.is_alive()
+
+
+def test_wake_up_consumer_on_close():
+    release = threading.Event()
+    prefetcher = Prefetcher((release.wait(10) for _ in range(1)), 1)
+    consumer = threading.Thread(target=lambda: list(prefetcher), daemon=True)
+    consumer.start()
+
+    prefetcher.close()
+    consumer.join(1)
+    release.set()
+    assert not consumer.is_alive()
+
+
+def test_prefetch_unordered_items():
+    prefetcher = Prefetcher.unordered([range(0, 50), range(50, 60), range(60, 100)], 4)
+    assert sorted(prefetcher) == list(range(100))
+
+
+def test_raise_errors_of_unordered_items():
+    def items():
+        raise ValueError('failed')
+        yield
+
+    with pytest.raises(ValueError):
+        list(Prefetcher.unordered([range(1000), items()], 2))
+
+
+def test_measure_stall_time_while_queue_is_full():
+    prefetcher = Prefetcher(range(10), 2)
+    it = iter(prefetcher)
+    assert next(it) == 0
+    threading.Event().wait(0.3)
+    assert prefetcher.qsize() == 2
+
+    assert list(it) == list(range(1, 10))
+    assert prefetcher.stall_time >= 0.2
@@ -1,7 +1,7 @@
 import pytest
 from scrapy.settings import Settings
 
-from spider_feeder.store import scrapinghub_collection
+from spider_feeder.store import clients, scrapinghub_collection
 from spider_feeder.store.scrapinghub_collection import ScrapinghubCollectionStore
 
 
@@ -97,3 +97,147 @@ def test_fail_if_input_field_collection_content_is_not_dict(mocker, environment_
             pass
 
     assert 'Data is expected to be a dict when SPIDERFEEDER_INPUT_FIELD is set.' == e.value.args[0]  # noqa
+
+
+def test_resume_after_last_key(mocker, environment_vars_mocker):
+    client = scrapinghub_client_mocker(mocker, COLLECTION_OF_URLS_ONLY)
+    collection = client.get_project(PROJECT_ID).collections.get_store(COLLECTION_NAME)
+    store = ScrapinghubCollectionStore(f'collections://{COLLECTION_NAME}', Settings())
+
+    assert [url for (url, _) in store] == ['http://url1.com', 'http://url2.com']
+    cursor = store.get_cursor()
+    assert cursor == {'count': 2, 'key': '2'}
+
+    collection.iter.return_value = iter([])
+    store = ScrapinghubCollectionStore(f'collections://{COLLECTION_NAME}', Settings())
+    store.set_cursor(cursor)
+    assert list(store) == []
+    collection.iter.assert_called_with(startafter='2', count=1000)
+
+
+class FakeCollection:
+
+    def __init__(self, items):
+        self.items = items
+        self.calls = []
+
+    def iter(self, startafter=None, count=None, prefix=''):
+        if not prefix:
+            self.calls.append((startafter, count))
+
+        items = [
+            item for item in self.items
+            if item['_key'].startswith(prefix) and (startafter is None or item['_key'] > startafter)
+        ]
+        return iter(items[:count])
+
+
+def fake_collection_mocker(mocker, items):
+    client = scrapinghub_client_mocker(mocker, [])
+    collection = FakeCollection(items)
+    client.get_project.return_value.collections.get_store.return_value = collection
+    return collection
+
+
+@pytest.mark.parametrize('prefetch', [0, 1, 3])
+@pytest.mark.parametrize('size', [0, 9, 10, 25])
+def test_read_collection_in_pages(mocker, environment_vars_mocker, prefetch, size):
+    items = [{'_key': f'{i:03}', 'value': f'http://url{i}.com'} for i in range(size)]
+    collection = fake_collection_mocker(mocker, items)
+    store = ScrapinghubCollectionStore(f'collections://{COLLECTION_NAME}', Settings({
+        'SPIDERFEEDER_COLLECTION_PAGE_SIZE': 5,
+        'SPIDERFEEDER_COLLECTION_PREFETCH': prefetch,
+    }))
+
+    assert [url for (url, _) in store] == [item['value'] for item in items]
+    assert collection.calls[0] == (None, 5)
+    assert collection.calls[1:] == [(items[i - 1]['_key'], 5) for i in range(5, size + 1, 5)]
+
+
+def test_cursor_of_prefetched_collection(mocker, environment_vars_mocker):
+    items = [{'_key': f'{i:03}', 'value': f'http://url{i}.com'} for i in range(20)]
+    fake_collection_mocker(mocker, items)
+    store = ScrapinghubCollectionStore(f'collections://{COLLECTION_NAME}', Settings({
+        'SPIDERFEEDER_COLLECTION_PAGE_SIZE': 3,
+    }))
+
+    urls = iter(store)
+    assert [next(urls)[0] for _ in range(4)] == [item['value'] for item in items[:4]]
+    assert store.get_cursor() == {'count': 4, 'key': '003'}
+    store.close()
+
+
+def test_raise_collection_errors_from_prefetch(mocker, environment_vars_mocker):
+    collection = fake_collection_mocker(mocker, [])
+    collection.iter = mocker.Mock(side_effect=ValueError('unavailable'))
+    store = ScrapinghubCollectionStore(f'collections://{COLLECTION_NAME}', Settings())
+
+    with pytest.raises(ValueError):
+        list(store)
+
+
+def prefix_store(settings={}):
+    return ScrapinghubCollectionStore(f'collections://{COLLECTION_NAME}', Settings(dict({
+        'SPIDERFEEDER_COLLECTION_PAGE_SIZE': 3,
+        'SPIDERFEEDER_COLLECTION_PREFIXES': ['0', '1', '2', '3'],
+    }, **settings)))
+
+
+PREFIX_ITEMS = [{'_key': f'{i % 4}{i:03}', 'value': f'http://url{i}.com'} for i in range(40)]
+
+
+def test_read_prefixes_ordered(mocker, environment_vars_mocker):
+    fake_collection_mocker(mocker, sorted(PREFIX_ITEMS, key=lambda item: item['_key']))
+    store = prefix_store()
+
+    assert [url for (url, _) in store] == [
+        item['value'] for item in sorted(PREFIX_ITEMS, key=lambda item: item['_key'])
+    ]
+
+
+def test_read_prefixes_unordered(mocker, environment_vars_mocker):
+    fake_collection_mocker(mocker, sorted(PREFIX_ITEMS, key=lambda item: item['_key']))
+    store = prefix_store({'SPIDERFEEDER_COLLECTION_ORDERED': False})
+
+    assert sorted(url for (url, _) in store) == sorted(item['value'] for item in PREFIX_ITEMS)
+
+
+@pytest.mark.parametrize('ordered', [True, False])
+def test_resume_prefixes_from_cursor(mocker, environment_vars_mocker, ordered):
+    fake_collection_mocker(mocker, sorted(PREFIX_ITEMS, key=lambda item: item['_key']))
+    store = prefix_store({'SPIDERFEEDER_COLLECTION_ORDERED': ordered})
+    items = iter(store)
+    urls = [next(items)[0] for _ in range(15)]
+    cursor = store.get_cursor()
+    store.close()
+
+    store = prefix_store({'SPIDERFEEDER_COLLECTION_ORDERED': ordered})
+    store.set_cursor(cursor)
+    urls += [url for (url, _) in store]
+    assert sorted(urls) == sorted(item['value'] for item in PREFIX_ITEMS)
+
+
+def test_read_prefixes_shard(mocker, environment_vars_mocker):
+    fake_collection_mocker(mocker, sorted(PREFIX_ITEMS, key=lambda item: item['_key']))
+
+    shards = []
+    for index in range(2):
+        store = prefix_store()
+        assert store.set_shard(index, 2)
+        shards.append([url for (url, _) in store])
+
+    assert shards[0] == [item['value'] for item in PREFIX_ITEMS[0::4] + PREFIX_ITEMS[2::4]]
+    assert sorted(sum(shards, [])) == sorted(item['value'] for item in PREFIX_ITEMS)
+
+    assert not prefix_store().set_shard(0, 5)
+    assert not ScrapinghubCollectionStore(f'collections://{COLLECTION_NAME}', Settings()).set_shard(0, 2)
+
+
+def test_share_and_close_client(mocker, environment_vars_mocker):
+    client = scrapinghub_client_mocker(mocker, COLLECTION_OF_URLS_ONLY)
+    for _ in range(2):
+        ScrapinghubCollectionStore(f'collections://{COLLECTION_NAME}', Settings())
+
+    assert scrapinghub_collection.ScrapinghubClient.call_count == 1
+    clients.pool.close()
+    client.close.assert_called_once_with()
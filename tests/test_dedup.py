@@ -0,0 +1,27 @@
+import pytest
+
+from spider_feeder.dedup import BloomFilter, ExactFilter
+
+
+@pytest.mark.parametrize('dedup', [ExactFilter(), BloomFilter(1000, 0.001)])
+def test_filter_duplicated_urls(dedup):
+    urls = [f'https://url{i % 300}.com' for i in range(1000)]
+    assert sum(dedup.add(url) for url in urls) == 300
+    assert 'https://url1.com' in dedup
+    assert 'https://url300.com' not in dedup
+
+
+def test_bloom_filter_error_rate():
+    dedup = BloomFilter(10000, 0.01)
+    for i in range(10000):
+        dedup.add(f'https://url{i}.com')
+
+    assert all(f'https://url{i}.com' in dedup for i in range(10000))
+    false_positives = sum(f'https://other{i}.com' in dedup for i in range(10000))
+    assert false_positives < 200
+
+
+def test_bloom_filter_max_memory():
+    dedup = BloomFilter(1000000, 0.001, max_memory=1024)
+    assert len(dedup._bits) == 1024
+    assert dedup.error_rate(1000000) > 0.001
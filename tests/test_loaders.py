@@ -1,11 +1,19 @@
+from itertools import islice
 from unittest.mock import Mock
+import asyncio
+import json
+import os
+import subprocess
+import sys
 
 import pytest
 from scrapy import Spider, signals
 from scrapy.crawler import Crawler
-from scrapy.exceptions import NotConfigured
+from scrapy.exceptions import DontCloseSpider, NotConfigured
 
-from spider_feeder.loaders import StartUrlsLoader
+from spider_feeder.loaders import AsyncStartRequestsLoader, StartUrlsLoader
+from spider_feeder.store.base_store import BaseStore
+from spider_feeder.store.clients import ClientPool
 
 
 CustomS3Store = Mock()
@@ -119,3 +127,563 @@ def test_load_start_data(get_crawler, mocker):
     assert expetcted_meta == list(crawler.spider.start_meta)
 
     assert crawler.stats.get_value(f'spider_feeder/{crawler.spider.name}/url_count') == 3
+
+
+def test_close_store_on_spider_closed(get_crawler, mocker):
+    mock = mocker.patch('spider_feeder.store.file_store.FileStore')
+    mock().__iter__.return_value = iter([('https://url1.com', {})])
+
+    crawler = get_crawler({
+        'EXTENSIONS': {'spider_feeder.loaders.StartUrlsLoader': 500},
+        'SPIDERFEEDER_INPUT_URI': 'input_file.txt',
+    })
+
+    crawler.signals.send_catch_log(signals.spider_opened, spider=crawler.spider)
+    mock().close.assert_not_called()
+
+    crawler.signals.send_catch_log(signals.spider_closed, spider=crawler.spider, reason='finished')
+    mock().close.assert_called_once_with()
+
+
+def test_load_start_requests(get_crawler, mocker):
+    mock = mocker.patch('spider_feeder.store.file_store.FileStore')
+    store_data = [
+        ('https://url1.com', {'url_id': '1'}),
+        ('https://url2.com', {'url_id': '2'}),
+    ]
+    mock().__iter__.return_value = iter(store_data)
+
+    crawler = get_crawler({
+        'EXTENSIONS': {'spider_feeder.loaders.StartRequestsLoader': 500},
+        'SPIDERFEEDER_INPUT_URI': 'input_file.csv',
+    })
+
+    crawler.engine = Mock(slot=None)
+    crawler.signals.send_catch_log(signals.spider_opened, spider=crawler.spider)
+
+    requests = [call.args[0] for call in crawler.engine.crawl.call_args_list]
+    assert [r.url for r in requests] == ['https://url1.com', 'https://url2.com']
+    assert [r.meta for r in requests] == [{'url_id': '1'}, {'url_id': '2'}]
+    assert all(r.dont_filter for r in requests)
+    assert crawler.stats.get_value(f'spider_feeder/{crawler.spider.name}/url_count') == 2
+
+
+CRAWL_SCRIPT = '''
+import json, sys
+from scrapy import Spider
+from scrapy.crawler import CrawlerRunner
+from scrapy.utils.reactor import install_reactor
+
+settings = json.loads(sys.argv[1])
+if settings.get('TWISTED_REACTOR'):
+    install_reactor(settings['TWISTED_REACTOR'])
+from twisted.internet import reactor
+
+
+class InputSpider(Spider):
+    name = 'input'
+    responses = []
+
+    def parse(self, response):
+        self.responses.append([response.url, response.meta['url_id']])
+
+
+CrawlerRunner(settings).crawl(InputSpider).addBoth(lambda _: reactor.stop())
+reactor.run()
+print(json.dumps(sorted(InputSpider.responses)))
+'''
+
+
+@pytest.mark.parametrize('loader, settings', [
+    ('StartRequestsLoader', {}),
+    ('StartRequestsLoader', {'SPIDERFEEDER_MAX_PENDING': 1}),
+    ('AsyncStartRequestsLoader', {'TWISTED_REACTOR': 'twisted.internet.asyncioreactor.AsyncioSelectorReactor'}),
+])
+def test_crawl_start_requests(tmp_path, loader, settings):
+    pages = []
+    for i in range(3):
+        page = tmp_path / f'page{i}.html'
+        page.write_text('<html></html>')
+        pages.append(page.as_uri())
+    input_path = tmp_path / 'input.csv'
+    input_path.write_text('\n'.join(['url_id,url'] + [f'{i},{url}' for (i, url) in enumerate(pages)]))
+
+    settings = json.dumps(dict({
+        'EXTENSIONS': {f'spider_feeder.loaders.{loader}': 500},
+        'SPIDERFEEDER_INPUT_URI': str(input_path),
+        'SPIDERFEEDER_INPUT_FIELD': 'url',
+        'LOG_LEVEL': 'WARNING',
+    }, **settings))
+    result = subprocess.run(
+        [sys.executable, '-c', CRAWL_SCRIPT, settings],
+        capture_output=True, text=True, timeout=60, check=True, cwd=os.path.dirname(os.path.dirname(__file__))
+    )
+
+    assert json.loads(result.stdout) == [[url, str(i)] for (i, url) in enumerate(pages)]
+
+
+SHARD_DATA = [(f'https://url{i}.com', {'id': i}) for i in range(10)]
+
+
+def load_shard(get_crawler, mocker, settings, spider_args={}):
+    mock = mocker.patch('spider_feeder.store.file_store.FileStore')
+    mock().__iter__.side_effect = lambda: iter(SHARD_DATA)
+    mock().set_shard.return_value = False
+
+    crawler = get_crawler(dict({
+        'EXTENSIONS': {'spider_feeder.loaders.StartUrlsLoader': 500},
+        'SPIDERFEEDER_INPUT_URI': 'input_file.txt',
+    }, **settings))
+    for (k, v) in spider_args.items():
+        setattr(crawler.spider, k, v)
+
+    crawler.signals.send_catch_log(signals.spider_opened, spider=crawler.spider)
+    return (list(crawler.spider.start_urls), mock())
+
+
+@pytest.mark.parametrize('strategy', ['hash', 'modulo', 'store'])
+def test_load_shards(get_crawler, mocker, strategy):
+    shards = []
+    for shard_index in range(3):
+        (urls, _) = load_shard(get_crawler, mocker, {
+            'SPIDERFEEDER_SHARD_INDEX': shard_index,
+            'SPIDERFEEDER_SHARD_COUNT': 3,
+            'SPIDERFEEDER_SHARD_STRATEGY': strategy,
+        })
+        shards.append(urls)
+
+    assert sorted(sum(shards, [])) == sorted(url for (url, _) in SHARD_DATA)
+    assert all(shards)
+
+
+def test_load_shard_by_modulo(get_crawler, mocker):
+    (urls, store) = load_shard(get_crawler, mocker, {
+        'SPIDERFEEDER_SHARD_INDEX': 1,
+        'SPIDERFEEDER_SHARD_COUNT': 4,
+    })
+
+    store.set_shard.assert_called_once_with(1, 4)
+    assert urls == ['https://url1.com', 'https://url5.com', 'https://url9.com']
+
+
+def test_load_shard_from_spider_arguments(get_crawler, mocker):
+    (urls, _) = load_shard(get_crawler, mocker, {
+        'SPIDERFEEDER_SHARD_STRATEGY': 'modulo',
+    }, {'shard_index': '2', 'shard_count': '4'})
+
+    assert urls == ['https://url2.com', 'https://url6.com']
+
+
+def test_load_shard_from_store(get_crawler, mocker):
+    mock = mocker.patch('spider_feeder.store.file_store.FileStore')
+    mock().__iter__.side_effect = lambda: iter(SHARD_DATA[:2])
+    mock().set_shard.return_value = True
+
+    crawler = get_crawler({
+        'EXTENSIONS': {'spider_feeder.loaders.StartUrlsLoader': 500},
+        'SPIDERFEEDER_INPUT_URI': 'input_file.txt',
+        'SPIDERFEEDER_SHARD_INDEX': 1,
+        'SPIDERFEEDER_SHARD_COUNT': 4,
+    })
+    crawler.signals.send_catch_log(signals.spider_opened, spider=crawler.spider)
+
+    mock().set_shard.assert_called_once_with(1, 4)
+    assert list(crawler.spider.start_urls) == ['https://url0.com', 'https://url1.com']
+
+
+def test_fail_if_shard_index_is_out_of_range(get_crawler, mocker):
+    mocker.patch('spider_feeder.store.file_store.FileStore')
+    crawler = get_crawler({
+        'SPIDERFEEDER_INPUT_URI': 'input_file.txt',
+        'SPIDERFEEDER_SHARD_INDEX': 4,
+        'SPIDERFEEDER_SHARD_COUNT': 4,
+    })
+    loader = StartUrlsLoader.from_crawler(crawler)
+
+    with pytest.raises(ValueError):
+        loader.spider_opened(crawler.spider)
+
+
+def test_fail_if_shard_strategy_is_unknown(get_crawler):
+    crawler = get_crawler({
+        'SPIDERFEEDER_INPUT_URI': 'input_file.txt',
+        'SPIDERFEEDER_SHARD_STRATEGY': 'random',
+    })
+
+    with pytest.raises(NotConfigured):
+        StartUrlsLoader.from_crawler(crawler)
+
+
+def load_from_cursor(get_crawler, mocker, tmp_path, settings={}, count=None):
+    mocker.patch('spider_feeder.store.file_store.FileStore', side_effect=lambda uri, settings: ListStore(settings))
+    crawler = get_crawler(dict({
+        'EXTENSIONS': {'spider_feeder.loaders.StartUrlsLoader': 500},
+        'SPIDERFEEDER_INPUT_URI': 'input_file.txt',
+        'JOBDIR': str(tmp_path),
+        'SPIDERFEEDER_CURSOR_INTERVAL': 2,
+    }, **settings))
+
+    crawler.signals.send_catch_log(signals.spider_opened, spider=crawler.spider)
+    urls = list(islice(crawler.spider.start_urls, count))
+    crawler.signals.send_catch_log(signals.spider_closed, spider=crawler.spider, reason='finished')
+    return urls
+
+
+class ListStore(BaseStore):
+
+    def read_input_items(self):
+        return iter(url for (url, _) in SHARD_DATA)
+
+
+def test_resume_from_cursor(get_crawler, mocker, tmp_path):
+    urls = load_from_cursor(get_crawler, mocker, tmp_path, count=3)
+    assert urls == ['https://url0.com', 'https://url1.com', 'https://url2.com']
+
+    with open(tmp_path / 'spider_feeder.cursor') as f:
+        assert json.load(f)['cursor'] == {'count': 3}
+
+    urls = load_from_cursor(get_crawler, mocker, tmp_path)
+    assert urls == [f'https://url{i}.com' for i in range(3, 10)]
+
+    assert load_from_cursor(get_crawler, mocker, tmp_path) == []
+
+
+def test_resume_shard_from_cursor(get_crawler, mocker, tmp_path):
+    settings = {
+        'SPIDERFEEDER_SHARD_INDEX': 1,
+        'SPIDERFEEDER_SHARD_COUNT': 3,
+        'SPIDERFEEDER_SHARD_STRATEGY': 'modulo',
+    }
+    urls = load_from_cursor(get_crawler, mocker, tmp_path, settings, count=1)
+    assert urls == ['https://url1.com']
+
+    urls = load_from_cursor(get_crawler, mocker, tmp_path, settings)
+    assert urls == ['https://url4.com', 'https://url7.com']
+
+
+def test_ignore_cursor_of_other_input(get_crawler, mocker, tmp_path):
+    load_from_cursor(get_crawler, mocker, tmp_path, count=3)
+
+    urls = load_from_cursor(get_crawler, mocker, tmp_path, {'SPIDERFEEDER_INPUT_URI': 'other_file.txt'})
+    assert len(urls) == 10
+
+
+def test_cursor_file_setting(get_crawler, mocker, tmp_path):
+    cursor_file = tmp_path / 'cursors' / 'input.json'
+    load_from_cursor(get_crawler, mocker, tmp_path, {
+        'JOBDIR': None,
+        'SPIDERFEEDER_CURSOR_FILE': str(cursor_file),
+    }, count=5)
+
+    with open(cursor_file) as f:
+        assert json.load(f)['cursor'] == {'count': 5}
+
+
+def test_close_clients_on_spider_closed(get_crawler, mocker):
+    mocker.patch('spider_feeder.store.file_store.FileStore')
+    pool = mocker.patch('spider_feeder.store.clients.pool', ClientPool())
+    client = pool.get('s3', Mock)
+    crawlers = [
+        get_crawler({
+            'EXTENSIONS': {'spider_feeder.loaders.StartUrlsLoader': 500},
+            'SPIDERFEEDER_INPUT_URI': 'input_file.txt',
+        })
+        for _ in range(2)
+    ]
+
+    for crawler in crawlers:
+        crawler.signals.send_catch_log(signals.spider_opened, spider=crawler.spider)
+
+    crawlers[0].signals.send_catch_log(signals.spider_closed, spider=crawlers[0].spider, reason='finished')
+    client.close.assert_not_called()
+    crawlers[1].signals.send_catch_log(signals.spider_closed, spider=crawlers[1].spider, reason='finished')
+    client.close.assert_called_once_with()
+
+
+def test_load_multiple_inputs(get_crawler, tmp_path):
+    (tmp_path / 'urls1.txt').write_text('https://url1.com\nhttps://url2.com', encoding='utf-8')
+    (tmp_path / 'urls2.txt').write_text('https://url3.com', encoding='utf-8')
+    (tmp_path / 'urls.csv').write_text('id,link\n4,https://url4.com', encoding='utf-8')
+
+    crawler = get_crawler({
+        'EXTENSIONS': {'spider_feeder.loaders.StartUrlsAndMetaLoader': 500},
+        'SPIDERFEEDER_INPUT_URI': {
+            f'{tmp_path}/urls*.txt': {},
+            f'{tmp_path}/urls.csv': {'SPIDERFEEDER_INPUT_FIELD': 'link'},
+        },
+    })
+    crawler.signals.send_catch_log(signals.spider_opened, spider=crawler.spider)
+
+    assert list(crawler.spider.start_urls) == [
+        'https://url1.com', 'https://url2.com', 'https://url3.com', 'https://url4.com'
+    ]
+    assert list(crawler.spider.start_meta) == [{}, {}, {}, {'id': '4', 'link': 'https://url4.com'}]
+
+
+def test_load_only_urls_of_input(get_crawler, tmp_path):
+    (tmp_path / 'urls.csv').write_text('link,id\nhttps://url1.com,1\nhttps://url2.com,2', encoding='utf-8')
+
+    crawler = get_crawler({
+        'EXTENSIONS': {'spider_feeder.loaders.StartUrlsLoader': 500},
+        'SPIDERFEEDER_INPUT_URI': [f'{tmp_path}/urls.csv'],
+    })
+    crawler.signals.send_catch_log(signals.spider_opened, spider=crawler.spider)
+
+    assert list(crawler.spider.start_urls) == ['https://url1.com', 'https://url2.com']
+
+
+def test_warn_if_glob_matches_no_inputs(get_crawler, tmp_path, caplog):
+    crawler = get_crawler({
+        'EXTENSIONS': {'spider_feeder.loaders.StartUrlsLoader': 500},
+        'SPIDERFEEDER_INPUT_URI': f'{tmp_path}/urls*.txt',
+    })
+    crawler.signals.send_catch_log(signals.spider_opened, spider=crawler.spider)
+
+    assert list(crawler.spider.start_urls) == []
+    assert f'{tmp_path}/urls*.txt matches no inputs.' in caplog.text
+
+
+def test_load_input_list(get_crawler, tmp_path):
+    (tmp_path / 'urls1.txt').write_text('https://url1.com\nhttps://url2.com', encoding='utf-8')
+    (tmp_path / 'urls2.txt').write_text('https://url3.com', encoding='utf-8')
+
+    crawler = get_crawler({
+        'EXTENSIONS': {'spider_feeder.loaders.StartUrlsLoader': 500},
+        'SPIDERFEEDER_INPUT_URI': [f'{tmp_path}/urls2.txt', f'{tmp_path}/urls1.txt'],
+        'SPIDERFEEDER_INPUT_MERGE': 'round_robin',
+    })
+    crawler.signals.send_catch_log(signals.spider_opened, spider=crawler.spider)
+
+    assert sorted(crawler.spider.start_urls) == ['https://url1.com', 'https://url2.com', 'https://url3.com']
+
+
+def test_fail_if_input_merge_is_unknown(get_crawler):
+    crawler = get_crawler({
+        'SPIDERFEEDER_INPUT_URI': ['input_file1.txt', 'input_file2.txt'],
+        'SPIDERFEEDER_INPUT_MERGE': 'random',
+    })
+
+    with pytest.raises(NotConfigured):
+        StartUrlsLoader.from_crawler(crawler)
+
+
+def test_fail_if_input_weight_is_not_positive(get_crawler):
+    crawler = get_crawler({
+        'SPIDERFEEDER_INPUT_URI': {'input_file1.txt': {}, 'input_file2.txt': {'SPIDERFEEDER_INPUT_WEIGHT': 0}},
+        'SPIDERFEEDER_INPUT_MERGE': 'weighted',
+    })
+    loader = StartUrlsLoader.from_crawler(crawler)
+
+    with pytest.raises(ValueError, match='input_file2.txt'):
+        loader.spider_opened(crawler.spider)
+    loader.spider_closed(crawler.spider)
+
+
+@pytest.mark.parametrize('dedup', ['exact', 'bloom'])
+def test_drop_duplicated_urls(get_crawler, mocker, dedup):
+    mock = mocker.patch('spider_feeder.store.file_store.FileStore')
+    mock().__iter__.return_value = iter([
+        ('https://url1.com', {}), ('https://url2.com', {}), ('https://url1.com', {}),
+    ])
+
+    crawler = get_crawler({
+        'EXTENSIONS': {'spider_feeder.loaders.StartUrlsLoader': 500},
+        'SPIDERFEEDER_INPUT_URI': 'input_file.txt',
+        'SPIDERFEEDER_DEDUP': dedup,
+        'SPIDERFEEDER_DEDUP_CAPACITY': 1000,
+    })
+    crawler.signals.send_catch_log(signals.spider_opened, spider=crawler.spider)
+
+    assert list(crawler.spider.start_urls) == ['https://url1.com', 'https://url2.com']
+    assert crawler.stats.get_value(f'spider_feeder/{crawler.spider.name}/url_count') == 2
+    assert crawler.stats.get_value(f'spider_feeder/{crawler.spider.name}/duplicate_count') == 1
+
+
+def test_fail_if_dedup_is_unknown(get_crawler):
+    crawler = get_crawler({
+        'SPIDERFEEDER_INPUT_URI': 'input_file.txt',
+        'SPIDERFEEDER_DEDUP': 'random',
+    })
+
+    with pytest.raises(NotConfigured):
+        StartUrlsLoader.from_crawler(crawler)
+
+
+def test_normalize_urls(get_crawler, mocker):
+    mock = mocker.patch('spider_feeder.store.file_store.FileStore')
+    mock().__iter__.return_value = iter([
+        (' https://url1.com ', {}), ('', {}), ('url2.com', {}), ('ftp://url3.com', {}), ('https://url1.com', {}),
+    ])
+
+    crawler = get_crawler({
+        'EXTENSIONS': {'spider_feeder.loaders.StartUrlsLoader': 500},
+        'SPIDERFEEDER_INPUT_URI': 'input_file.txt',
+        'SPIDERFEEDER_URL_NORMALIZE': True,
+        'SPIDERFEEDER_DEDUP': 'exact',
+    })
+    crawler.signals.send_catch_log(signals.spider_opened, spider=crawler.spider)
+
+    assert list(crawler.spider.start_urls) == ['https://url1.com']
+    stats = crawler.stats.get_stats()
+    name = crawler.spider.name
+    assert stats[f'spider_feeder/{name}/rejected/empty'] == 1
+    assert stats[f'spider_feeder/{name}/rejected/no_scheme'] == 1
+    assert stats[f'spider_feeder/{name}/rejected/scheme'] == 1
+    assert stats[f'spider_feeder/{name}/duplicate_count'] == 1
+
+
+def test_flush_stats_in_batches(get_crawler, mocker, tmp_path):
+    (tmp_path / 'urls.txt').write_text('\n'.join(f'https://url{i}.com' for i in range(25)), encoding='utf-8')
+    crawler = get_crawler({
+        'EXTENSIONS': {'spider_feeder.loaders.StartUrlsLoader': 500},
+        'SPIDERFEEDER_INPUT_URI': str(tmp_path / 'urls.txt'),
+        'SPIDERFEEDER_STATS_INTERVAL': 10,
+    })
+    crawler.signals.send_catch_log(signals.spider_opened, spider=crawler.spider)
+    inc_value = mocker.spy(crawler.stats, 'inc_value')
+    prefix = f'spider_feeder/{crawler.spider.name}'
+
+    urls = iter(crawler.spider.start_urls)
+    for _ in range(11):
+        next(urls)
+    assert crawler.stats.get_value(f'{prefix}/url_count') == 10
+
+    assert len(list(urls)) == 14
+    assert [c.args for c in inc_value.call_args_list] == [
+        (f'{prefix}/url_count', 10), (f'{prefix}/url_count', 10), (f'{prefix}/url_count', 5),
+    ]
+
+    stats = crawler.stats.get_stats()
+    assert stats[f'{prefix}/url_count'] == 25
+    assert stats[f'{prefix}/bytes_read'] == len('\n'.join(f'https://url{i}.com' for i in range(25)))
+    assert stats[f'{prefix}/parse_time'] > 0
+    assert stats[f'{prefix}/urls_per_second'] > 0
+    assert stats[f'{prefix}/time_to_first_url'] >= 0
+
+
+def test_flush_stats_on_spider_closed(get_crawler, tmp_path):
+    (tmp_path / 'urls.txt').write_text('\n'.join(f'https://url{i}.com' for i in range(25)), encoding='utf-8')
+    crawler = get_crawler({
+        'EXTENSIONS': {'spider_feeder.loaders.StartUrlsLoader': 500},
+        'SPIDERFEEDER_INPUT_URI': str(tmp_path / 'urls.txt'),
+    })
+    crawler.signals.send_catch_log(signals.spider_opened, spider=crawler.spider)
+    prefix = f'spider_feeder/{crawler.spider.name}'
+
+    urls = iter(crawler.spider.start_urls)
+    for _ in range(11):
+        next(urls)
+    assert crawler.stats.get_value(f'{prefix}/url_count') is None
+
+    crawler.signals.send_catch_log(signals.spider_closed, spider=crawler.spider)
+    stats = crawler.stats.get_stats()
+    assert stats[f'{prefix}/url_count'] == 10
+    assert stats[f'{prefix}/bytes_read'] > 0
+    assert f'{prefix}/parse_time' in stats
+
+
+def test_flush_stats_periodically(get_crawler, mocker):
+    mock = mocker.patch('spider_feeder.store.file_store.FileStore')
+    mock().__iter__.return_value = iter(SHARD_DATA)
+    clock = mocker.patch('spider_feeder.loaders.time.monotonic', side_effect=lambda: clock.call_count * 2.0)
+    crawler = get_crawler({
+        'EXTENSIONS': {'spider_feeder.loaders.StartUrlsLoader': 500},
+        'SPIDERFEEDER_INPUT_URI': 'input_file.txt',
+        'SPIDERFEEDER_STATS_PERIOD': 5,
+    })
+    crawler.signals.send_catch_log(signals.spider_opened, spider=crawler.spider)
+
+    urls = iter(crawler.spider.start_urls)
+    for _ in range(4):
+        next(urls)
+    assert 0 < crawler.stats.get_value(f'spider_feeder/{crawler.spider.name}/url_count') < 4
+
+
+def load_async(get_crawler, mocker, settings):
+    mocker.patch('spider_feeder.loaders.is_asyncio_reactor_installed', return_value=True)
+    feeding = mocker.patch('spider_feeder.loaders.deferred_from_coro')
+    feeding.return_value.called = False
+    crawler = get_crawler(dict({
+        'EXTENSIONS': {'spider_feeder.loaders.AsyncStartRequestsLoader': 500},
+    }, **settings))
+    crawler.engine = Mock(slot=None)
+
+    crawler.signals.send_catch_log(signals.spider_opened, spider=crawler.spider)
+    return (crawler, feeding)
+
+
+def test_load_requests_from_async_task(get_crawler, mocker, tmp_path):
+    mocker.patch('spider_feeder.store.file_store.FileStore', side_effect=lambda uri, settings: ListStore(settings))
+    (crawler, feeding) = load_async(get_crawler, mocker, {
+        'SPIDERFEEDER_INPUT_URI': 'input_file.txt',
+        'SPIDERFEEDER_SHARD_INDEX': 1,
+        'SPIDERFEEDER_SHARD_COUNT': 3,
+        'JOBDIR': str(tmp_path),
+    })
+
+    [loader] = [ext for ext in crawler.extensions.middlewares if isinstance(ext, AsyncStartRequestsLoader)]
+    with pytest.raises(DontCloseSpider):
+        loader.spider_idle(crawler.spider)
+
+    asyncio.run(feeding.call_args[0][0])
+    crawler.signals.send_catch_log(signals.spider_closed, spider=crawler.spider, reason='finished')
+
+    requests = [call.args[0] for call in crawler.engine.crawl.call_args_list]
+    assert [r.url for r in requests] == ['https://url1.com', 'https://url4.com', 'https://url7.com']
+    assert all(r.dont_filter for r in requests)
+    assert crawler.stats.get_value(f'spider_feeder/{crawler.spider.name}/url_count') == 3
+    with open(tmp_path / 'spider_feeder.cursor') as f:
+        assert json.load(f)['cursor'] == {'count': 10}
+
+
+def test_wait_for_scheduler_while_loading_async(get_crawler, mocker):
+    mocker.patch('spider_feeder.store.file_store.FileStore', side_effect=lambda uri, settings: ListStore(settings))
+    (crawler, feeding) = load_async(get_crawler, mocker, {
+        'SPIDERFEEDER_INPUT_URI': 'input_file.txt',
+        'SPIDERFEEDER_ASYNC_MAX_PENDING': 2,
+    })
+    pending = iter([0, 2, 2, 1] + [0] * 10)
+    crawler.engine.slot = Mock(scheduler=Mock(__len__=lambda _: next(pending)))
+
+    asyncio.run(feeding.call_args[0][0])
+
+    assert crawler.engine.crawl.call_count == 10
+    assert next(pending) == 0
+
+
+def test_async_loader_requires_asyncio_reactor(get_crawler, mocker):
+    mocker.patch('spider_feeder.loaders.is_asyncio_reactor_installed', return_value=False)
+    crawler = get_crawler({'SPIDERFEEDER_INPUT_URI': 'input_file.txt'})
+
+    with pytest.raises(NotConfigured):
+        AsyncStartRequestsLoader.from_crawler(crawler)
+
+
+def test_read_ahead_in_background_thread(get_crawler, mocker, tmp_path):
+    urls = load_from_cursor(get_crawler, mocker, tmp_path, {'SPIDERFEEDER_READ_AHEAD': 5}, count=3)
+    assert urls == ['https://url0.com', 'https://url1.com', 'https://url2.com']
+
+    # the cursor is the one of the last url consumed, not of the last one read ahead
+    with open(tmp_path / 'spider_feeder.cursor') as f:
+        assert json.load(f)['cursor'] == {'count': 3}
+
+    urls = load_from_cursor(get_crawler, mocker, tmp_path, {'SPIDERFEEDER_READ_AHEAD': 5})
+    assert urls == [f'https://url{i}.com' for i in range(3, 10)]
+
+
+def test_read_ahead_stats(get_crawler, mocker):
+    mocker.patch('spider_feeder.store.file_store.FileStore', side_effect=lambda uri, settings: ListStore(settings))
+    crawler = get_crawler({
+        'EXTENSIONS': {'spider_feeder.loaders.StartUrlsLoader': 500},
+        'SPIDERFEEDER_INPUT_URI': 'input_file.txt',
+        'SPIDERFEEDER_READ_AHEAD': 2,
+    })
+    crawler.signals.send_catch_log(signals.spider_opened, spider=crawler.spider)
+
+    assert len(list(crawler.spider.start_urls)) == 10
+    stats = crawler.stats.get_stats()
+    prefix = f'spider_feeder/{crawler.spider.name}'
+    assert stats[f'{prefix}/read_ahead_queue_depth'] == 0
+    assert stats[f'{prefix}/read_ahead_stall_time'] >= 0
+    assert stats[f'{prefix}/read_ahead_wait_time'] >= 0
+    assert f'{prefix}/parse_time' in stats
@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+from spider_feeder.normalize import UrlNormalizer
+
+
+@pytest.mark.parametrize('url, expected', [
+    ('  https://url1.com/a \n', ('https://url1.com/a', None)),
+    ('', (None, 'empty')),
+    ('   ', (None, 'empty')),
+    (None, (None, 'invalid')),
+    ('url1.com/a', (None, 'no_scheme')),
+    ('ftp://url1.com/a', (None, 'scheme')),
+    ('mailto:someone@url1.com', (None, 'scheme')),
+    ('http:///a', (None, 'invalid')),
+    ('http://[::1', (None, 'invalid')),
+])
+def test_normalize_url(url, expected):
+    assert UrlNormalizer().normalize(url) == expected
+
+
+def test_add_default_scheme():
+    normalizer = UrlNormalizer(default_scheme='https')
+    assert normalizer.normalize('url1.com/a') == ('https://url1.com/a', None)
+    assert normalizer.normalize('url1.com:8080/a') == ('https://url1.com:8080/a', None)
+    assert normalizer.normalize('//url1.com/a') == ('https://url1.com/a', None)
+
+
+def test_filter_domains():
+    normalizer = UrlNormalizer(allowed_domains=['url1.com', 'url2.com'], denied_domains=['private.url1.com'])
+    assert normalizer.normalize('https://url1.com') == ('https://url1.com', None)
+    assert normalizer.normalize('https://WWW.URL2.COM') == ('https://WWW.URL2.COM', None)
+    assert normalizer.normalize('https://url3.com') == (None, 'domain')
+    assert normalizer.normalize('https://fakeurl1.com') == (None, 'domain')
+    assert normalizer.normalize('https://a.private.url1.com') == (None, 'domain')
+
+
+def test_canonicalize_url():
+    normalizer = UrlNormalizer(canonicalize=True)
+    assert normalizer.normalize('https://url1.com/a?b=2&a=1#c') == ('https://url1.com/a?a=1&b=2', None)
+
+
+def test_process_items_in_batches():
+    reports = []
+    items = [(url, {}) for url in ['https://url1.com', '', 'ftp://url2.com', 'https://url3.com', '']]
+
+    normalizer = UrlNormalizer(batch_size=2)
+    assert list(normalizer.process(iter(items), lambda *r: reports.append(r))) == [
+        ('https://url1.com', {}), ('https://url3.com', {})
+    ]
+    assert reports == [('empty', 1), ('scheme', 1), ('empty', 1)]
+
+
+def test_process_async_items_in_batches():
+    reports = []
+    items = [(url, {}) for url in ['https://url1.com', '', 'ftp://url2.com', 'https://url3.com', '']]
+
+    async def aitems():
+        for item in items:
+            yield item
+
+    async def process():
+        return [item async for item in normalizer.aprocess(aitems(), lambda *r: reports.append(r))]
+
+    normalizer = UrlNormalizer(batch_size=2)
+    assert asyncio.run(process()) == [('https://url1.com', {}), ('https://url3.com', {})]
+    assert reports == [('empty', 1), ('scheme', 1), ('empty', 1)]